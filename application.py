@@ -1,83 +1,630 @@
+import time
+
+# Start of the import, for the import-to-first-response time reported on /ready and /metrics
+_import_started = time.perf_counter()
+
 import json
 import logging as log
 import os
-from datetime import datetime
+import threading
+import uuid
+from functools import partial
 
-from flask import Flask, request
+from flask import Flask, Response, abort, g, request, send_file
 
+from src.cat_facts import CatFacts, FactStore, HTTPFactSource, StaticFactSource, is_fact_request
+from src.delivery_queue import DeliveryQueue
+from src.idempotency import IdempotencyIndex
+from src.image_mirror import ImageMirror
+from src.intent_cache import IntentCache
+from src.lazy import LazyProxy, initialize, initialize_in_background, is_initialized
+from src.logging_setup import configure_logging, request_id_var, stop_listener
+from src.metrics import MetricsRegistry, timed
+from src.prefork import memory_usage
+from src.rate_limiter import KeyedRateLimiter, SQLiteRateLimiter
 from src.request_processor import RequestProcessor
+from src.session_store import FACT, IMAGE, SessionStore
 from src.the_cat_api_handler import CatAPIHandler
+from src.ttl_cache import SQLiteCache, TTLCache
 from src.twilio_messaging import TwilioMessageHandler
+from src.utilities import (
+    CAT_API_READ_TIMEOUT,
+    CAT_FACTS_DB_PATH,
+    CAT_FACTS_MAX_LENGTH,
+    CAT_FACTS_PREFETCH_SIZE,
+    CAT_FACTS_URL,
+    CAT_FACTS_WITH_IMAGES,
+    CAT_IMAGE_POOL_SIZE,
+    DELIVERY_MAX_BACKLOG,
+    DELIVERY_MAX_RETRIES,
+    DELIVERY_RETRY_BACKOFF,
+    DELIVERY_WORKERS,
+    IDEMPOTENCY_PATH,
+    IDEMPOTENCY_PENDING_TIMEOUT,
+    IDEMPOTENCY_SIZE,
+    IDEMPOTENCY_TTL,
+    IDEMPOTENCY_WAIT,
+    IMAGE_MIRROR_BASE_URL,
+    IMAGE_MIRROR_DIRECTORY,
+    IMAGE_MIRROR_MAX_BYTES,
+    INTENT_CACHE_PATH,
+    INTENT_CACHE_SIZE,
+    INTENT_CACHE_TTL,
+    LOG_BACKUP_COUNT,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_QUEUE,
+    LOG_ROTATE,
+    NLP_PRELOAD,
+    RATE_LIMIT_PATH,
+    SESSION_MAX_IMAGES,
+    SESSION_PATH,
+    SESSION_SIZE,
+    SESSION_TTL,
+    SMS_GLOBAL_BURST,
+    SMS_GLOBAL_RATE,
+    SMS_SENDER_BURST,
+    SMS_SENDER_RATE_PER_MINUTE,
+    STARTUP_MODE,
+)
 
 ERROR_MESSAGE = "Sorry, I didn't understand your request."
 CHARACTER_LIMIT_REACHED_MESSAGE = "Please limit your request to less than 100 characters."
+# Logged for throttled requests; never sent, see handle_message
+RATE_LIMITED_MESSAGE = "You're sending requests too quickly. Please wait a minute and try again."
+NO_FACT_MESSAGE = "Sorry, I don't have a cat fact for you right now. Please try again later."
+FACT_MESSAGE = "Did you know? {fact}"
+
+# Set up logger before the handlers below log anything
+log_listener = configure_logging(
+    log_directory=f"{os.getcwd()}/logs",
+    log_format=LOG_FORMAT,
+    use_queue=LOG_QUEUE,
+    rotate=LOG_ROTATE,
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    level=LOG_LEVEL,
+)
 
 app = Flask(__name__)
-twilio = TwilioMessageHandler()
-cat_api = CatAPIHandler()
-request_processor = RequestProcessor()
 
-# Set up logger
-log_filename = datetime.now().strftime("%Y%m%d_%H%M%S") + "-log.txt"
-log_directory = f"{os.getcwd()}/logs"
-logfile = os.path.abspath(f"{log_directory}/{log_filename}")
+# The handlers make network calls and load NLTK when created, so they are created on first use or by warm_up()
+twilio = LazyProxy(TwilioMessageHandler, "TwilioMessageHandler")
+cat_api = LazyProxy(CatAPIHandler, "CatAPIHandler")
+request_processor = LazyProxy(partial(RequestProcessor, eager=NLP_PRELOAD), "RequestProcessor")
+image_mirror = (
+    ImageMirror(IMAGE_MIRROR_DIRECTORY, IMAGE_MIRROR_BASE_URL, IMAGE_MIRROR_MAX_BYTES, timeout=CAT_API_READ_TIMEOUT)
+    if IMAGE_MIRROR_BASE_URL
+    else None
+)
 
-# Make the log directory if necessary
-if not os.path.exists(log_directory):
-    os.mkdir(log_directory)
 
-log_format = "%(asctime)s\t%(module)20s:%(lineno)4d\t: %(message)s"
-log.basicConfig(filename=logfile, format=log_format, level=log.INFO)
-log.getLogger().addHandler(log.StreamHandler())
+def create_cat_facts():
+    """
+    Creates the cat facts, filling their store from CAT_FACTS_URL, or from the built-in facts without a url.
 
+    :return: CatFacts
+    """
 
-@app.route("/sms", methods=["POST"])
-def sms_reply():
-    """Respond to incoming messages."""
+    source = HTTPFactSource(CAT_FACTS_URL, timeout=CAT_API_READ_TIMEOUT) if CAT_FACTS_URL else StaticFactSource()
+    return CatFacts(FactStore(CAT_FACTS_DB_PATH), source, prefetch_size=CAT_FACTS_PREFETCH_SIZE)
+
+
+cat_facts = LazyProxy(create_cat_facts, "CatFacts")
+singletons = {
+    "twilio": twilio,
+    "cat_api": cat_api,
+    "request_processor": request_processor,
+    "cat_facts": cat_facts,
+}
+
+# Seconds from the start of the import to the handlers being ready and to the first /sms response
+startup = {"import_seconds": None, "ready_seconds": None, "first_response_seconds": None}
+_warm_up = None
+_warm_up_lock = threading.Lock()
+intent_cache = IntentCache(
+    backend=SQLiteCache(INTENT_CACHE_PATH, max_size=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL, table="intents")
+    if INTENT_CACHE_PATH
+    else TTLCache(max_size=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL)
+)
+idempotency = IdempotencyIndex(
+    backend=SQLiteCache(IDEMPOTENCY_PATH, max_size=IDEMPOTENCY_SIZE, ttl=IDEMPOTENCY_TTL, table="message_sids")
+    if IDEMPOTENCY_PATH
+    else TTLCache(max_size=IDEMPOTENCY_SIZE, ttl=IDEMPOTENCY_TTL),
+    wait_timeout=IDEMPOTENCY_WAIT,
+    pending_timeout=IDEMPOTENCY_PENDING_TIMEOUT,
+)
+
+session_store = SessionStore(
+    backend=SQLiteCache(SESSION_PATH, max_size=SESSION_SIZE, ttl=SESSION_TTL, table="sessions")
+    if SESSION_PATH
+    else TTLCache(max_size=SESSION_SIZE, ttl=SESSION_TTL),
+    max_images=SESSION_MAX_IMAGES,
+)
+
+
+def create_rate_limiter(rate, capacity, table):
+    """
+    Creates a rate limiter, shared between worker processes if RATE_LIMIT_PATH is set.
+
+    :param rate: Number of requests allowed per second; 0 disables the limit
+    :param capacity: Number of requests allowed in a burst
+    :param table: Name of the table holding the limiter's buckets in the shared database
+    :return: KeyedRateLimiter or SQLiteRateLimiter, or None if disabled
+    """
+
+    if not rate:
+        return None
+
+    if RATE_LIMIT_PATH:
+        return SQLiteRateLimiter(RATE_LIMIT_PATH, rate, capacity, table=table)
+
+    return KeyedRateLimiter(rate, capacity)
+
+
+sender_limiter = create_rate_limiter(SMS_SENDER_RATE_PER_MINUTE / 60, SMS_SENDER_BURST, "sender_rate_limits")
+global_limiter = create_rate_limiter(SMS_GLOBAL_RATE, SMS_GLOBAL_BURST, "global_rate_limits")
+
+# Metrics served on /metrics
+metrics = MetricsRegistry()
+stage_duration = metrics.histogram(
+    "sms_stage_duration_seconds", "Time spent in each stage of handling an /sms request", labels=("stage",)
+)
+stage_errors = metrics.counter("sms_stage_errors_total", "Exceptions raised by each stage", labels=("stage",))
+sms_requests = metrics.counter("sms_requests_total", "Handled /sms requests by outcome", labels=("outcome",))
+
+
+def send_reply(receiving_number, text_message, image_url=None):
+    """
+    Sends a reply through Twilio, recording the time taken. Runs on the delivery queue's sender threads, which is also
+    where the image is copied to the local mirror, if enabled, so the webhook never waits for the download.
+
+    :param receiving_number: Number that will be receiving the message
+    :param text_message: Body of the text that will be sent
+    :param image_url: String url of the image that will be sent
+    :return: String containing the message security identifier
+    """
+
+    if image_mirror and image_url:
+        with timed(stage_duration, stage_errors, stage="image_mirror"):
+            image_url = image_mirror.mirror(image_url)
+
+    with timed(stage_duration, stage_errors, stage="twilio_send"):
+        return twilio.send_message(receiving_number=receiving_number, text_message=text_message, image_url=image_url)
+
+
+delivery_queue = DeliveryQueue(
+    send_function=send_reply,
+    workers=DELIVERY_WORKERS,
+    max_backlog=DELIVERY_MAX_BACKLOG,
+    max_retries=DELIVERY_MAX_RETRIES,
+    backoff=DELIVERY_RETRY_BACKOFF,
+    is_retryable=TwilioMessageHandler.is_transient_error,
+)
+
+metrics.callback("delivery_queue_depth", "Replies waiting to be sent", lambda: delivery_queue.depth)
+metrics.callback("delivery_in_flight", "Replies currently being sent", lambda: delivery_queue.in_flight)
+metrics.callback("delivery_failed_total", "Replies dropped after failing", lambda: delivery_queue.failed, "counter")
+metrics.callback(
+    "delivery_skipped_total", "Replies not sent as Twilio is not set up", lambda: delivery_queue.skipped, "counter"
+)
+metrics.callback("intent_cache_hits_total", "Intent cache hits", lambda: intent_cache.hits, "counter")
+metrics.callback("intent_cache_misses_total", "Intent cache misses", lambda: intent_cache.misses, "counter")
+metrics.callback(
+    "sms_duplicates_total",
+    "Retried webhooks answered without handling the message again",
+    lambda: idempotency.duplicates,
+    "counter",
+)
+
+metrics.callback(
+    "startup_first_response_seconds",
+    "Seconds from the start of the import to the first /sms response",
+    lambda: startup["first_response_seconds"] or 0,
+)
+
+
+def _image_pool_count(name):
+    """Reads a counter of the image pool without creating the TheCatAPI handler for it."""
+
+    return getattr(cat_api.image_pool, name) if is_initialized(cat_api) and cat_api.image_pool else 0
+
+
+if CAT_IMAGE_POOL_SIZE > 0:
+    metrics.callback(
+        "image_pool_hits_total", "Images served from the pool", partial(_image_pool_count, "hits"), "counter"
+    )
+    metrics.callback(
+        "image_pool_misses_total", "Images fetched on the request path", partial(_image_pool_count, "misses"), "counter"
+    )
+
+metrics.callback(
+    "process_resident_memory_bytes",
+    "Resident set size of this process",
+    lambda: (memory_usage() or {}).get("rss", 0),
+)
+metrics.callback(
+    "process_proportional_memory_bytes",
+    "Proportional set size of this process; memory shared with the other workers counts in part",
+    lambda: (memory_usage() or {}).get("pss", 0),
+)
+
+metrics.callback(
+    "cat_api_circuit_open",
+    "1 while TheCatAPI is failing and replies use fallback images",
+    lambda: int(is_initialized(cat_api) and cat_api.circuit_breaker.state != "closed"),
+)
+
+
+def shutdown():
+    """
+    Finishes the work of a stopping worker process, which leaves through os._exit without running the atexit handlers:
+    sends the queued replies, saves the fallback images and writes the queued log records.
+    """
+
+    delivery_queue.stop()
+
+    if is_initialized(cat_api):
+        try:
+            cat_api.fallback_images.save()
+
+        except OSError as error:
+            log.warning("Failed to save fallback images: %s", error)
+
+    stop_listener(log_listener)
+
+
+def _mark_ready():
+    """Records how long the handlers took to become ready."""
+
+    startup["ready_seconds"] = time.perf_counter() - _import_started
+    log.info("Ready %.3fs after import started", startup["ready_seconds"])
+
+
+def warm_up(background=True):
+    """
+    Creates the handlers, unless that has been started already.
+
+    :param background: Create them on a background thread instead of waiting for them
+    :return: threading.Event set once the handlers have been created
+    """
+
+    global _warm_up
+
+    with _warm_up_lock:
+        if _warm_up is None:
+            steps = [partial(initialize, singleton) for singleton in singletons.values()] + [_mark_ready]
+
+            if background:
+                _warm_up = initialize_in_background(*steps)
+
+            else:
+                for step in steps:
+                    step()
+
+                _warm_up = threading.Event()
+                _warm_up.set()
+
+    return _warm_up
+
+
+def is_rate_limited(incoming_number):
+    """
+    Takes a request from the sender's and the global limits.
+
+    :param incoming_number: Number the message was sent from
+    :return: True if either limit is exhausted; False otherwise
+    """
+
+    if sender_limiter and not sender_limiter.try_acquire(incoming_number or ""):
+        return True
+
+    return bool(global_limiter) and not global_limiter.try_acquire("*")
+
+
+def readiness():
+    """
+    Reports whether the handlers have been created, starting their creation if it has not begun yet.
+
+    :return: Dict with "ready", the startup mode, which handlers exist and the startup timings
+    """
+
+    warm_up()
+    initialized = {name: is_initialized(singleton) for name, singleton in singletons.items()}
+
+    return {
+        "ready": all(initialized.values()),
+        "startup_mode": STARTUP_MODE,
+        "initialized": initialized,
+        "startup": startup,
+    }
+
+
+def record_first_response():
+    """Records the import-to-first-response time when the first /sms response is sent."""
+
+    if startup["first_response_seconds"] is None:
+        startup["first_response_seconds"] = time.perf_counter() - _import_started
+        log.info("First /sms response %.3fs after import started", startup["first_response_seconds"])
+
+
+def fact_reply(caption=None):
+    """
+    Builds the text of a reply with a cat fact from the local store.
+
+    :param caption: Image caption to add the fact to; None replies with the fact alone
+    :return: Reply text; the caption unchanged, or NO_FACT_MESSAGE, if no fact is available
+    """
 
-    incoming_message = request.values.get("Body", None)
-    incoming_number = request.values.get("From", None)
+    if caption is None:
+        fact = cat_facts.get_fact()
+        return FACT_MESSAGE.format(fact=fact) if fact else NO_FACT_MESSAGE
 
-    log.info(f"Message received: {incoming_message}")
+    fact = cat_facts.get_fact(max_length=CAT_FACTS_MAX_LENGTH)
+    return f"{caption}\n\n{FACT_MESSAGE.format(fact=fact)}" if fact else caption
+
+
+def resolve_request(incoming_message, timings=None):
+    """
+    Resolves a message to (verb, object, category, breed), reusing the result for repeated message bodies.
+
+    :param incoming_message: Raw message body
+    :param timings: Optional dict receiving the duration of each stage in milliseconds
+    :return: Tuple of (verb, object, category, breed)
+    """
+
+    keyword_matcher = cat_api.keyword_matcher
+
+    def resolve(message):
+        with timed(stage_duration, stage_errors, timings, stage="process_request"):
+            action, obj = request_processor.process_request(user_request=message)
+
+        with timed(stage_duration, stage_errors, timings, stage="keyword_lookup"):
+            return request_processor.resolve_keywords(action, obj, keyword_matcher)
+
+    return intent_cache.resolve(incoming_message, resolve, version=cat_api.ids_version)
+
+
+def resolve_kind(incoming_message, session, timings=None):
+    """
+    Resolves a message to the kind of reply it asks for. A follow-up such as "another one" repeats the sender's last
+    request without the language processing.
+
+    :param incoming_message: Raw message body
+    :param session: Session of the sender, or None
+    :param timings: Optional dict receiving the duration of each stage in milliseconds
+    :return: Tuple of (FACT, IMAGE or None if the message was not understood, category, breed)
+    """
+
+    if session_store.follow_up(session, incoming_message):
+        return session["kind"], session["category"], session["breed"]
+
+    # Find the action and object, and any category or breed in the object
+    action, obj, requested_category, requested_breed = resolve_request(incoming_message, timings)
+
+    if not (action and obj):
+        return None, None, None
+
+    return FACT if is_fact_request(obj) else IMAGE, requested_category, requested_breed
+
+
+@app.before_request
+def set_request_id():
+    """Tags the log records of this request with the Twilio message SID, or a random id without one."""
+
+    g.request_id_token = request_id_var.set(request.values.get("MessageSid") or uuid.uuid4().hex)
+
+
+@app.teardown_request
+def reset_request_id(exception=None):
+    """Clears the request id set by set_request_id."""
+
+    token = g.pop("request_id_token", None)
+
+    if token is not None:
+        request_id_var.reset(token)
+
+
+def in_progress_response(incoming_message, incoming_number):
+    """
+    Builds the response to a retried webhook whose first delivery is still being handled.
+
+    :param incoming_message: Raw message body
+    :param incoming_number: Number the message was sent from
+    :return: Response dictionary
+    """
+
+    return {
+        "incoming_message": incoming_message,
+        "receiving_number": incoming_number,
+        "outgoing_message": None,
+        "image_url": None,
+        "status": "in_progress",
+    }
+
+
+def handle_message(incoming_message, incoming_number, stage_timings):
+    """
+    Works out the reply to a message and hands it to the delivery queue.
+
+    :param incoming_message: Raw message body
+    :param incoming_number: Number the message was sent from
+    :param stage_timings: Dict receiving the duration of each stage in milliseconds
+    :return: Response dictionary
+    """
+
+    with timed(stage_duration, stage_errors, stage_timings, stage="rate_limit"):
+        rate_limited = not app.config["TESTING"] and is_rate_limited(incoming_number)
 
     cat_image_url = None
     message = ERROR_MESSAGE
+    outcome = "not_understood"
+
+    if rate_limited:
+        # No reply is sent: Twilio ignores the JSON response, so the message below only reaches the logs, and replying
+        # to each throttled request would cost the paid Twilio messages the limit is there to save
+        message = RATE_LIMITED_MESSAGE
+        outcome = "rate_limited"
 
-    if len(incoming_message) > 100:
+    elif len(incoming_message) > 100:
         message = CHARACTER_LIMIT_REACHED_MESSAGE
+        outcome = "too_long"
 
     else:
-        action, obj = request_processor.process_request(user_request=incoming_message)
+        session = session_store.get(incoming_number)
+        kind, requested_category, requested_breed = resolve_kind(incoming_message, session, stage_timings)
+
+        if kind == FACT:
+            with timed(stage_duration, stage_errors, stage_timings, stage="cat_facts"):
+                message = fact_reply()
+
+            outcome = "fact"
 
-        if action and obj:
-            # Check if any of the categories are in query
-            requested_category = request_processor.get_keywords_in_string(cat_api.CATEGORY_IDS, obj)
+        elif kind == IMAGE:
+            # Make the API call, skipping the images already sent to this number
+            with timed(stage_duration, stage_errors, stage_timings, stage="cat_api"):
+                cat_image_url, message = cat_api.get_cat_image(
+                    category=requested_category, breed=requested_breed, exclude=session["sent"] if session else ()
+                )
 
-            # Check if any of the breeds are in query
-            requested_breed = request_processor.get_keywords_in_string(cat_api.BREED_IDS, obj)
+            if CAT_FACTS_WITH_IMAGES:
+                with timed(stage_duration, stage_errors, stage_timings, stage="cat_facts"):
+                    message = fact_reply(message)
 
-            # Make the API call
-            cat_image_url, message = cat_api.get_cat_image(category=requested_category, breed=requested_breed)
+            outcome = "image"
 
-    message_sid = None
+        if kind:
+            session_store.remember(
+                incoming_number,
+                session,
+                kind,
+                category=requested_category,
+                breed=requested_breed,
+                image_url=cat_image_url,
+            )
 
-    if not app.config["TESTING"]:
-        message_sid = twilio.send_message(
-            receiving_number=incoming_number,
-            text_message=message,
-            image_url=cat_image_url,
-        )
+    delivery_status = "rate_limited" if rate_limited else None
+
+    if not (app.config["TESTING"] or rate_limited):
+        # Hand the reply to the sender threads so the webhook does not wait on Twilio
+        with timed(stage_duration, stage_errors, stage_timings, stage="enqueue"):
+            queued = delivery_queue.enqueue(
+                receiving_number=incoming_number,
+                text_message=message,
+                image_url=cat_image_url,
+            )
+
+        delivery_status = "queued" if queued else "rejected"
+
+    sms_requests.inc(outcome=outcome)
+    log.info(
+        "Replied to %s: %s",
+        incoming_number,
+        outcome,
+        extra={"status": outcome, "delivery_status": delivery_status, "stage_timings_ms": stage_timings},
+    )
+
+    record_first_response()
 
     # Create response dictionary
-    response = {
+    return {
         "incoming_message": incoming_message,
         "receiving_number": incoming_number,
         "outgoing_message": message,
         "image_url": cat_image_url,
-        "status": message_sid,
+        "status": delivery_status,
+    }
+
+
+@app.route("/sms", methods=["POST"])
+def sms_reply():
+    """Respond to incoming messages. A webhook retried by Twilio gets the response of the first delivery."""
+
+    stage_timings = {}
+
+    with timed(stage_duration, stage_errors, stage_timings, stage="body_parse"):
+        incoming_message = request.values.get("Body", None)
+        incoming_number = request.values.get("From", None)
+        message_sid = request.values.get("MessageSid")
+
+    log.info("Message received: %s", incoming_message)
+
+    response = idempotency.handle(
+        message_sid,
+        partial(handle_message, incoming_message, incoming_number, stage_timings),
+        pending_response=in_progress_response(incoming_message, incoming_number),
+    )
+    return json.dumps(response)
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """
+    Report the state of the delivery queue, image pool, intent cache, TheCatAPI circuit breaker and call coalescing,
+    image mirror, NLP fast path, cat facts, webhook deduplication, sender sessions and the memory use of this process.
+    """
+
+    response = {
+        "delivery_queue": delivery_queue.stats(),
+        "image_pool": cat_api.image_pool.stats() if is_initialized(cat_api) and cat_api.image_pool else None,
+        "cat_api_circuit": cat_api.circuit_breaker.stats() if is_initialized(cat_api) else None,
+        "cat_api_coalescing": cat_api.single_flight.stats() if is_initialized(cat_api) else None,
+        "image_mirror": image_mirror.stats() if image_mirror else None,
+        "intent_cache": intent_cache.stats(),
+        "idempotency": idempotency.stats(),
+        "sessions": session_store.stats(),
+        "nlp_fast_path": (
+            request_processor.fast_parser.stats()
+            if is_initialized(request_processor) and request_processor.fast_parser
+            else None
+        ),
+        "cat_facts": cat_facts.stats() if is_initialized(cat_facts) else None,
+        "process": {"pid": os.getpid(), "memory": memory_usage()},
     }
     return json.dumps(response)
 
 
+@app.route("/images/<name>", methods=["GET"])
+def mirrored_image(name):
+    """Serve an image from the local mirror. Names are content hashes, so a response never changes."""
+
+    path = image_mirror.path(name) if image_mirror else None
+
+    if path is None:
+        abort(404)
+
+    response = send_file(
+        path, mimetype=image_mirror.content_type(name), etag=name.split(".")[0], max_age=365 * 24 * 3600
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Report whether the handlers have been created; 503 until they are, so traffic waits for a warm worker."""
+
+    response = readiness()
+    return Response(json.dumps(response), status=200 if response["ready"] else 503, mimetype="application/json")
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Serve the stage timings and counters in the Prometheus text format."""
+
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+startup["import_seconds"] = time.perf_counter() - _import_started
+
+if STARTUP_MODE == "eager":
+    warm_up(background=False)
+
+elif STARTUP_MODE == "background":
+    warm_up()
+
+
 if __name__ == "__main__":
     app.run()
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging as log
+import uuid
+from functools import partial
+from urllib.parse import parse_qsl
+
+import httpx
+
+from application import (
+    CHARACTER_LIMIT_REACHED_MESSAGE,
+    ERROR_MESSAGE,
+    RATE_LIMITED_MESSAGE,
+    cat_api,
+    fact_reply,
+    idempotency,
+    image_mirror,
+    in_progress_response,
+    is_rate_limited,
+    metrics,
+    readiness,
+    record_first_response,
+    resolve_kind,
+    session_store,
+    stage_duration,
+    stage_errors,
+    warm_up,
+)
+from src.async_cat_api_handler import AsyncCatAPIHandler
+from src.async_twilio_messaging import AsyncTwilioMessageHandler
+from src.lazy import initialize
+from src.logging_setup import request_id_var
+from src.metrics import timed
+from src.session_store import FACT, IMAGE
+from src.utilities import (
+    ASYNC_HTTP_MAX_CONNECTIONS,
+    ASYNC_HTTP_TIMEOUT,
+    CAT_FACTS_WITH_IMAGES,
+    DELIVERY_MAX_BACKLOG,
+    DELIVERY_MAX_RETRIES,
+    DELIVERY_RETRY_BACKOFF,
+    DELIVERY_WORKERS,
+)
+
+# Serve with an ASGI server, e.g. `uvicorn asgi_application:app`
+config = {"TESTING": False}
+
+_client = None
+_async_cat_api = None
+_async_twilio = None
+_send_semaphore = None
+_pending_sends = set()
+
+
+def _get_handlers():
+    """
+    Creates the shared HTTP client and the handlers that use it on first use.
+
+    :return: Tuple of (AsyncCatAPIHandler, AsyncTwilioMessageHandler)
+    """
+
+    global _client, _async_cat_api, _async_twilio, _send_semaphore
+
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=ASYNC_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=ASYNC_HTTP_MAX_CONNECTIONS),
+        )
+        _async_cat_api = AsyncCatAPIHandler(_client, cat_api)
+        _async_twilio = AsyncTwilioMessageHandler(_client)
+        _send_semaphore = asyncio.Semaphore(DELIVERY_WORKERS)
+
+    return _async_cat_api, _async_twilio
+
+
+async def _close_handlers():
+    """Waits for outstanding sends and closes the shared HTTP client."""
+
+    global _client
+
+    if _pending_sends:
+        await asyncio.gather(*_pending_sends, return_exceptions=True)
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _deliver(receiving_number, text_message, image_url):
+    """
+    Sends a reply through Twilio, retrying transient errors with exponential backoff.
+
+    :param receiving_number: Number that will be receiving the message
+    :param text_message: Body of the text that will be sent
+    :param image_url: String url of the image that will be sent
+    """
+
+    _, async_twilio = _get_handlers()
+
+    async with _send_semaphore:
+        if image_mirror and image_url:
+            with timed(stage_duration, stage_errors, stage="image_mirror"):
+                image_url = await asyncio.get_running_loop().run_in_executor(None, image_mirror.mirror, image_url)
+
+        for attempt in range(DELIVERY_MAX_RETRIES + 1):
+            try:
+                with timed(stage_duration, stage_errors, stage="twilio_send"):
+                    await async_twilio.send_message(receiving_number, text_message, image_url)
+
+                return
+
+            except Exception as error:
+                if attempt >= DELIVERY_MAX_RETRIES or not async_twilio.is_transient_error(error):
+                    log.error("Delivery failed after %d attempt(s): %s", attempt + 1, error)
+                    return
+
+                await asyncio.sleep(DELIVERY_RETRY_BACKOFF * 2**attempt)
+
+
+def _resolve(incoming_message, incoming_number):
+    """
+    Looks up the sender's session and resolves the message to the kind of reply it asks for.
+
+    :param incoming_message: Raw message body
+    :param incoming_number: Number the message was sent from
+    :return: Tuple of (session, (kind, category, breed))
+    """
+
+    session = session_store.get(incoming_number)
+    return session, resolve_kind(incoming_message, session)
+
+
+async def _handle_message(incoming_message, incoming_number):
+    """
+    Works out the reply to a message and starts sending it.
+
+    :param incoming_message: Raw message body
+    :param incoming_number: Number the message was sent from
+    :return: Response dictionary
+    """
+
+    async_cat_api, _ = _get_handlers()
+    # The rate limits, sessions, NLP, intent cache and cat facts may read SQLite or NLTK, or wait for a background
+    # warm up to create their handler, so they run on worker threads; asyncio.to_thread keeps the request id for logs
+    rate_limited = not config["TESTING"] and await asyncio.to_thread(is_rate_limited, incoming_number)
+
+    cat_image_url = None
+    message = ERROR_MESSAGE
+
+    if rate_limited:
+        # As in application.py, a throttled sender intentionally gets no reply
+        message = RATE_LIMITED_MESSAGE
+
+    elif len(incoming_message) > 100:
+        message = CHARACTER_LIMIT_REACHED_MESSAGE
+
+    else:
+        session, (kind, requested_category, requested_breed) = await asyncio.to_thread(
+            _resolve, incoming_message, incoming_number
+        )
+
+        if kind == FACT:
+            with timed(stage_duration, stage_errors, stage="cat_facts"):
+                message = await asyncio.to_thread(fact_reply)
+
+        elif kind == IMAGE:
+            # Make the API call, skipping the images already sent to this number
+            with timed(stage_duration, stage_errors, stage="cat_api"):
+                # Creating the CatAPIHandler loads its id tables over HTTP or from disk, so it is done on a worker
+                # thread before the async handler touches it on the event loop
+                await asyncio.to_thread(initialize, cat_api)
+                cat_image_url, message = await async_cat_api.get_cat_image(
+                    category=requested_category, breed=requested_breed, exclude=session["sent"] if session else ()
+                )
+
+            if CAT_FACTS_WITH_IMAGES:
+                with timed(stage_duration, stage_errors, stage="cat_facts"):
+                    message = await asyncio.to_thread(fact_reply, message)
+
+        if kind:
+            await asyncio.to_thread(
+                session_store.remember,
+                incoming_number,
+                session,
+                kind,
+                category=requested_category,
+                breed=requested_breed,
+                image_url=cat_image_url,
+            )
+
+    delivery_status = "rate_limited" if rate_limited else None
+
+    if not (config["TESTING"] or rate_limited):
+        # As with the DeliveryQueue in application.py, at most DELIVERY_MAX_BACKLOG replies wait for a free sender
+        if len(_pending_sends) >= DELIVERY_WORKERS + DELIVERY_MAX_BACKLOG:
+            log.warning("Delivery backlog is full; message rejected")
+            delivery_status = "rejected"
+        else:
+            # Send in the background so the webhook does not wait on Twilio
+            task = asyncio.create_task(_deliver(incoming_number, message, cat_image_url))
+            _pending_sends.add(task)
+            task.add_done_callback(_pending_sends.discard)
+            delivery_status = "queued"
+
+    record_first_response()
+
+    # Create response dictionary
+    return {
+        "incoming_message": incoming_message,
+        "receiving_number": incoming_number,
+        "outgoing_message": message,
+        "image_url": cat_image_url,
+        "status": delivery_status,
+    }
+
+
+async def sms_reply(values):
+    """
+    Respond to incoming messages. Same contract as the /sms route in application.py.
+
+    :param values: Dict of the request's form and query values
+    :return: Response dictionary
+    """
+
+    # Each request runs in its own task, so the id only tags this request's records and the sends it starts
+    request_id_var.set(values.get("MessageSid") or uuid.uuid4().hex)
+
+    incoming_message = values.get("Body", None)
+    incoming_number = values.get("From", None)
+
+    log.info("Message received: %s", incoming_message)
+
+    return await idempotency.handle_async(
+        values.get("MessageSid"),
+        partial(_handle_message, incoming_message, incoming_number),
+        pending_response=in_progress_response(incoming_message, incoming_number),
+    )
+
+
+async def _read_body(receive):
+    """
+    Reads the full request body from the ASGI receive channel.
+
+    :param receive: ASGI receive callable
+    :return: Request body bytes
+    """
+
+    body = b""
+
+    while True:
+        event = await receive()
+        body += event.get("body", b"")
+
+        if not event.get("more_body", False):
+            return body
+
+
+async def _send_response(send, status, body, content_type=b"text/html; charset=utf-8", headers=()):
+    """
+    Sends a complete HTTP response on the ASGI send channel.
+
+    :param send: ASGI send callable
+    :param status: HTTP status code
+    :param body: Response body string or bytes
+    :param content_type: Value of the Content-Type header
+    :param headers: Additional (name, value) header byte string pairs
+    """
+
+    headers = [(b"content-type", content_type), *headers]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body if isinstance(body, bytes) else body.encode("utf-8")})
+
+
+async def _send_image(send, name):
+    """
+    Sends an image from the local mirror. Names are content hashes, so a response never changes.
+
+    :param send: ASGI send callable
+    :param name: File name of the image
+    """
+
+    path = image_mirror.path(name) if image_mirror else None
+
+    if path is None:
+        await _send_response(send, 404, "Not Found")
+        return
+
+    loop = asyncio.get_running_loop()
+    body = await loop.run_in_executor(None, _read_file, path)
+    headers = [
+        (b"cache-control", b"public, max-age=31536000, immutable"),
+        (b"etag", f'"{name.split(".")[0]}"'.encode()),
+    ]
+    await _send_response(send, 200, body, image_mirror.content_type(name).encode(), headers)
+
+
+def _read_file(path):
+    with open(path, "rb") as image_file:
+        return image_file.read()
+
+
+async def _lifespan(receive, send):
+    """
+    Handles the ASGI lifespan protocol by opening the HTTP client on startup and closing it on shutdown.
+
+    :param receive: ASGI receive callable
+    :param send: ASGI send callable
+    """
+
+    while True:
+        event = await receive()
+
+        if event["type"] == "lifespan.startup":
+            _get_handlers()
+            # Creates the handlers in the background, so the first request does not block the event loop on them
+            warm_up()
+            await send({"type": "lifespan.startup.complete"})
+
+        elif event["type"] == "lifespan.shutdown":
+            await _close_handlers()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """
+    ASGI entry point.
+
+    :param scope: ASGI connection scope
+    :param receive: ASGI receive callable
+    :param send: ASGI send callable
+    """
+
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if scope["type"] != "http":
+        return
+
+    if scope["path"].startswith("/images/") and scope["method"] == "GET":
+        await _send_image(send, scope["path"][len("/images/") :])
+        return
+
+    if scope["path"] == "/ready" and scope["method"] == "GET":
+        response = readiness()
+        await _send_response(send, 200 if response["ready"] else 503, json.dumps(response), b"application/json")
+        return
+
+    if scope["path"] == "/metrics" and scope["method"] == "GET":
+        await _send_response(send, 200, metrics.render(), b"text/plain; version=0.0.4")
+        return
+
+    if scope["path"] != "/sms":
+        await _send_response(send, 404, "Not Found")
+        return
+
+    if scope["method"] != "POST":
+        await _send_response(send, 405, "Method Not Allowed")
+        return
+
+    # Query string values take precedence over form values, as with Flask's request.values
+    values = dict(parse_qsl((await _read_body(receive)).decode("utf-8"), keep_blank_values=True))
+    values.update(parse_qsl(scope.get("query_string", b"").decode("utf-8"), keep_blank_values=True))
+
+    response = await sms_reply(values)
+    await _send_response(send, 200, json.dumps(response))
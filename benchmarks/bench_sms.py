@@ -0,0 +1,365 @@
+"""
+Benchmarks the /sms request path against local stand-ins for TheCatAPI and Twilio.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.bench_sms --requests 2000 --concurrency 16 --cat-api-latency 0.05 --twilio-latency 0.1
+
+Results are written as JSON to benchmarks/results/ and can be compared with an earlier run using --compare.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.stubs import CatAPIStubHandler, StubServer, TwilioStubHandler
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+MESSAGES = [
+    "Show me a cat",
+    "Send a cat",
+    "Send me a cat in a box",
+    "Show me a cat in space",
+    "Give me a cat in a hat",
+    "Let me see a cat wearing sunglasses",
+    "I want to get a kitty wearing some clothes",
+    "Let me see a cat wearing a tie, please!",
+    "Show me a picture of a siamese cat",
+    "Send me an american shorthair",
+    "Give me a norwegian forest cat",
+    "Can you send me a picture of a javanese kitty?",
+    "I want to receive a bengal cat",
+    "Show me a devon rex in a box",
+    "Hello, world!",
+]
+
+
+class StageTimer:
+    """Class to record how long each stage of the request path takes by wrapping the functions implementing it."""
+
+    def __init__(self):
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, function):
+        """
+        Wraps a function so that every call is timed under the given stage.
+
+        :param stage: Name of the stage
+        :param function: Function to wrap
+        :return: Wrapped function
+        """
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return function(*args, **kwargs)
+
+            finally:
+                elapsed = time.perf_counter() - start
+
+                with self._lock:
+                    self.durations.setdefault(stage, []).append(elapsed)
+
+        return timed
+
+    def reset(self):
+        """Discards the recorded durations."""
+
+        with self._lock:
+            self.durations = {}
+
+
+def summarize(durations):
+    """
+    Summarizes a list of durations in seconds.
+
+    :param durations: List of durations
+    :return: Dict with count, mean, p50, p95, p99 and max in milliseconds
+    """
+
+    # Imported here as the application settings are read on import, after configure_environment has run
+    from src.utilities import percentile
+
+    durations = sorted(durations)
+
+    if not durations:
+        return {"count": 0}
+
+    return {
+        "count": len(durations),
+        "mean_ms": 1000 * sum(durations) / len(durations),
+        "p50_ms": 1000 * percentile(durations, 50),
+        "p95_ms": 1000 * percentile(durations, 95),
+        "p99_ms": 1000 * percentile(durations, 99),
+        "max_ms": 1000 * durations[-1],
+    }
+
+
+def configure_environment(arguments, cat_api_url, twilio_url):
+    """
+    Points the application at the stubs. Must run before the application is imported, as settings are read then.
+
+    :param arguments: Parsed command line arguments
+    :param cat_api_url: Base url of the TheCatAPI stub
+    :param twilio_url: Base url of the Twilio stub
+    """
+
+    os.environ.update(
+        {
+            "CAT_API_URL": f"{cat_api_url}/v1",
+            "CAT_API_KEY": "benchmark",
+            "CAT_API_ID_CACHE_PATH": os.path.join(tempfile.mkdtemp(), "cat_api_ids.json"),
+            # The stub's image urls must not end up in the fallback images replies use during a real outage
+            "CAT_API_FALLBACK_PATH": os.path.join(tempfile.mkdtemp(), "fallback_images.json"),
+            "CAT_IMAGE_POOL_SIZE": str(arguments.image_pool_size),
+            # Serve the built-in cat facts rather than downloading them
+            "CAT_FACTS_URL": "",
+            "CAT_FACTS_DB_PATH": os.path.join(tempfile.mkdtemp(), "cat_facts.db"),
+            "INTENT_CACHE_SIZE": str(arguments.intent_cache_size),
+            # The benchmark measures the full request path, which the rate limits would cut short
+            "SMS_SENDER_RATE_PER_MINUTE": "0",
+            "SMS_GLOBAL_RATE": "0",
+            "TWILIO_API_URL": twilio_url,
+            "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+            "TWILIO_AUTH_TOKEN": "benchmark",
+            "TWILIO_PHONE_NUMBER": "+15005550006",
+        }
+    )
+
+
+def instrument(application, stage_timer):
+    """
+    Wraps the stages of the /sms request path with timers.
+
+    :param application: Imported application module
+    :param stage_timer: StageTimer recording the durations
+    """
+
+    from src.keyword_matcher import KeywordMatcher
+
+    processor = application.request_processor
+    processor.process_request = stage_timer.wrap("nlp_parse", processor.process_request)
+    KeywordMatcher.search = stage_timer.wrap("keyword_match", KeywordMatcher.search)
+    application.cat_api.get_cat_image = stage_timer.wrap("image_fetch", application.cat_api.get_cat_image)
+    application.delivery_queue.send_function = stage_timer.wrap("send", application.delivery_queue.send_function)
+
+
+def drive(post, total_requests, concurrency):
+    """
+    Sends requests to /sms from a pool of client threads.
+
+    :param post: Callable taking the form data of one request and returning its HTTP status code
+    :param total_requests: Number of requests to send
+    :param concurrency: Number of client threads
+    :return: Tuple of (list of latencies in seconds, wall clock seconds, number of failed requests)
+    """
+
+    def one_request(i):
+        form = {"Body": MESSAGES[i % len(MESSAGES)], "From": f"+1555{i % 10000:07d}"}
+        start = time.perf_counter()
+        status = post(form)
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(total_requests)))
+
+    wall_time = time.perf_counter() - start
+    failures = sum(1 for _, status in results if status != 200)
+
+    return [latency for latency, _ in results], wall_time, failures
+
+
+def run_test_client(application, arguments):
+    """
+    Drives /sms through the Flask test client, which measures the application without any HTTP server overhead.
+
+    :param application: Imported application module
+    :param arguments: Parsed command line arguments
+    :return: Tuple as returned by drive()
+    """
+
+    local = threading.local()
+
+    def post(form):
+        if not hasattr(local, "client"):
+            local.client = application.app.test_client()
+
+        return local.client.post("/sms", data=form).status_code
+
+    return drive(post, arguments.requests, arguments.concurrency)
+
+
+def run_server(application, arguments):
+    """
+    Drives /sms through a real threaded HTTP server on a local port.
+
+    :param application: Imported application module
+    :param arguments: Parsed command line arguments
+    :return: Tuple as returned by drive()
+    """
+
+    import requests
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            """Silences the per-request access log."""
+
+    server = make_server("127.0.0.1", 0, application.app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f"http://127.0.0.1:{server.server_port}/sms"
+    local = threading.local()
+
+    def post(form):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+
+        return local.session.post(url, data=form).status_code
+
+    try:
+        return drive(post, arguments.requests, arguments.concurrency)
+
+    finally:
+        server.shutdown()
+
+
+def compare(results, baseline_path):
+    """
+    Prints how the results differ from an earlier run.
+
+    :param results: Results of this run
+    :param baseline_path: Path of an earlier results file
+    """
+
+    with open(baseline_path, "r") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    print(f"\nCompared with {baseline_path}:")
+
+    for mode, result in results["modes"].items():
+        if mode not in baseline["modes"]:
+            continue
+
+        before = baseline["modes"][mode]
+        print(f"  {mode}:")
+        print(f"    requests_per_second: {before['requests_per_second']:.1f} -> {result['requests_per_second']:.1f}")
+
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = result["latency"][key] / before["latency"][key] - 1 if before["latency"][key] else 0
+            print(f"    {key}: {before['latency'][key]:.2f} -> {result['latency'][key]:.2f} ({change:+.1%})")
+
+
+def parse_arguments(argv=None):
+    """Parses the command line."""
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="number of /sms requests per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--modes", nargs="+", default=["test-client", "server"], choices=["test-client", "server"])
+    parser.add_argument("--cat-api-latency", type=float, default=0.05, help="seconds added to each TheCatAPI call")
+    parser.add_argument("--twilio-latency", type=float, default=0.1, help="seconds added to each Twilio call")
+    parser.add_argument("--image-pool-size", type=int, default=10, help="CAT_IMAGE_POOL_SIZE for the run")
+    parser.add_argument("--intent-cache-size", type=int, default=4096, help="INTENT_CACHE_SIZE for the run")
+    parser.add_argument("--log-level", default="WARNING", help="application log level during the run")
+    parser.add_argument("--output", help="results file; defaults to a timestamped file in benchmarks/results/")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+
+    cat_api_stub = StubServer(CatAPIStubHandler, latency=arguments.cat_api_latency).start()
+    twilio_stub = StubServer(TwilioStubHandler, latency=arguments.twilio_latency).start()
+    configure_environment(arguments, cat_api_stub.url, twilio_stub.url)
+
+    import_start = time.perf_counter()
+    import application
+
+    import_time = time.perf_counter() - import_start
+    logging.getLogger().setLevel(arguments.log_level)
+
+    stage_timer = StageTimer()
+    instrument(application, stage_timer)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+
+    except OSError:
+        commit = None
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "config": {key: value for key, value in vars(arguments).items() if key not in {"output", "compare"}},
+        "import_seconds": import_time,
+        "modes": {},
+    }
+
+    runners = {"test-client": run_test_client, "server": run_server}
+
+    for mode in arguments.modes:
+        stage_timer.reset()
+        latencies, wall_time, failures = runners[mode](application, arguments)
+
+        # Replies are sent in the background; wait for them so the send stage is complete
+        application.delivery_queue.join()
+
+        results["modes"][mode] = {
+            "requests": len(latencies),
+            "failures": failures,
+            "wall_seconds": wall_time,
+            "requests_per_second": len(latencies) / wall_time,
+            "latency": summarize(latencies),
+            "stages": {stage: summarize(durations) for stage, durations in stage_timer.durations.items()},
+        }
+
+    # Import-to-ready and import-to-first-response times as measured by the application
+    results["startup"] = dict(application.startup)
+
+    cat_api_stub.stop()
+    twilio_stub.stop()
+
+    output = arguments.output
+
+    if not output:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        output = os.path.join(RESULTS_DIRECTORY, datetime.now().strftime("%Y%m%d_%H%M%S") + "-sms.json")
+
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=4)
+
+    for mode, result in results["modes"].items():
+        latency = result["latency"]
+        print(
+            f"{mode}: {result['requests_per_second']:.1f} req/s, p50 {latency['p50_ms']:.2f} ms, "
+            f"p95 {latency['p95_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms, {result['failures']} failures"
+        )
+
+        for stage, summary in result["stages"].items():
+            print(f"    {stage:>13}: {summary['count']:6d} calls, mean {summary['mean_ms']:.3f} ms")
+
+    print(f"Results written to {output}")
+
+    if arguments.compare:
+        compare(results, arguments.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CATEGORIES = [
+    {"id": 1, "name": "hats"},
+    {"id": 2, "name": "space"},
+    {"id": 4, "name": "sunglasses"},
+    {"id": 5, "name": "boxes"},
+    {"id": 7, "name": "ties"},
+    {"id": 14, "name": "sinks"},
+    {"id": 15, "name": "clothes"},
+]
+
+BREEDS = [
+    {"id": "abys", "name": "Abyssinian"},
+    {"id": "asho", "name": "American Shorthair"},
+    {"id": "beng", "name": "Bengal"},
+    {"id": "crex", "name": "Cornish Rex"},
+    {"id": "drex", "name": "Devon Rex"},
+    {"id": "emau", "name": "Egyptian Mau"},
+    {"id": "java", "name": "Javanese"},
+    {"id": "mcoo", "name": "Maine Coon"},
+    {"id": "norw", "name": "Norwegian Forest Cat"},
+    {"id": "pers", "name": "Persian"},
+    {"id": "pixi", "name": "Pixie-bob"},
+    {"id": "rblu", "name": "Russian Blue"},
+    {"id": "siam", "name": "Siamese"},
+    {"id": "sphy", "name": "Sphynx"},
+]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Base request handler for the stub APIs: keeps connections alive and waits for the injected latency."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        """Silences the per-request access log."""
+
+    def _send_json(self, status, payload):
+        """
+        Waits for the injected latency and sends a JSON response.
+
+        :param status: HTTP status code
+        :param payload: JSON serializable response body
+        """
+
+        time.sleep(self.server.latency)
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        """Reads the request body."""
+
+        return self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+
+
+class CatAPIStubHandler(StubHandler):
+    """Stand-in for the TheCatAPI endpoints used by CatAPIHandler."""
+
+    image_ids = itertools.count()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+
+        if url.path.endswith("/categories"):
+            self._send_json(200, CATEGORIES)
+
+        elif url.path.endswith("/breeds"):
+            self._send_json(200, BREEDS)
+
+        elif url.path.endswith("/images/search"):
+            limit = int(parse_qs(url.query).get("limit", ["1"])[0])
+            images = [
+                {"id": str(image_id), "url": f"https://cdn2.thecatapi.com/images/{image_id}.jpg"}
+                for image_id in itertools.islice(self.image_ids, limit)
+            ]
+            self._send_json(200, images)
+
+        else:
+            self._send_json(404, {"message": "Not Found"})
+
+
+class TwilioStubHandler(StubHandler):
+    """Stand-in for the Twilio REST endpoints used by TwilioMessageHandler."""
+
+    def do_GET(self):
+        if urlsplit(self.path).path.endswith("/IncomingPhoneNumbers.json"):
+            self._send_json(
+                200,
+                {
+                    "incoming_phone_numbers": [],
+                    "meta": {"key": "incoming_phone_numbers", "next_page_url": None, "page_size": 50},
+                },
+            )
+
+        else:
+            self._send_json(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        if not urlsplit(self.path).path.endswith("/Messages.json"):
+            self._send_json(404, {"message": "Not Found"})
+            return
+
+        form = parse_qs(self._read_body())
+        prefix = "MM" if form.get("MediaUrl", [""])[0] else "SM"
+        self._send_json(
+            201,
+            {
+                "sid": prefix + uuid.uuid4().hex,
+                "status": "queued",
+                "to": form.get("To", [""])[0],
+                "from": form.get("From", [""])[0],
+                "body": form.get("Body", [""])[0],
+            },
+        )
+
+
+class StubServer:
+    """Class to run a stub API on a local port in a background thread."""
+
+    def __init__(self, handler_class, latency=0.0):
+        """
+        Initializes the server on a free local port.
+
+        :param handler_class: Request handler class serving the stub API
+        :param latency: Seconds to wait before answering each request
+        """
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        """Returns the base url of the server."""
+
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Starts serving in the background."""
+
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,105 @@
+"""
+Sends the cat of the day to every subscriber.
+
+    python broadcast.py subscribe +15555555555 --category box
+    python broadcast.py unsubscribe +15555555555
+    python broadcast.py run
+    python broadcast.py schedule
+
+`subscribe` defaults to MY_NUMBER. `run` sends today's broadcast, resuming it if an earlier run was interrupted.
+`schedule` keeps running and sends the broadcast every day at BROADCAST_TIME.
+"""
+
+import argparse
+import os
+
+from src.broadcast import BroadcastEngine, DailyScheduler
+from src.logging_setup import configure_logging
+from src.rate_limiter import TokenBucket
+from src.subscriber_store import SubscriberStore
+from src.utilities import BROADCAST_DB_PATH, BROADCAST_RATE, BROADCAST_TIME, LOG_FORMAT, LOG_LEVEL, MY_NUMBER
+
+
+def create_engine(store):
+    """
+    Creates the broadcast engine with its own TheCatAPI and Twilio handlers.
+
+    :param store: SubscriberStore to broadcast to
+    :return: BroadcastEngine
+    """
+
+    from src.the_cat_api_handler import CatAPIHandler
+    from src.twilio_messaging import TwilioMessageHandler
+
+    # Every message of a broadcast is sent at BROADCAST_RATE, so no burst beyond a single message is allowed
+    return BroadcastEngine(store, CatAPIHandler(), TwilioMessageHandler(), TokenBucket(BROADCAST_RATE, capacity=1))
+
+
+def parse_arguments(argv=None):
+    """Parses the command line."""
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    subscribe = commands.add_parser("subscribe", help="add a subscriber or change their segment")
+    subscribe.add_argument("number", nargs="?", default=MY_NUMBER)
+    subscribe.add_argument("--category", help="category of the images to receive, e.g. box or hat")
+    subscribe.add_argument("--breed", help="breed of the images to receive, e.g. siamese")
+
+    unsubscribe = commands.add_parser("unsubscribe", help="stop sending to a subscriber")
+    unsubscribe.add_argument("number", nargs="?", default=MY_NUMBER)
+
+    run = commands.add_parser("run", help="send or resume a broadcast")
+    run.add_argument("--run-id", help="id of the run to send or resume; defaults to today's date")
+
+    commands.add_parser("schedule", help="send the broadcast every day at BROADCAST_TIME")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    configure_logging(log_directory=f"{os.getcwd()}/logs", log_format=LOG_FORMAT, level=LOG_LEVEL)
+    store = SubscriberStore(BROADCAST_DB_PATH)
+
+    if arguments.command == "subscribe":
+        keyword_matcher = None
+
+        if arguments.category or arguments.breed:
+            from src.the_cat_api_handler import CatAPIHandler
+
+            # A segment TheCatAPI does not know would silently get random cats
+            keyword_matcher = CatAPIHandler().keyword_matcher
+
+        try:
+            store.subscribe(
+                arguments.number, category=arguments.category, breed=arguments.breed, keyword_matcher=keyword_matcher
+            )
+
+        except ValueError as error:
+            raise SystemExit(f"{error}; not subscribed")
+
+        print(f"Subscribed {arguments.number}; {store.count()} subscriber(s)")
+
+    elif arguments.command == "unsubscribe":
+        found = store.unsubscribe(arguments.number)
+        print(f"Unsubscribed {arguments.number}" if found else f"{arguments.number} is not subscribed")
+
+    elif arguments.command == "run":
+        print(create_engine(store).run(arguments.run_id))
+
+    elif arguments.command == "schedule":
+        engine = create_engine(store)
+
+        def job(run_id):
+            # A restart after the day's broadcast has finished must not start it again
+            if not store.is_finished(run_id):
+                engine.run(run_id)
+
+        scheduler = DailyScheduler(job, time_of_day=BROADCAST_TIME)
+        scheduler.start()
+        scheduler.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Serves the application from several worker processes forked from one fully loaded parent.
+
+    python serve.py --workers 4 --port 5000
+
+The parent creates the TheCatAPI, Twilio and NLP handlers before forking, so the NLTK corpora, WordNet and the
+category and breed tables are loaded once and shared copy-on-write by every worker. The memory use (RSS and PSS) of
+the parent and each worker is logged every SERVE_MEMORY_REPORT_INTERVAL seconds.
+
+The webhook deduplication, rate limits, sessions and intent cache are shared by the workers through SQLite files
+under cache/ unless IDEMPOTENCY_PATH, RATE_LIMIT_PATH, SESSION_PATH and INTENT_CACHE_PATH point elsewhere.
+"""
+
+import argparse
+import logging
+import os
+
+# The handlers must exist before the workers are forked, and no warm up thread may be running at the fork; this has to
+# be set before src.utilities reads the environment
+os.environ["STARTUP_MODE"] = "eager"
+
+# State that must be shared by the workers, e.g. so a retried webhook landing on another worker is still recognized;
+# without these files every worker would keep its own copy in memory
+SHARED_STATE_PATHS = {
+    "IDEMPOTENCY_PATH": f"{os.getcwd()}/cache/idempotency.db",
+    "RATE_LIMIT_PATH": f"{os.getcwd()}/cache/rate_limits.db",
+    "SESSION_PATH": f"{os.getcwd()}/cache/sessions.db",
+    "INTENT_CACHE_PATH": f"{os.getcwd()}/cache/intents.db",
+}
+
+for name, path in SHARED_STATE_PATHS.items():
+    os.environ.setdefault(name, path)
+
+from src.prefork import PreforkServer
+from src.utilities import SERVE_HOST, SERVE_MEMORY_REPORT_INTERVAL, SERVE_PORT, SERVE_WORKERS
+
+
+def parse_arguments(argv=None):
+    """Parses the command line."""
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVE_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVE_PORT, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="number of worker processes")
+    parser.add_argument(
+        "--memory-report-interval",
+        type=float,
+        default=SERVE_MEMORY_REPORT_INTERVAL,
+        help="seconds between memory reports; 0 disables them",
+    )
+
+    arguments = parser.parse_args(argv)
+    unshared = [name for name in SHARED_STATE_PATHS if not os.environ.get(name)]
+
+    if arguments.workers > 1 and unshared:
+        parser.error(f"{', '.join(unshared)} must be set to serve with more than one worker")
+
+    return arguments
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+
+    # Importing the application configures logging and, with STARTUP_MODE=eager, creates the handlers
+    import application
+
+    application.warm_up(background=False).wait()
+
+    server = PreforkServer(
+        application.app,
+        host=arguments.host,
+        port=arguments.port,
+        workers=arguments.workers,
+        memory_report_interval=arguments.memory_report_interval,
+        on_worker_exit=application.shutdown,
+    )
+    server.bind()
+    logging.info("Handlers ready after %.3fs", application.startup["ready_seconds"])
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+from functools import partial
+
+import httpx
+
+from src.circuit_breaker import CircuitOpenError
+from src.image_pool import ImagePool
+from src.single_flight import AsyncSingleFlight
+from src.the_cat_api_handler import CAT_API_HEADER, CAT_API_URL, MAX_EXCLUDED_FETCHES, CatAPIError, CatAPIHandler
+
+
+class AsyncCatAPIHandler:
+    """Class to handle TheCatAPI services from asyncio code using a shared, connection-pooled HTTP client."""
+
+    def __init__(self, client, cat_api=None):
+        """
+        Initializes the handler. The category and breed ids, keyword matcher and image pool are shared with a
+        synchronous CatAPIHandler; only the request path is asynchronous.
+
+        :param client: httpx.AsyncClient used for every request
+        :param cat_api: CatAPIHandler holding the id tables and image pool; one is created if not given
+        """
+
+        self.client = client
+        self.cat_api = cat_api or CatAPIHandler()
+        # Bound lazily: reading an attribute of a LazyProxy would create the synchronous handler right away
+        self.single_flight = AsyncSingleFlight(on_leftovers=lambda key, items: self.cat_api._pool_leftovers(key, items))
+
+    @property
+    def keyword_matcher(self):
+        """Returns the keyword matcher compiled from the current category and breed ids."""
+
+        return self.cat_api.keyword_matcher
+
+    async def _fetch_image_urls(self, parameters, limit=1):
+        """
+        Sends a request to TheCatAPI image search through the synchronous handler's circuit breaker.
+
+        :param parameters: Dict of search parameters
+        :param limit: Number of images to request in one call
+        :return: List of image urls
+        :raises CircuitOpenError: If TheCatAPI has been failing and is not being called
+        """
+
+        circuit_breaker = self.cat_api.circuit_breaker
+
+        if not circuit_breaker.allow_request():
+            raise CircuitOpenError(f"Circuit {circuit_breaker.name} is open")
+
+        try:
+            response = await self.client.get(
+                CAT_API_URL + "/images/search",
+                headers=CAT_API_HEADER,
+                params={**parameters, "limit": limit},
+            )
+            image_urls = self.cat_api._parse_image_urls(parameters, limit, response.status_code, response.json())
+
+        except Exception:
+            circuit_breaker.record_failure()
+            raise
+
+        # A cancelled request, e.g. after the client disconnected, says nothing about TheCatAPI but must not keep the
+        # probe slot of a half-open circuit
+        except BaseException:
+            circuit_breaker.release()
+            raise
+
+        circuit_breaker.record_success()
+        self.cat_api._remember_images(parameters, image_urls)
+
+        return image_urls
+
+    async def _fetch_shared_image(self, parameters, exclude=()):
+        """
+        Fetches an image url for a search, sharing one TheCatAPI call between every concurrent search with the same
+        parameters, as CatAPIHandler does.
+
+        :param parameters: Dict of search parameters
+        :param exclude: Image urls not to return unless MAX_EXCLUDED_FETCHES calls found nothing else
+        :return: Image url
+        :raises CatAPIError: If every attempt ended with the batch taken by other searches
+        """
+
+        key = ImagePool._key(parameters)
+        fetch = partial(self._fetch_image_urls, parameters, limit=self.cat_api.fetch_limit)
+
+        for attempt in range(MAX_EXCLUDED_FETCHES + 1):
+            skip = exclude if attempt < MAX_EXCLUDED_FETCHES else ()
+            image_url = await self.single_flight.take(key, fetch, skip)
+
+            if image_url is None:
+                image_url = self.cat_api._get_pooled_image(parameters, skip)
+
+            if image_url is not None:
+                return image_url
+
+        raise CatAPIError(f"No image left for {parameters} after {MAX_EXCLUDED_FETCHES + 1} attempts")
+
+    async def get_cat_image(self, category=None, breed=None, exclude=()):
+        """
+        Retrieves an image url from the pre-fetched pool, falling back to a request to TheCatAPI.
+
+        :param category: Optional parameter to get an image of a cat with a particular category.
+        :param breed: Optional parameter to get an image of a cat that is a specified breed.
+        :param exclude: Optional collection of image urls not to return, e.g. those already sent to the requester.
+        :return: Tuple containing the image url and text message.
+        """
+
+        self.cat_api.refresh_ids_if_stale()
+
+        parameters, message = self.cat_api._get_search_parameters(category=category, breed=breed)
+        image_url = self.cat_api._get_pooled_image(parameters, exclude)
+        pool_hit = image_url is not None
+
+        if not pool_hit:
+            try:
+                image_url = await self._fetch_shared_image(parameters, exclude)
+
+            except (CircuitOpenError, CatAPIError, httpx.HTTPError, ValueError) as error:
+                return self.cat_api._fallback_image(parameters, message, error)
+
+        self.cat_api._log_image_request(category, breed, parameters, pool_hit)
+
+        return image_url, message
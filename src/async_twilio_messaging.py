@@ -0,0 +1,66 @@
+import logging as log
+
+import httpx
+
+from src.utilities import TWILIO_API_URL, TwilioCredentials
+
+
+class AsyncTwilioMessageHandler:
+    """Class to send Twilio messages from asyncio code through the Twilio REST API."""
+
+    def __init__(self, client):
+        """
+        Initializes the handler. Unlike TwilioMessageHandler, no request is made to verify the credentials; a send
+        with bad credentials fails with an HTTP error instead.
+
+        :param client: httpx.AsyncClient used for every request
+        """
+
+        self.client = client
+        self.twilio_credentials = TwilioCredentials()
+        self.successful_auth = not self.twilio_credentials.empty_credentials
+
+    async def send_message(self, receiving_number, text_message, image_url=None):
+        """
+        Uses Twilio to send a message to a specified number.
+
+        :param receiving_number: Number that will be receiving the message
+        :param text_message: Body of the text that will be sent
+        :param image_url: String url of the image that will be sent
+        :return: String containing the message security identifier
+        """
+
+        if not self.successful_auth:
+            return
+
+        data = {"From": self.twilio_credentials.phone_number, "To": receiving_number, "Body": text_message}
+
+        if image_url:
+            data["MediaUrl"] = image_url
+
+        response = await self.client.post(
+            f"{TWILIO_API_URL}/2010-04-01/Accounts/{self.twilio_credentials.account_sid}/Messages.json",
+            data=data,
+            auth=(self.twilio_credentials.account_sid, self.twilio_credentials.auth_token),
+        )
+        response.raise_for_status()
+        message = response.json()
+
+        log.info("Message to %s has been %s with SID %s", receiving_number, message["status"], message["sid"])
+
+        return message["sid"]
+
+    @staticmethod
+    def is_transient_error(error):
+        """
+        Determines whether a failed send is worth retrying. As in TwilioMessageHandler, transport errors are only
+        retried when raised while connecting, as Twilio may have accepted a message whose response never arrived.
+
+        :param error: Exception raised while sending a message
+        :return: True if the send should be retried; False otherwise
+        """
+
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
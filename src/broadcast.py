@@ -0,0 +1,212 @@
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from functools import partial
+
+from src.twilio_messaging import FAILED, UNKNOWN
+
+
+class BroadcastEngine:
+    """Class to send the cat of the day to every subscriber, one image per category or breed segment."""
+
+    def __init__(self, store, cat_api, twilio, rate_limiter, page_size=500):
+        """
+        Initializes the engine.
+
+        :param store: SubscriberStore holding the subscribers and the progress of each run
+        :param cat_api: CatAPIHandler picking the images
+        :param twilio: TwilioMessageHandler sending the messages with send_many
+        :param rate_limiter: TokenBucket limiting the rate of sends to the sending number's throughput
+        :param page_size: Number of subscribers read from the store at a time
+        """
+
+        self.store = store
+        self.cat_api = cat_api
+        self.twilio = twilio
+        self.rate_limiter = rate_limiter
+        self.page_size = page_size
+
+    def _segment_image(self, run_id, category, breed):
+        """
+        Picks the image of a segment, reusing the one picked earlier in the run so a resumed run sends the same image.
+
+        :param run_id: Broadcast run id
+        :param category: Category of the segment, or None
+        :param breed: Breed of the segment, or None
+        :return: Tuple of (image url, text message), or None if no image is available
+        """
+
+        picked = self.store.get_segment_image(run_id, category, breed)
+
+        if picked is None:
+            image_url, message = self.cat_api.get_cat_image(category=category, breed=breed)
+
+            if image_url is None:
+                # TheCatAPI is unavailable and no fallback image is remembered; the message is only an apology, so
+                # nothing is saved and a resumed run picks the image again
+                return None
+
+            picked = self.store.save_segment_image(run_id, category, breed, image_url, message)
+
+        return picked
+
+    def _claimed_messages(self, run_id, numbers, image_url, message):
+        """
+        Claims the deliveries of a page one at a time, as send_many asks for the next message to send.
+
+        :param run_id: Broadcast run id
+        :param numbers: Phone numbers of the subscribers
+        :param image_url: Url of the segment's image
+        :param message: Text sent with the image
+        :return: Generator of (number, text message, image url) tuples for send_many
+        """
+
+        for number in numbers:
+            if self.store.claim(run_id, number):
+                yield number, message, image_url
+
+    def _record(self, run_id, result):
+        """
+        Records the outcome of a claimed delivery.
+
+        :param run_id: Broadcast run id
+        :param result: Result of TwilioMessageHandler.send_many for the delivery
+        """
+
+        number, status, error = result["to"], result["status"], result["error"]
+        self.store.record(run_id, number, status, sid=result["sid"], error=error)
+
+        if status == FAILED:
+            # Twilio did not accept the message, so it can be tried again when the run is resumed
+            logging.warning("Broadcast %s to %s failed: %s", run_id, number, error)
+
+        elif status == UNKNOWN:
+            # The message may or may not have been accepted; it is not retried so nobody receives it twice
+            logging.error("Broadcast %s to %s has an unknown outcome: %s", run_id, number, error)
+
+    def run(self, run_id=None):
+        """
+        Sends the broadcast, or resumes it if it was interrupted. Subscribers already messaged by the run are skipped.
+
+        :param run_id: Broadcast run id; defaults to today's date, so each day has one run
+        :return: Dict mapping delivery status to count for the run
+        """
+
+        run_id = run_id or date.today().isoformat()
+        self.store.start_run(run_id)
+        logging.info("Broadcast %s started for %d subscribers", run_id, self.store.count())
+
+        for category, breed in self.store.segments():
+            try:
+                picked = self._segment_image(run_id, category, breed)
+
+            except Exception as error:
+                logging.error("Broadcast %s skipped segment category=%s breed=%s: %s", run_id, category, breed, error)
+                continue
+
+            if picked is None:
+                logging.error("Broadcast %s skipped segment category=%s breed=%s: no image", run_id, category, breed)
+                continue
+
+            image_url, message = picked
+
+            after = ""
+
+            while True:
+                numbers = self.store.pending_numbers(run_id, category, breed, after=after, limit=self.page_size)
+
+                if not numbers:
+                    break
+
+                # Outcomes are recorded as each message is sent, so an interrupted run resumes where it stopped
+                self.twilio.send_many(
+                    self._claimed_messages(run_id, numbers, image_url, message),
+                    rate_limiter=self.rate_limiter,
+                    on_result=partial(self._record, run_id),
+                )
+
+                after = numbers[-1]
+
+        self.store.finish_run(run_id)
+        summary = self.store.run_summary(run_id)
+        logging.info("Broadcast %s finished: %s", run_id, summary)
+
+        return summary
+
+
+class DailyScheduler:
+    """Class to call a job once a day at a fixed local time from a background thread."""
+
+    def __init__(self, job, time_of_day="09:00"):
+        """
+        Initializes the scheduler.
+
+        :param job: Callable taking the run id, i.e. the date of the run as YYYY-MM-DD
+        :param time_of_day: Local time of the daily run as HH:MM
+        """
+
+        self.job = job
+        hour, minute = time_of_day.split(":")
+        self.hour = int(hour)
+        self.minute = int(minute)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_run(self, now=None):
+        """
+        Works out when the job runs next.
+
+        :param now: Current local datetime; defaults to now
+        :return: datetime of the next run
+        """
+
+        now = now or datetime.now()
+        scheduled = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+
+        return scheduled if scheduled > now else scheduled + timedelta(days=1)
+
+    def _run_job(self, run_date):
+        try:
+            self.job(run_date.isoformat())
+
+        except Exception:
+            logging.exception("Scheduled broadcast for %s failed", run_date)
+
+    def _run(self, catch_up):
+        now = datetime.now()
+
+        # Today's run may have been missed or interrupted by a restart; the job's checkpoints make a rerun safe
+        if catch_up and now >= now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0):
+            self._run_job(now.date())
+
+        while True:
+            scheduled = self.next_run()
+
+            if self._stop.wait((scheduled - datetime.now()).total_seconds()):
+                return
+
+            self._run_job(scheduled.date())
+
+    def start(self, catch_up=True):
+        """
+        Starts the scheduler thread.
+
+        :param catch_up: Run today's job immediately if its time has already passed
+        """
+
+        self._thread = threading.Thread(target=self._run, args=(catch_up,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the scheduler thread after any job in progress."""
+
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait(self):
+        """Blocks until the scheduler is stopped."""
+
+        self._thread.join()
@@ -0,0 +1,348 @@
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import requests
+
+from src.connection_pools import reset_after_fork
+
+# Words in the object of a request that ask for a fact rather than an image, e.g. "send me a cat fact"
+FACT_WORDS = {"fact", "trivia"}
+
+# Facts served by the local source, e.g. in tests or when no fact API is configured
+DEFAULT_FACTS = [
+    "Cats sleep for around 13 to 16 hours a day.",
+    "A group of cats is called a clowder.",
+    "Cats have five toes on their front paws but only four on their back paws.",
+    "A cat's nose print is unique, much like a human fingerprint.",
+    "Cats can rotate their ears 180 degrees.",
+    "Adult cats meow mostly to communicate with people, not with other cats.",
+    "A cat can jump up to six times its own length.",
+    "Cats walk like camels and giraffes, moving both right feet and then both left feet.",
+    "The oldest known pet cat was found in a 9,500 year old grave on Cyprus.",
+    "Cats use their whiskers to judge whether they can fit through an opening.",
+]
+
+
+def is_fact_request(obj):
+    """
+    Determines whether the object of a request asks for a cat fact.
+
+    :param obj: Object of the request, e.g. "cat fact"
+    :return: True if the object contains a fact word; False otherwise
+    """
+
+    return bool(FACT_WORDS.intersection(obj.split()))
+
+
+class StaticFactSource:
+    """Class to serve facts from a local list instead of a fact API."""
+
+    def __init__(self, facts=None):
+        """
+        Initializes the source.
+
+        :param facts: List of facts; defaults to DEFAULT_FACTS
+        """
+
+        self.facts = list(DEFAULT_FACTS if facts is None else facts)
+
+    def fetch(self, limit):
+        """
+        Returns up to `limit` facts.
+
+        :param limit: Maximum number of facts
+        :return: List of facts
+        """
+
+        return self.facts[:limit]
+
+
+class HTTPFactSource:
+    """
+    Class to download facts in bulk from a fact API such as https://catfact.ninja/facts, which pages through
+    {"data": [{"fact": ...}, ...], "last_page": ...} responses. Plain JSON lists of strings or of objects with a
+    "fact" or "text" field are accepted too.
+    """
+
+    def __init__(self, url, page_size=100, timeout=10):
+        """
+        Initializes the source.
+
+        :param url: Url of the fact list
+        :param page_size: Number of facts requested per page
+        :param timeout: Seconds to wait for each page
+        """
+
+        self.url = url
+        self.page_size = page_size
+        self.timeout = timeout
+        self.session = reset_after_fork(requests.Session())
+
+    @staticmethod
+    def _parse(data):
+        """
+        Extracts the facts from a response, skipping entries that are not a fact.
+
+        :param data: Decoded JSON response
+        :return: Tuple of (list of facts, whether more pages follow)
+        """
+
+        has_more = False
+
+        if isinstance(data, dict):
+            try:
+                has_more = int(data.get("current_page", 1)) < int(data.get("last_page", 1))
+
+            except (TypeError, ValueError):
+                pass
+
+            data = data.get("data", [])
+
+        if not isinstance(data, list):
+            logging.warning("Ignoring cat facts response holding %s instead of a list", type(data).__name__)
+            return [], False
+
+        facts = []
+        skipped = 0
+
+        for item in data:
+            try:
+                fact = (item if isinstance(item, str) else item.get("fact") or item.get("text")).strip()
+
+            except (AttributeError, KeyError, TypeError):
+                skipped += 1
+                continue
+
+            if fact:
+                facts.append(fact)
+
+        if skipped:
+            logging.warning("Skipped %d malformed cat facts", skipped)
+
+        return facts, has_more
+
+    def fetch(self, limit):
+        """
+        Downloads up to `limit` facts, a page at a time.
+
+        :param limit: Maximum number of facts
+        :return: List of facts
+        :raises requests.RequestException: If a page cannot be downloaded
+        :raises ValueError: If a page is not valid JSON
+        """
+
+        facts = []
+        page = 1
+
+        while len(facts) < limit:
+            response = self.session.get(self.url, params={"limit": self.page_size, "page": page}, timeout=self.timeout)
+            response.raise_for_status()
+            page_facts, has_more = self._parse(response.json())
+            facts.extend(page_facts)
+
+            if not has_more or not page_facts:
+                break
+
+            page += 1
+
+        return facts[:limit]
+
+
+class FactStore:
+    """Class to keep facts in a SQLite file, indexed by length so a fact that fits a message is found quickly."""
+
+    def __init__(self, path):
+        """
+        Initializes the store, creating the database file and table if necessary.
+
+        :param path: Path of the SQLite database file
+        """
+
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS facts (id INTEGER PRIMARY KEY, fact TEXT NOT NULL UNIQUE, "
+            "length INTEGER NOT NULL, added_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS facts_length ON facts (length)")
+
+    def _connection(self):
+        """
+        Returns this thread's connection to the database; sqlite3 connections cannot be shared between threads.
+
+        :return: sqlite3.Connection
+        """
+
+        connection = getattr(self._local, "connection", None)
+
+        # A connection inherited from a parent process must not be used after a fork
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    def add(self, facts):
+        """
+        Adds facts, skipping those already stored.
+
+        :param facts: Iterable of facts
+        :return: Number of facts added
+        """
+
+        connection = self._connection()
+        changes = connection.total_changes
+        now = time.time()
+
+        # One transaction for the whole batch rather than one per fact
+        connection.execute("BEGIN")
+
+        try:
+            connection.executemany(
+                "INSERT OR IGNORE INTO facts (fact, length, added_at) VALUES (?, ?, ?)",
+                [(fact, len(fact), now) for fact in facts if fact],
+            )
+            connection.execute("COMMIT")
+
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        return connection.total_changes - changes
+
+    def count(self):
+        return self._connection().execute("SELECT count(*) FROM facts").fetchone()[0]
+
+    def random_fact(self, max_length=None):
+        """
+        Picks a random fact without scanning the table: a random id is drawn and the first fact from there on is
+        taken, wrapping around to the start.
+
+        :param max_length: Longest fact accepted; None accepts any
+        :return: Fact, or None if no stored fact is short enough
+        """
+
+        connection = self._connection()
+        max_id = connection.execute("SELECT max(id) FROM facts").fetchone()[0]
+
+        if max_id is None:
+            return None
+
+        start = random.randint(1, max_id)
+        max_length = max_length or 2**31
+
+        for query in (
+            "SELECT fact FROM facts WHERE id >= ? AND length <= ? ORDER BY id LIMIT 1",
+            "SELECT fact FROM facts WHERE id < ? AND length <= ? ORDER BY id LIMIT 1",
+        ):
+            row = connection.execute(query, (start, max_length)).fetchone()
+
+            if row:
+                return row[0]
+
+        return None
+
+
+class CatFacts:
+    """
+    Class to serve cat facts from a local store that is filled in bulk from a fact source, so answering a request
+    never waits on the network.
+    """
+
+    def __init__(self, store, source, prefetch_size=500, low_water_mark=20):
+        """
+        Initializes the facts, downloading them if the store has fewer than `low_water_mark`.
+
+        :param store: FactStore
+        :param source: Fact source with a fetch(limit) method, e.g. HTTPFactSource or StaticFactSource
+        :param prefetch_size: Number of facts requested from the source at a time
+        :param low_water_mark: Number of stored facts below which the store is filled from the source
+        """
+
+        self.store = store
+        self.source = source
+        self.prefetch_size = prefetch_size
+        self.low_water_mark = low_water_mark
+
+        self._prefetch_lock = threading.Lock()
+
+        self.served = 0
+        self.misses = 0
+
+        if store.count() < low_water_mark:
+            self.prefetch()
+
+    def prefetch(self):
+        """
+        Downloads facts from the source into the store.
+
+        :return: Number of new facts stored
+        """
+
+        try:
+            facts = self.source.fetch(self.prefetch_size)
+
+        except (requests.RequestException, ValueError) as error:
+            logging.warning("Failed to prefetch cat facts: %s", error)
+            return 0
+
+        added = self.store.add(facts)
+        logging.info("Prefetched %d cat facts, %d new", len(facts), added)
+        return added
+
+    def prefetch_in_background(self):
+        """Starts a prefetch on a background thread unless one is already running."""
+
+        if not self._prefetch_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.prefetch()
+
+            finally:
+                self._prefetch_lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get_fact(self, max_length=None):
+        """
+        Picks a stored fact. If none is stored yet, e.g. because the source was down at startup, a prefetch is started
+        for the next request.
+
+        :param max_length: Longest fact accepted, e.g. to fit a fact under an image caption; None accepts any
+        :return: Fact, or None if no fact is available
+        """
+
+        fact = self.store.random_fact(max_length)
+
+        if fact is None:
+            self.misses += 1
+
+            if self.store.count() < self.low_water_mark:
+                self.prefetch_in_background()
+
+            return None
+
+        self.served += 1
+        return fact
+
+    def stats(self):
+        """
+        Returns the state of the facts.
+
+        :return: Dict with the number of stored facts, facts served and requests without a fact
+        """
+
+        return {"facts": self.store.count(), "served": self.served, "misses": self.misses}
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Class to stop calling a failing dependency for a while. After `failure_threshold` consecutive failures the circuit
+    opens and calls fail immediately. Once `recovery_timeout` seconds have passed, a single probe call is let through
+    (half-open): if it succeeds the circuit closes again, otherwise it stays open for another timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, name="circuit"):
+        """
+        Initializes a closed circuit.
+
+        :param failure_threshold: Number of consecutive failures that open the circuit
+        :param recovery_timeout: Seconds to wait before probing an open circuit
+        :param name: Name of the dependency used in log messages
+        """
+
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.name = name
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        """Returns the state of the circuit: "closed", "open" or "half_open"."""
+
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+
+            return self._state
+
+    def allow_request(self):
+        """
+        Determines whether a call may be made now. A caller that is allowed must report the outcome with
+        record_success or record_failure, or call release if the call was abandoned.
+
+        :return: True if the call may be made; False if it should fail fast
+        """
+
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            # Only one probe at a time while the dependency may still be down
+            if not self._probing and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self._state = self.HALF_OPEN
+                self._probing = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Records a successful call, closing the circuit if it was being probed."""
+
+        with self._lock:
+            if self._state != self.CLOSED:
+                logging.info("Circuit %s closed", self.name)
+
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """Records a failed call, opening the circuit after too many in a row or when a probe fails."""
+
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state == self.CLOSED:
+                    self.times_opened += 1
+                    logging.warning("Circuit %s opened after %d consecutive failures", self.name, self._failures)
+
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Records a call abandoned before its outcome was known, e.g. because it was cancelled. The probe slot is freed
+        without counting a failure, so the next call may probe the dependency.
+        """
+
+        with self._lock:
+            self._probing = False
+
+    def call(self, function, *args, **kwargs):
+        """
+        Calls a function through the circuit.
+
+        :param function: Function calling the dependency
+        :return: Return value of the function
+        :raises CircuitOpenError: If the circuit is open
+        """
+
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+
+        try:
+            result = function(*args, **kwargs)
+
+        except Exception:
+            self.record_failure()
+            raise
+
+        except BaseException:
+            self.release()
+            raise
+
+        self.record_success()
+        return result
+
+    def stats(self):
+        """
+        Returns the state of the circuit.
+
+        :return: Dict with the state, consecutive failures, times opened and calls rejected while open
+        """
+
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
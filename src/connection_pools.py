@@ -0,0 +1,36 @@
+import os
+import weakref
+
+
+def _replace_pools(session_ref):
+    """
+    Gives every adapter of a session new, empty connection pools.
+
+    :param session_ref: Weak reference to a requests.Session
+    """
+
+    session = session_ref()
+
+    if session is None:
+        return
+
+    for adapter in session.adapters.values():
+        # The inherited pools are dropped rather than closed: their sockets are still used by the parent, and a pool
+        # lock held by another thread at the fork would never be released in the child
+        adapter.init_poolmanager(adapter._pool_connections, adapter._pool_maxsize, block=adapter._pool_block)
+        adapter.proxy_manager = {}
+
+
+def reset_after_fork(session):
+    """
+    Makes a forked child process open its own connections instead of reusing the kept-alive connections of the
+    session it inherited. Two processes writing to the same socket would interleave their requests and could read each
+    other's responses.
+
+    :param session: requests.Session whose connection pools are replaced in every child process
+    :return: The session
+    """
+
+    session_ref = weakref.ref(session)
+    os.register_at_fork(after_in_child=lambda: _replace_pools(session_ref))
+    return session
@@ -0,0 +1,232 @@
+import logging as log
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from src.utilities import percentile
+
+# Outcomes of a delivery
+DELIVERED = "delivered"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class DeliveryQueue:
+    """Class to hand outbound messages to a pool of background sender threads."""
+
+    def __init__(
+        self,
+        send_function,
+        workers=4,
+        max_backlog=1000,
+        max_retries=3,
+        backoff=0.5,
+        max_backoff=30.0,
+        is_retryable=None,
+        latency_window=1000,
+    ):
+        """
+        Initializes the queue. Sender threads are started lazily on the first enqueue so that importing the
+        application (or forking worker processes) does not leave orphaned threads behind.
+
+        :param send_function: Callable that performs a single delivery; any exception counts as a failed attempt, and
+        a return value of None as a delivery that was skipped, e.g. because Twilio is not authenticated
+        :param workers: Number of sender threads
+        :param max_backlog: Maximum number of messages waiting to be sent; further messages are rejected
+        :param max_retries: Number of times a failed delivery is retried before it is dropped
+        :param backoff: Delay in seconds before the first retry; doubled on each subsequent retry
+        :param max_backoff: Upper bound in seconds for the retry delay
+        :param is_retryable: Optional callable taking the raised exception and returning whether to retry
+        :param latency_window: Number of most recent delivery latencies kept for the statistics
+        """
+
+        self.send_function = send_function
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.is_retryable = is_retryable
+
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._owner_pid = None
+        self._in_flight = 0
+        self._latencies = deque(maxlen=latency_window)
+
+        self.delivered = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retried = 0
+        self.rejected = 0
+
+    def start(self):
+        """Starts the sender threads if they are not already running in this process."""
+
+        with self._lock:
+            if self._owner_pid == os.getpid():
+                return
+
+            self._owner_pid = os.getpid()
+            self._threads = []
+
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"delivery-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """
+        Waits for the backlog to drain and stops the sender threads.
+
+        :param timeout: Maximum number of seconds to wait for each thread
+        """
+
+        for _ in self._threads:
+            self._queue.put(None)
+
+        for thread in self._threads:
+            thread.join(timeout)
+
+        with self._lock:
+            self._threads = []
+            self._owner_pid = None
+
+    def enqueue(self, *args, **kwargs):
+        """
+        Adds a message to the backlog. Arguments are passed through to the send function.
+
+        :return: True if the message was queued, False if the backlog is full
+        """
+
+        self.start()
+
+        try:
+            self._queue.put_nowait((time.monotonic(), args, kwargs))
+
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+
+            log.warning("Delivery backlog is full; message rejected")
+            return False
+
+        return True
+
+    def join(self):
+        """Blocks until every queued message has been delivered or dropped."""
+
+        self._queue.join()
+
+    def _worker(self):
+        """Sender thread loop."""
+
+        while True:
+            item = self._queue.get()
+
+            if item is None:
+                self._queue.task_done()
+                return
+
+            enqueued_at, args, kwargs = item
+
+            with self._lock:
+                self._in_flight += 1
+
+            outcome = FAILED
+
+            try:
+                outcome = self._deliver(args, kwargs)
+
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+                    if outcome == DELIVERED:
+                        self.delivered += 1
+                        self._latencies.append(time.monotonic() - enqueued_at)
+
+                    elif outcome == SKIPPED:
+                        self.skipped += 1
+
+                    else:
+                        self.failed += 1
+
+                self._queue.task_done()
+
+    def _deliver(self, args, kwargs):
+        """
+        Calls the send function, retrying with exponential backoff on failure.
+
+        :return: DELIVERED, FAILED, or SKIPPED if the send function sent nothing
+        """
+
+        attempt = 0
+
+        while True:
+            try:
+                if self.send_function(*args, **kwargs) is None:
+                    log.warning("Delivery skipped: nothing was sent")
+                    return SKIPPED
+
+                return DELIVERED
+
+            except Exception as error:
+                retryable = self.is_retryable is None or self.is_retryable(error)
+
+                if not retryable or attempt >= self.max_retries:
+                    log.error("Delivery failed after %d attempt(s): %s", attempt + 1, error)
+                    return FAILED
+
+                delay = min(self.backoff * 2**attempt, self.max_backoff)
+                log.warning("Delivery attempt %d failed (%s); retrying in %.2fs", attempt + 1, error, delay)
+
+                with self._lock:
+                    self.retried += 1
+
+                time.sleep(delay)
+                attempt += 1
+
+    @property
+    def depth(self):
+        """Returns the number of messages waiting to be sent."""
+
+        return self._queue.qsize()
+
+    @property
+    def in_flight(self):
+        """Returns the number of messages currently being sent."""
+
+        return self._in_flight
+
+    def stats(self):
+        """
+        Returns a snapshot of the queue for monitoring.
+
+        :return: Dict with queue depth, in-flight count, counters and latency percentiles in seconds
+        """
+
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "queue_depth": self._queue.qsize(),
+                "in_flight": self._in_flight,
+                "workers": len(self._threads),
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "retried": self.retried,
+                "rejected": self.rejected,
+            }
+
+        stats["latency"] = {
+            "count": len(latencies),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        }
+
+        return stats
@@ -0,0 +1,169 @@
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+
+class FallbackImages:
+    """
+    Class to remember image urls that TheCatAPI has returned for each kind of image search, so replies can still
+    include a cat while TheCatAPI is unavailable. The urls are kept in a local JSON file between restarts.
+    """
+
+    def __init__(self, path=None, size=50, save_interval=60.0):
+        """
+        Initializes the store, loading the urls saved by an earlier run.
+
+        :param path: Path of the JSON file; None keeps the urls in memory only
+        :param size: Number of urls to keep for each search
+        :param save_interval: Minimum number of seconds between two writes of the file by save_later
+        """
+
+        self.path = path
+        self.size = size
+        self.save_interval = save_interval
+
+        self._urls = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_scheduled = False
+        self._saved_at = float("-inf")
+
+        if path:
+            self._load()
+            # Urls added since the last scheduled save are written on a clean exit
+            atexit.register(self._save_quietly)
+            # A save scheduled in a parent process when it forks has no timer thread in the child
+            os.register_at_fork(after_in_child=self._reset_save_schedule)
+
+    @staticmethod
+    def _key(parameters):
+        """
+        Builds the key of a set of search parameters.
+
+        :param parameters: Dict of TheCatAPI search parameters, e.g. {"category_ids": 5}
+        :return: String key, e.g. "category_ids=5"
+        """
+
+        return "&".join(f"{name}={value}" for name, value in sorted(parameters.items()))
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as fallback_file:
+                self._urls = {key: list(urls)[-self.size :] for key, urls in json.load(fallback_file).items()}
+
+        except FileNotFoundError:
+            pass
+
+        except (ValueError, AttributeError, TypeError) as error:
+            logging.warning("Ignoring unreadable fallback image file %s: %s", self.path, error)
+
+    def add(self, parameters, image_urls):
+        """
+        Remembers urls returned for a search, replacing the oldest beyond the size.
+
+        :param parameters: Dict of search parameters
+        :param image_urls: List of image urls
+        """
+
+        if not image_urls:
+            return
+
+        key = self._key(parameters)
+
+        with self._lock:
+            remembered = self._urls.get(key, [])
+            urls = [url for url in remembered if url not in image_urls] + list(image_urls)
+            urls = urls[-self.size :]
+
+            if urls != remembered:
+                self._urls[key] = urls
+                self._dirty = True
+
+    def pick(self, parameters, any_search=True):
+        """
+        Picks a remembered url for a search, falling back to a url from any search.
+
+        :param parameters: Dict of search parameters
+        :param any_search: Fall back to a url remembered for another search if the search has none
+        :return: Image url, or None if no url has been remembered yet
+        """
+
+        with self._lock:
+            urls = self._urls.get(self._key(parameters))
+
+            if not urls and any_search:
+                urls = [url for urls in self._urls.values() for url in urls]
+
+            return random.choice(urls) if urls else None
+
+    def save(self):
+        """Writes the urls to the file if they changed. The file is replaced atomically."""
+
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            urls = {key: list(values) for key, values in self._urls.items()}
+            self._dirty = False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(temporary_path, "w") as fallback_file:
+            json.dump(urls, fallback_file)
+
+        os.replace(temporary_path, self.path)
+
+    def _save_quietly(self):
+        try:
+            self.save()
+
+        except OSError as error:
+            logging.warning("Failed to save fallback images: %s", error)
+
+    def _background_save(self):
+        """Timer thread body."""
+
+        try:
+            self._save_quietly()
+
+        finally:
+            with self._lock:
+                self._save_scheduled = False
+                self._saved_at = time.monotonic()
+
+    def _reset_save_schedule(self):
+        self._lock = threading.Lock()
+        self._save_scheduled = False
+
+    def save_later(self):
+        """
+        Schedules a save on a background thread if the urls changed, at most once per save interval, so the request
+        path never waits on the file.
+        """
+
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._dirty or self._save_scheduled:
+                return
+
+            self._save_scheduled = True
+            delay = max(0.0, self._saved_at + self.save_interval - time.monotonic())
+
+        timer = threading.Timer(delay, self._background_save)
+        timer.daemon = True
+        timer.start()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(urls) for urls in self._urls.values())
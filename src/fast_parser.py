@@ -0,0 +1,131 @@
+import re
+
+# NLTK's English stop word list, so the fast path filters exactly what the full path does
+STOP_WORDS = frozenset(
+    """
+    i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves he him his
+    himself she she's her hers herself it it's its itself they them their theirs themselves what which who whom this
+    that that'll these those am is are was were be been being have has had having do does did doing a an the and but
+    if or because as until while of at by for with about against between into through during before after above below
+    to from up down in out on off over under again further then once here there when where why how all any both each
+    few more most other some such no nor not only own same so than too very s t can will just don don't should
+    should've now d ll m o re ve y ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't
+    haven haven't isn isn't ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't
+    weren weren't won won't wouldn wouldn't
+    """.split()
+)
+
+# What WordNet's noun lemmatizer returns for the plural forms expected in requests; a word ending in "s" that is not
+# listed here may or may not be a plural, so it is left to the full path
+LEMMAS = {
+    "boxes": "box",
+    "cats": "cat",
+    "clothes": "clothes",
+    "cyprus": "cyprus",
+    "facts": "fact",
+    "glasses": "glass",
+    "hats": "hat",
+    "images": "image",
+    "kittens": "kitten",
+    "kitties": "kitty",
+    "photos": "photo",
+    "pictures": "picture",
+    "shows": "show",
+    "sinks": "sink",
+    "sunglasses": "sunglass",
+    "ties": "tie",
+    "views": "view",
+}
+
+# Irregular plurals in WordNet's exception list that do not end in "s" (plus any word ending in "men")
+IRREGULAR_PLURALS = frozenset(
+    {"bacteria", "cacti", "children", "criteria", "data", "dice", "feet", "fungi", "geese", "lice", "media", "mice"}
+    | {"oxen", "people", "phenomena", "teeth"}
+)
+
+# Words NLTK's tokenizer splits in two, e.g. "gimme" into "gim" and "me"
+SPLIT_WORDS = frozenset({"cannot", "gimme", "gonna", "gotta", "lemme", "wanna"})
+
+# Text the fast path can tokenize exactly like NLTK: words, hyphenated words, "!", "?", "," between words and a
+# final "." Anything else (apostrophes, quotes, inner periods, digit groups, non-ASCII text) goes to the full path.
+SUPPORTED_TEXT = re.compile(r"^(?:[a-z0-9]+(?:-[a-z0-9]+)*|[ \t!?]|,(?!\d))*\.?[ \t]*$")
+TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*|[!?,.]")
+
+
+class FastParser:
+    """
+    Class to tokenize, filter and lemmatize short requests without NLTK. It handles the common shapes of requests
+    ("show me a cat in a box") and gives up on anything it cannot tokenize and lemmatize exactly as NLTK would.
+    """
+
+    def __init__(self, stop_words=STOP_WORDS, lemmas=None):
+        """
+        Initializes the parser.
+
+        :param stop_words: Set of words to remove
+        :param lemmas: Dict mapping words to their lemmas, added to the built-in table
+        """
+
+        self.stop_words = stop_words
+        self.lemmas = {**LEMMAS, **(lemmas or {})}
+
+        self.hits = 0
+        self.fallbacks = 0
+
+    def _lemmatize(self, token):
+        """
+        Lemmatizes a token from the table.
+
+        :param token: Lower case token
+        :return: Lemma, or None if the table cannot tell
+        """
+
+        lemma = self.lemmas.get(token)
+
+        if lemma is not None:
+            return lemma
+
+        if token.endswith(("s", "men")) or token in IRREGULAR_PLURALS or token in SPLIT_WORDS:
+            return None
+
+        return token
+
+    def parse(self, user_request):
+        """
+        Tokenizes a request, removes the stop words and lemmatizes the remaining tokens.
+
+        :param user_request: Raw user input (text)
+        :return: List of lemmatized tokens, or None if the request needs the full NLTK path
+        """
+
+        text = user_request.lower()
+
+        if not SUPPORTED_TEXT.match(text):
+            self.fallbacks += 1
+            return None
+
+        lemmas = []
+
+        for token in TOKEN.findall(text):
+            if token in self.stop_words:
+                continue
+
+            lemma = self._lemmatize(token)
+
+            if lemma is None:
+                self.fallbacks += 1
+                return None
+
+            lemmas.append(lemma)
+
+        self.hits += 1
+        return lemmas
+
+    def stats(self):
+        """
+        Returns how often the fast path was used.
+
+        :return: Dict with the requests parsed and the requests left to NLTK
+        """
+
+        return {"hits": self.hits, "fallbacks": self.fallbacks}
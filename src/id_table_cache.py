@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import time
+
+
+class IDTableCache:
+    """Class to persist TheCatAPI category and breed id tables in a local JSON file."""
+
+    def __init__(self, path, ttl=86400):
+        """
+        Initializes the cache.
+
+        :param path: Path of the JSON cache file
+        :param ttl: Number of seconds after which the cached tables should be refreshed
+        """
+
+        self.path = path
+        self.ttl = ttl
+
+    def load(self):
+        """
+        Reads the cached tables from disk.
+
+        :return: Dict with "fetched_at", "category_ids" and "breed_ids", or None if there is no usable cache
+        """
+
+        try:
+            with open(self.path, "r") as cache_file:
+                cached = json.load(cache_file)
+
+            if not (cached["category_ids"] and cached["breed_ids"]):
+                return None
+
+            return {
+                "fetched_at": float(cached["fetched_at"]),
+                "category_ids": dict(cached["category_ids"]),
+                "breed_ids": dict(cached["breed_ids"]),
+            }
+
+        except FileNotFoundError:
+            return None
+
+        except (ValueError, KeyError, TypeError) as error:
+            logging.warning("Ignoring unreadable id table cache %s: %s", self.path, error)
+            return None
+
+    def save(self, category_ids, breed_ids, fetched_at=None):
+        """
+        Writes the tables to disk. The file is replaced atomically so that other workers never read a partial file.
+
+        :param category_ids: Dict mapping category keyword to category id
+        :param breed_ids: Dict mapping breed name to breed id
+        :param fetched_at: Time the tables were fetched; defaults to now
+        """
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        cached = {
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+            "category_ids": category_ids,
+            "breed_ids": breed_ids,
+        }
+
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+
+        with open(temporary_path, "w") as cache_file:
+            json.dump(cached, cache_file, indent=4)
+
+        os.replace(temporary_path, self.path)
+
+    def is_stale(self, fetched_at):
+        """
+        Determines whether tables fetched at the given time are older than the TTL.
+
+        :param fetched_at: Time the tables were fetched
+        :return: True if the tables should be refreshed; False otherwise
+        """
+
+        return time.time() - fetched_at >= self.ttl
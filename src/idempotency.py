@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import threading
+import time
+
+PENDING = "pending"
+DONE = "done"
+
+
+class IdempotencyIndex:
+    """
+    Class to handle each webhook delivery of a message only once. Twilio retries a webhook that does not answer in
+    time with the same MessageSid, so the first delivery claims the sid and stores its response once handled, and
+    retries get that response back without the request being processed (or a reply being sent) again.
+    """
+
+    def __init__(self, backend, wait_timeout=10.0, pending_timeout=60.0, poll_interval=0.05):
+        """
+        Initializes the index.
+
+        :param backend: TTLCache for a per-process index, or SQLiteCache to share the index between worker processes;
+        its TTL is how long a sid is remembered
+        :param wait_timeout: Seconds a retry waits for the first delivery to finish before giving up
+        :param pending_timeout: Seconds after which a delivery that never finished, e.g. because its process died, no
+        longer blocks retries; must exceed the time the slowest handler takes
+        :param poll_interval: Seconds between checks of the backend while waiting
+        """
+
+        self.backend = backend
+        self.wait_timeout = wait_timeout
+        self.pending_timeout = pending_timeout
+        self.poll_interval = poll_interval
+
+        self._finished = threading.Condition()
+        self._lock = threading.Lock()
+
+        self.duplicates = 0
+        self.gave_up_waiting = 0
+
+    def claim(self, key):
+        """
+        Claims a key for handling.
+
+        :param key: MessageSid of the incoming message
+        :return: Tuple of (state, response): (None, None) if the caller should handle the message, (DONE, response)
+        if it was handled already, or (PENDING, None) if another delivery is handling it right now
+        """
+
+        if self.backend.add(key, {"state": PENDING, "started_at": time.time()}):
+            return None, None
+
+        entry = self.backend.get(key)
+
+        if entry is None:
+            # Expired or released in between; the next claim will tell
+            return PENDING, None
+
+        if entry["state"] == DONE:
+            return DONE, entry["response"]
+
+        if time.time() - entry["started_at"] > self.pending_timeout:
+            # The delivery that claimed the key never finished; take it over, unless another retry just did
+            if self.backend.replace(key, entry, {"state": PENDING, "started_at": time.time()}):
+                return None, None
+
+        return PENDING, None
+
+    def complete(self, key, response):
+        """
+        Stores the response of a handled message for its retries.
+
+        :param key: MessageSid of the incoming message
+        :param response: JSON serializable response
+        """
+
+        self.backend.set(key, {"state": DONE, "response": response})
+
+        with self._finished:
+            self._finished.notify_all()
+
+    def release(self, key):
+        """
+        Gives up a claim, e.g. when handling failed, so a retry handles the message again.
+
+        :param key: MessageSid of the incoming message
+        """
+
+        self.backend.delete(key)
+
+        with self._finished:
+            self._finished.notify_all()
+
+    def _count(self, key, state):
+        with self._lock:
+            if state == DONE:
+                self.duplicates += 1
+
+            else:
+                self.gave_up_waiting += 1
+
+        logging.info(
+            "Duplicate delivery of %s answered %s", key, "from the index" if state == DONE else "as in progress"
+        )
+
+    def handle(self, key, handler, pending_response=None):
+        """
+        Handles a message once per key. A retry arriving while the message is being handled waits for the response.
+
+        :param key: MessageSid of the incoming message; without one the message is always handled
+        :param handler: Callable taking no arguments and returning the JSON serializable response
+        :param pending_response: Response for a retry that gave up waiting
+        :return: Response of the handler, or of the first delivery for a retry
+        """
+
+        if not key:
+            return handler()
+
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            state, response = self.claim(key)
+
+            if state is None:
+                break
+
+            if state == DONE:
+                self._count(key, DONE)
+                return response
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                self._count(key, PENDING)
+                return pending_response
+
+            # Woken early by a delivery finishing in this process; other processes are polled
+            with self._finished:
+                self._finished.wait(min(self.poll_interval, remaining))
+
+        try:
+            response = handler()
+
+        except BaseException:
+            self.release(key)
+            raise
+
+        self.complete(key, response)
+        return response
+
+    async def handle_async(self, key, handler, pending_response=None):
+        """
+        Same as handle for a coroutine function handler, waiting without blocking the event loop.
+
+        :param key: MessageSid of the incoming message; without one the message is always handled
+        :param handler: Coroutine function taking no arguments and returning the JSON serializable response
+        :param pending_response: Response for a retry that gave up waiting
+        :return: Response of the handler, or of the first delivery for a retry
+        """
+
+        if not key:
+            return await handler()
+
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            state, response = self.claim(key)
+
+            if state is None:
+                break
+
+            if state == DONE:
+                self._count(key, DONE)
+                return response
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                self._count(key, PENDING)
+                return pending_response
+
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+        try:
+            response = await handler()
+
+        except BaseException:
+            self.release(key)
+            raise
+
+        self.complete(key, response)
+        return response
+
+    def stats(self):
+        """
+        Returns the duplicate counters for monitoring.
+
+        :return: Dict with the retries answered from the index, the retries that gave up waiting and the number of
+        remembered keys
+        """
+
+        return {"duplicates": self.duplicates, "gave_up_waiting": self.gave_up_waiting, "size": len(self.backend)}
@@ -0,0 +1,217 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+
+from src.connection_pools import reset_after_fork
+
+# Mirrored files are named by the SHA-256 of their content and an image extension
+IMAGE_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.(jpg|png|gif|webp)$")
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+CONTENT_TYPES = {extension: content_type for content_type, extension in EXTENSIONS.items()}
+
+
+class ImageMirror:
+    """
+    Class to keep local copies of the images sent in replies, so Twilio fetches them from this application rather than
+    from TheCatAPI's CDN. Files are named by the hash of their content, so an image returned under several urls is
+    stored once, and the least recently used files are deleted when the store grows beyond its size cap.
+    """
+
+    def __init__(self, directory, base_url, max_bytes=500 * 1024 * 1024, max_image_bytes=5 * 1024 * 1024, timeout=10):
+        """
+        Initializes the mirror, creating the directory if necessary.
+
+        :param directory: Directory holding the mirrored images
+        :param base_url: Public url of this application, e.g. https://cats.example.com; images are served under
+        {base_url}/images/
+        :param max_bytes: Total size of the mirrored images above which the least recently used are deleted
+        :param max_image_bytes: Images larger than this are not mirrored; Twilio rejects MMS media over 5 MB
+        :param timeout: Seconds to wait for an image download
+        """
+
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.timeout = timeout
+
+        self.session = reset_after_fork(requests.Session())
+        self._names = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._files())
+
+        self.hits = 0
+        self.downloads = 0
+        self.failures = 0
+
+    def _files(self):
+        """
+        Lists the mirrored images.
+
+        :return: List of (path, size in bytes, last used time) tuples
+        """
+
+        files = []
+
+        for entry in os.scandir(self.directory):
+            if IMAGE_NAME_PATTERN.match(entry.name):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+
+        return files
+
+    def _url(self, name):
+        return f"{self.base_url}/images/{name}"
+
+    def path(self, name):
+        """
+        Finds the file of a mirrored image and marks it as recently used.
+
+        :param name: File name as used in the image url
+        :return: Path of the file, or None if the name is invalid or the image is not mirrored
+        """
+
+        if not IMAGE_NAME_PATTERN.match(name):
+            return None
+
+        path = os.path.join(self.directory, name)
+
+        try:
+            # The modification time doubles as the last used time for the size cap
+            os.utime(path)
+
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def mirror(self, image_url):
+        """
+        Downloads an image into the mirror unless it is there already.
+
+        :param image_url: Url of the image, e.g. on TheCatAPI's CDN
+        :return: Url of the mirrored image, or the original url if it could not be mirrored
+        """
+
+        with self._lock:
+            name = self._names.get(image_url)
+
+            if name is not None:
+                self._names.move_to_end(image_url)
+
+        if name is not None and self.path(name):
+            self.hits += 1
+            return self._url(name)
+
+        try:
+            name = self._download(image_url)
+
+        except (requests.RequestException, OSError, ValueError) as error:
+            self.failures += 1
+            logging.warning("Failed to mirror %s: %s", image_url, error)
+            return image_url
+
+        with self._lock:
+            self._names[image_url] = name
+
+            # Remember as many urls as the cap could hold at 100 KB per image
+            while len(self._names) > max(1000, self.max_bytes // (100 * 1024)):
+                self._names.popitem(last=False)
+
+        return self._url(name)
+
+    def _download(self, image_url):
+        """
+        Downloads an image and stores it under the hash of its content.
+
+        :param image_url: Url of the image
+        :return: File name of the stored image
+        """
+
+        response = self.session.get(image_url, timeout=self.timeout)
+        response.raise_for_status()
+        content = response.content
+
+        if len(content) > self.max_image_bytes:
+            raise ValueError(f"image is {len(content)} bytes")
+
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+        extension = EXTENSIONS.get(content_type) or os.path.splitext(urlsplit(image_url).path)[1].lower()
+
+        if extension == ".jpeg":
+            extension = ".jpg"
+
+        if extension not in EXTENSIONS.values():
+            raise ValueError(f"unsupported image type {content_type or extension}")
+
+        name = hashlib.sha256(content).hexdigest() + extension
+
+        if self.path(name):
+            return name
+
+        path = os.path.join(self.directory, name)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(temporary_path, "wb") as image_file:
+            image_file.write(content)
+
+        os.replace(temporary_path, path)
+        self.downloads += 1
+
+        with self._lock:
+            self._total_bytes += len(content)
+            over_cap = self._total_bytes > self.max_bytes
+
+        if over_cap:
+            self._evict()
+
+        return name
+
+    def _evict(self):
+        """Deletes the least recently used images until the mirror fits in its size cap."""
+
+        files = sorted(self._files(), key=lambda file: file[2])
+        total_bytes = sum(size for _, size, _ in files)
+
+        for path, size, _ in files:
+            if total_bytes <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+                total_bytes -= size
+
+            except FileNotFoundError:
+                pass
+
+        with self._lock:
+            self._total_bytes = total_bytes
+
+    @staticmethod
+    def content_type(name):
+        """Returns the MIME type of a mirrored image."""
+
+        return CONTENT_TYPES[os.path.splitext(name)[1]]
+
+    def stats(self):
+        """
+        Returns the state of the mirror.
+
+        :return: Dict with the stored size, hits, downloads and failures
+        """
+
+        return {
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "downloads": self.downloads,
+            "failures": self.failures,
+        }
@@ -0,0 +1,156 @@
+import logging
+import threading
+from collections import deque
+
+
+class ImagePool:
+    """Class to keep pre-fetched image urls in memory for each kind of image search."""
+
+    def __init__(self, fetch_function, size=20, low_water_mark=5):
+        """
+        Initializes an empty pool.
+
+        :param fetch_function: Callable taking (parameters, limit) and returning a list of image urls
+        :param size: Number of urls to keep for each search
+        :param low_water_mark: A background refill is started when a search has fewer urls than this left
+        """
+
+        self.fetch_function = fetch_function
+        self.size = size
+        self.low_water_mark = low_water_mark
+
+        self._pools = {}
+        self._refilling = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(parameters):
+        """
+        Builds the pool key for a set of search parameters.
+
+        :param parameters: Dict of TheCatAPI search parameters, e.g. {"category_ids": 5}
+        :return: Hashable key
+        """
+
+        return tuple(sorted(parameters.items()))
+
+    def get(self, parameters, exclude=()):
+        """
+        Takes a url from the pool for the given search, scheduling a background refill if the pool runs low.
+
+        :param parameters: Dict of TheCatAPI search parameters
+        :param exclude: Urls not to take, e.g. those already sent to the requester; they stay pooled for others
+        :return: Image url, or None if the pool for this search has no url besides the excluded ones
+        """
+
+        key = self._key(parameters)
+
+        with self._lock:
+            pool = self._pools.get(key)
+            image_url = next((url for url in pool if url not in exclude), None) if pool else None
+
+            if image_url is not None:
+                pool.remove(image_url)
+
+            remaining = len(pool) if pool else 0
+
+            if image_url is None:
+                self.misses += 1
+
+            else:
+                self.hits += 1
+
+        # An empty pool is filled by the caller's own fetch, so only top up pools that are running low
+        if image_url is not None and remaining < self.low_water_mark:
+            self.refill_in_background(parameters)
+
+        return image_url
+
+    def put(self, parameters, image_urls):
+        """
+        Adds urls to the pool for the given search, ignoring duplicates and anything beyond the pool size.
+
+        :param parameters: Dict of TheCatAPI search parameters
+        :param image_urls: List of image urls
+        """
+
+        key = self._key(parameters)
+
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            pooled = set(pool)
+
+            for image_url in image_urls:
+                if len(pool) >= self.size:
+                    break
+
+                if image_url not in pooled:
+                    pool.append(image_url)
+                    pooled.add(image_url)
+
+    def refill(self, parameters):
+        """
+        Fetches enough urls to bring the pool for the given search back up to its size.
+
+        :param parameters: Dict of TheCatAPI search parameters
+        """
+
+        key = self._key(parameters)
+
+        with self._lock:
+            missing = self.size - len(self._pools.get(key, ()))
+
+        if missing > 0:
+            self.put(parameters, self.fetch_function(parameters, limit=missing))
+
+    def refill_in_background(self, parameters):
+        """
+        Starts a thread that refills the pool for the given search, unless one is already running.
+
+        :param parameters: Dict of TheCatAPI search parameters
+        :return: Refill thread, or None if a refill of this search is already running
+        """
+
+        key = self._key(parameters)
+
+        with self._lock:
+            if key in self._refilling:
+                return None
+
+            self._refilling.add(key)
+
+        thread = threading.Thread(target=self._background_refill, args=(key, parameters), daemon=True)
+        thread.start()
+        return thread
+
+    def _background_refill(self, key, parameters):
+        """Refill thread body."""
+
+        try:
+            self.refill(parameters)
+
+        except Exception as error:
+            logging.warning("Image pool refill failed for %s: %s", parameters, error)
+
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool for monitoring.
+
+        :return: Dict with hit/miss counters and the number of urls pooled per search
+        """
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "pools": {
+                    "&".join(f"{k}={v}" for k, v in key) or "random": len(pool) for key, pool in self._pools.items()
+                },
+            }
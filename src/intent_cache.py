@@ -0,0 +1,68 @@
+import re
+import threading
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class IntentCache:
+    """Class to cache resolved requests (action, object, category, breed) keyed by the normalized message body."""
+
+    def __init__(self, backend):
+        """
+        Initializes the cache.
+
+        :param backend: TTLCache for a per-process cache, or SQLiteCache to share entries between worker processes
+        """
+
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(message):
+        """
+        Normalizes a message body so that trivially different texts share a cache entry. Case, repeated whitespace
+        and trailing punctuation do not change how RequestProcessor resolves a request.
+
+        :param message: Raw message body
+        :return: Normalized message body
+        """
+
+        return WHITESPACE_PATTERN.sub(" ", message.lower()).strip().rstrip(".!?").strip()
+
+    def resolve(self, message, resolver, version=""):
+        """
+        Returns the cached resolution of a message, resolving and caching it on a miss.
+
+        :param message: Raw message body
+        :param resolver: Callable taking the message and returning a (verb, object, category, breed) tuple
+        :param version: Version of the keyword tables; entries resolved against other tables are not reused
+        :return: Tuple of (verb, object, category, breed)
+        """
+
+        key = f"{version}:{self.normalize(message)}"
+        cached = self.backend.get(key)
+
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+
+            return tuple(cached)
+
+        with self._lock:
+            self.misses += 1
+
+        resolved = resolver(message)
+        self.backend.set(key, list(resolved))
+
+        return resolved
+
+    def stats(self):
+        """
+        Returns the hit and miss counters for monitoring.
+
+        :return: Dict with hits, misses and number of cached entries
+        """
+
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.backend)}
@@ -0,0 +1,136 @@
+import re
+import string
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+# Trie key holding the keywords that end at a node; tokens are never empty so it cannot clash with a child
+_MATCHES = ""
+
+
+class KeywordMatcher:
+    """Class to find category and breed keywords in text in a single pass using a precompiled token trie."""
+
+    def __init__(self, keyword_tables):
+        """
+        Compiles the trie.
+
+        :param keyword_tables: Dict mapping a kind of keyword (e.g. "category") to an iterable of keywords
+        """
+
+        self.kinds = list(keyword_tables)
+        self._trie = {}
+
+        for kind, keywords in keyword_tables.items():
+            for keyword in keywords:
+                for tokens in self._variants(keyword):
+                    self._add(tokens, kind, keyword)
+
+    @staticmethod
+    def tokenize(text):
+        """
+        Splits text into lowercase word tokens, dropping punctuation and whitespace.
+
+        :param text: Text to split
+        :return: List of tokens
+        """
+
+        return TOKEN_PATTERN.findall(text.lower())
+
+    def _variants(self, keyword):
+        """
+        Yields the token sequences that should match a keyword. Besides the keyword split on punctuation, a keyword
+        such as "pixie-bob" also matches "pixiebob", which is what RequestProcessor leaves after stripping punctuation.
+
+        :param keyword: Keyword to index
+        :return: Generator of token lists
+        """
+
+        tokens = self.tokenize(keyword)
+
+        if tokens:
+            yield tokens
+
+        stripped_tokens = self.tokenize(keyword.lower().translate(PUNCTUATION_TABLE))
+
+        if stripped_tokens and stripped_tokens != tokens:
+            yield stripped_tokens
+
+    def _add(self, tokens, kind, keyword):
+        """
+        Adds a token sequence to the trie.
+
+        :param tokens: List of tokens
+        :param kind: Kind of keyword
+        :param keyword: Keyword reported when the sequence matches
+        """
+
+        node = self._trie
+
+        for token in tokens:
+            node = node.setdefault(token, {})
+
+        node.setdefault(_MATCHES, {}).setdefault(kind, keyword)
+
+    def _text_tokens(self, text):
+        """
+        Splits the text being searched into the tokens looked up in the trie.
+
+        :param text: Text to search in
+        :return: List of tokens
+        """
+
+        return self.tokenize(text)
+
+    def find_all(self, text):
+        """
+        Finds every keyword in the text. Keywords only match whole words, and where matches overlap the longest one
+        starting first wins, e.g. "cornish rex" is matched rather than a shorter "rex".
+
+        :param text: Text to search in
+        :return: List of (kind, keyword) tuples in the order they appear in the text
+        """
+
+        tokens = self._text_tokens(text)
+        found = []
+        i = 0
+
+        while i < len(tokens):
+            node = self._trie
+            longest_matches = None
+            longest_end = i
+
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+
+                if node is None:
+                    break
+
+                if _MATCHES in node:
+                    longest_matches = node[_MATCHES]
+                    longest_end = j + 1
+
+            if longest_matches:
+                found.extend(longest_matches.items())
+                i = longest_end
+
+            else:
+                i += 1
+
+        return found
+
+    def search(self, text):
+        """
+        Finds the first keyword of each kind in the text.
+
+        :param text: Text to search in
+        :return: Dict mapping every kind to the first keyword of that kind found, else None
+        """
+
+        result = dict.fromkeys(self.kinds)
+
+        for kind, keyword in self.find_all(text):
+            if result[kind] is None:
+                result[kind] = keyword
+
+        return result
@@ -0,0 +1,105 @@
+import logging
+import os
+import threading
+import time
+
+
+class LazyProxy:
+    """
+    Class standing in for an object that is expensive to create, e.g. one that makes network calls when constructed.
+    The object is created by its factory on first attribute access, or earlier by `initialize`, and every attribute
+    access and assignment is forwarded to it from then on.
+    """
+
+    def __init__(self, factory, name=None):
+        """
+        Initializes the proxy without creating the object.
+
+        :param factory: Callable creating the object
+        :param name: Name of the object used in log messages; defaults to the factory's name
+        """
+
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name or getattr(factory, "__name__", repr(factory)))
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_initialized_in", None)
+
+        # A fork while another thread holds the lock, e.g. during a background warm up, would leave it held forever
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def __getattr__(self, name):
+        return getattr(initialize(self), name)
+
+    def __setattr__(self, name, value):
+        setattr(initialize(self), name, value)
+
+    def __repr__(self):
+        instance = object.__getattribute__(self, "_instance")
+        return f"<LazyProxy {self._name}: {'not initialized' if instance is None else repr(instance)}>"
+
+
+def initialize(proxy):
+    """
+    Creates the object behind a proxy if that has not been done yet. Concurrent callers wait for a single creation.
+
+    :param proxy: LazyProxy
+    :return: The wrapped object
+    """
+
+    instance = object.__getattribute__(proxy, "_instance")
+
+    if instance is not None:
+        return instance
+
+    with object.__getattribute__(proxy, "_lock"):
+        instance = object.__getattribute__(proxy, "_instance")
+
+        if instance is None:
+            start = time.perf_counter()
+            instance = object.__getattribute__(proxy, "_factory")()
+            object.__setattr__(proxy, "_instance", instance)
+            object.__setattr__(proxy, "_initialized_in", time.perf_counter() - start)
+            logging.info("Initialized %s in %.3fs", proxy._name, proxy._initialized_in)
+
+    return instance
+
+
+def is_initialized(proxy):
+    """
+    Determines whether the object behind a proxy has been created.
+
+    :param proxy: LazyProxy
+    :return: True if the object exists; False otherwise
+    """
+
+    return object.__getattribute__(proxy, "_instance") is not None
+
+
+def initialize_in_background(*callables):
+    """
+    Runs initialization steps, e.g. initialize(proxy) calls, one after the other on a daemon thread.
+
+    :param callables: Callables taking no arguments
+    :return: threading.Event set once every step has run
+    """
+
+    done = threading.Event()
+
+    def run():
+        try:
+            for function in callables:
+                try:
+                    function()
+
+                except Exception:
+                    logging.exception("Background initialization step failed")
+
+        finally:
+            done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return done
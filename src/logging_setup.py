@@ -0,0 +1,215 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+
+TEXT_FORMAT = "%(asctime)s\t%(module)20s:%(lineno)4d\t: %(message)s"
+
+# Request id of the /sms request being handled by the current thread or task, added to every log record
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra` and is emitted as a JSON field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Filter that stamps each record with the id of the request being handled, if any."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Formatter that renders each record as one compact JSON line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        # Queued records only carry the traceback formatted by RecordQueueHandler
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that queues the message and the formatted traceback separately, so the formatters on the listener
+    thread can still tell them apart; the stock handler merges the traceback into the message.
+    """
+
+    def prepare(self, record):
+        # The traceback and arguments may not be safe to use from another thread, so only their text is queued
+        exc_text = record.exc_text
+
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+
+def _create_file_handler(logfile, rotate, max_bytes, backup_count):
+    """
+    Creates the handler writing the log file.
+
+    :param logfile: Path of the log file
+    :param rotate: "size" to rotate when the file reaches max_bytes, "time" to rotate at midnight
+    :param max_bytes: File size in bytes at which a size-rotated file is rolled over
+    :param backup_count: Number of rolled over files to keep
+    :return: logging.Handler
+    """
+
+    if rotate == "time":
+        return logging.handlers.TimedRotatingFileHandler(logfile, when="midnight", backupCount=backup_count)
+
+    return logging.handlers.RotatingFileHandler(logfile, maxBytes=max_bytes, backupCount=backup_count)
+
+
+def _use_watched_file_handlers(handlers):
+    """
+    Replaces the rotating file handlers inherited by a forked worker with handlers appending to the same file. Only
+    the parent rotates the file, so the workers do not race each other renaming it; a WatchedFileHandler reopens the
+    file once the parent has rotated it.
+
+    :param handlers: Handlers of the parent
+    :return: List of handlers for the worker
+    """
+
+    worker_handlers = []
+
+    for handler in handlers:
+        if isinstance(handler, logging.handlers.BaseRotatingHandler):
+            watched_handler = logging.handlers.WatchedFileHandler(handler.baseFilename, delay=True)
+            watched_handler.setFormatter(handler.formatter)
+            watched_handler.setLevel(handler.level)
+
+            for log_filter in handler.filters:
+                watched_handler.addFilter(log_filter)
+
+            handler.close()
+            handler = watched_handler
+
+        worker_handlers.append(handler)
+
+    return worker_handlers
+
+
+def stop_listener(listener):
+    """
+    Flushes the queued records and stops the listener, unless it has already been stopped.
+
+    :param listener: QueueListener returned by configure_logging, or None
+    """
+
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+def configure_logging(
+    log_directory,
+    log_format="text",
+    use_queue=True,
+    rotate="size",
+    max_bytes=10 * 1024 * 1024,
+    backup_count=5,
+    level=logging.INFO,
+):
+    """
+    Configures the root logger to write to a rotating file in the log directory and to stderr.
+
+    With use_queue set, request threads only put records on an in-memory queue and a background listener thread does
+    the formatting and the file I/O. The listener is restarted in child processes after a fork. Forked workers append
+    to the parent's log file without rotating it; see _use_watched_file_handlers.
+
+    :param log_directory: Directory holding the log files; created if necessary
+    :param log_format: "text" for the tab separated format, "json" for one JSON object per line
+    :param use_queue: Write records from a background thread instead of the logging thread
+    :param rotate: "size" or "time"; see _create_file_handler
+    :param max_bytes: File size in bytes at which a size-rotated file is rolled over
+    :param backup_count: Number of rolled over files to keep
+    :param level: Minimum level to log
+    :return: QueueListener writing the records, or None without a queue
+    """
+
+    os.makedirs(log_directory, exist_ok=True)
+    logfile = os.path.join(log_directory, "cat-of-the-day.log")
+
+    formatter = JSONFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [_create_file_handler(logfile, rotate, max_bytes, backup_count), logging.StreamHandler()]
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if not use_queue:
+        for handler in handlers:
+            handler.addFilter(RequestIdFilter())
+            root.addHandler(handler)
+
+        def reopen_after_fork():
+            # Handlers replaced by a later configure_logging call are left alone
+            inherited = [handler for handler in handlers if handler in root.handlers]
+
+            for handler in inherited:
+                root.removeHandler(handler)
+
+            for handler in _use_watched_file_handlers(inherited):
+                root.addHandler(handler)
+
+        os.register_at_fork(after_in_child=reopen_after_fork)
+
+        return None
+
+    queue_handler = RecordQueueHandler(queue.SimpleQueue())
+    # The request id lives in a context variable, so it must be read on the logging thread before the record is queued
+    queue_handler.addFilter(RequestIdFilter())
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+
+    def restart_after_fork():
+        # The listener thread does not survive a fork; give the child its own queue and listener
+        queue_handler.queue = queue.SimpleQueue()
+        listener.queue = queue_handler.queue
+        listener.handlers = tuple(_use_watched_file_handlers(listener.handlers))
+        listener._thread = None
+        listener.start()
+
+    os.register_at_fork(after_in_child=restart_after_fork)
+
+    return listener
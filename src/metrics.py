@@ -0,0 +1,211 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from a dictionary lookup up to a slow external API call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(label_names, label_values, extra=""):
+    """
+    Formats a label set in the Prometheus text format.
+
+    :param label_names: Tuple of label names
+    :param label_values: Tuple of label values
+    :param extra: Additional preformatted label, e.g. le="0.5"
+    :return: String such as {stage="parse",le="0.5"}, or an empty string without labels
+    """
+
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    """Formats a sample value in the Prometheus text format."""
+
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Class implementing a monotonically increasing counter with optional labels."""
+
+    metric_type = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the counter.
+
+        :param amount: Amount to add
+        :param labels: Label values
+        """
+
+        key = tuple(str(labels[name]) for name in self.label_names)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """Yields the sample lines of the counter."""
+
+        with self._lock:
+            values = dict(self._values)
+
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Class implementing a cumulative histogram with optional labels."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Records an observation.
+
+        :param value: Observed value, e.g. a duration in seconds
+        :param labels: Label values
+        """
+
+        key = tuple(str(labels[name]) for name in self.label_names)
+
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        """Yields the sample lines of the histogram."""
+
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {count}"
+
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {counts[-1]}"
+
+
+class CallbackMetric:
+    """Class implementing a metric whose value is read from a function when the metrics are rendered."""
+
+    def __init__(self, name, documentation, function, metric_type="gauge"):
+        """
+        Initializes the metric.
+
+        :param name: Metric name
+        :param documentation: Help text
+        :param function: Callable returning the current value
+        :param metric_type: Prometheus metric type, "gauge" or "counter"
+        """
+
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.metric_type = metric_type
+
+    def samples(self):
+        """Yields the sample line of the metric."""
+
+        yield f"{self.name} {_format_value(self.function())}"
+
+
+class MetricsRegistry:
+    """Class to hold the application's metrics and render them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        """Creates and registers a Counter."""
+
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """Creates and registers a Histogram."""
+
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name, documentation, function, metric_type="gauge"):
+        """Creates and registers a CallbackMetric."""
+
+        return self._register(CallbackMetric(name, documentation, function, metric_type))
+
+    def render(self):
+        """
+        Renders every registered metric.
+
+        :return: String in the Prometheus text exposition format
+        """
+
+        lines = []
+
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.samples())
+
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(histogram, errors=None, timings=None, **labels):
+    """
+    Context manager recording how long its block takes in a histogram, and counting exceptions raised by the block.
+
+    :param histogram: Histogram receiving the duration in seconds
+    :param errors: Optional Counter incremented when the block raises
+    :param timings: Optional dict receiving the duration in milliseconds, keyed by the label values, e.g. for a log line
+    :param labels: Label values for both metrics
+    """
+
+    start = time.perf_counter()
+
+    try:
+        yield
+
+    except Exception:
+        if errors is not None:
+            errors.inc(**labels)
+
+        raise
+
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+
+        if timings is not None:
+            timings["/".join(str(value) for value in labels.values())] = round(1000 * elapsed, 3)
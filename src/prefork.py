@@ -0,0 +1,263 @@
+import gc
+import logging
+import os
+import signal
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+# Fields of /proc/<pid>/smaps_rollup reported for each process, in kB
+MEMORY_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def memory_usage(pid=None):
+    """
+    Reads the memory use of a process from /proc. PSS (proportional set size) splits every shared page between the
+    processes sharing it, so unlike RSS the PSS of the workers adds up to the memory they actually use together.
+
+    :param pid: Process id; defaults to the current process
+    :return: Dict with "rss", "pss", "shared_clean", "shared_dirty", "private_clean" and "private_dirty" in bytes, or
+    None if /proc is not available
+    """
+
+    usage = {}
+
+    try:
+        with open(f"/proc/{pid or os.getpid()}/smaps_rollup", "r") as smaps_file:
+            for line in smaps_file:
+                name, _, value = line.partition(":")
+
+                if name in MEMORY_FIELDS:
+                    usage[MEMORY_FIELDS[name]] = int(value.split()[0]) * 1024
+
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return usage or None
+
+
+class PreforkServer:
+    """
+    Class to serve a WSGI application from several forked worker processes. The application and everything it loads
+    (NLTK corpora, WordNet, the category and breed tables) is set up once in the parent, frozen out of the garbage
+    collector's reach and then shared copy-on-write by every worker. The parent replaces workers that die.
+    """
+
+    def __init__(
+        self,
+        app,
+        host="127.0.0.1",
+        port=5000,
+        workers=2,
+        threaded=True,
+        memory_report_interval=60.0,
+        graceful_timeout=30.0,
+        on_worker_exit=None,
+    ):
+        """
+        Initializes the server without binding the socket.
+
+        :param app: WSGI application, fully loaded
+        :param host: Address to listen on
+        :param port: Port to listen on; 0 picks a free port
+        :param workers: Number of worker processes
+        :param threaded: Handle each request of a worker on its own thread
+        :param memory_report_interval: Seconds between logging the memory use of the workers; 0 disables the report
+        :param graceful_timeout: Seconds a stopping worker has to finish before it is killed
+        :param on_worker_exit: Callable run in a worker after it stops accepting requests, e.g. to drain a queue and flush
+        the logs; workers leave through os._exit, so atexit handlers do not run in them
+        """
+
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threaded = threaded
+        self.memory_report_interval = memory_report_interval
+        self.graceful_timeout = graceful_timeout
+        self.on_worker_exit = on_worker_exit
+
+        self.server = None
+        self.worker_pids = set()
+        self._stopping = threading.Event()
+
+    def bind(self):
+        """Creates the listening socket in the parent, so every worker accepts connections from the same socket."""
+
+        self.server = make_server(self.host, self.port, self.app, threaded=self.threaded)
+        self.port = self.server.server_port
+
+    def _spawn_worker(self):
+        """
+        Forks a worker process serving requests until it is terminated.
+
+        :return: Process id of the worker
+        """
+
+        pid = os.fork()
+
+        if pid:
+            self.worker_pids.add(pid)
+            return pid
+
+        # Worker process; it must never return into the parent's code, so it leaves through os._exit
+        exit_code = 0
+
+        try:
+            signal.signal(signal.SIGTERM, self._stop_worker)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            self.server.serve_forever()
+
+            if self.on_worker_exit:
+                self.on_worker_exit()
+
+        except BaseException:
+            logging.exception("Worker %d failed", os.getpid())
+            exit_code = 1
+
+        finally:
+            os._exit(exit_code)
+
+    def _stop_worker(self, *_):
+        """SIGTERM handler of a worker. shutdown waits for serve_forever to return, so it cannot run on this thread."""
+
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def _reap_workers(self):
+        """Collects exited workers, replacing them unless the server is stopping."""
+
+        while self.worker_pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+
+            except ChildProcessError:
+                self.worker_pids.clear()
+                return
+
+            if pid == 0:
+                return
+
+            if pid not in self.worker_pids:
+                continue
+
+            self.worker_pids.discard(pid)
+
+            if not self._stopping.is_set():
+                logging.warning("Worker %d exited with status %d; starting a new one", pid, status)
+                self._spawn_worker()
+
+    def memory_report(self):
+        """
+        Reads the memory use of the parent and every worker.
+
+        :return: Dict mapping "parent" and each worker pid to its memory_usage, or None if /proc is not available
+        """
+
+        report = {"parent": memory_usage(os.getpid())}
+
+        for pid in sorted(self.worker_pids):
+            report[pid] = memory_usage(pid)
+
+        return report if report["parent"] else None
+
+    def _log_memory_report(self):
+        report = self.memory_report()
+
+        if report is None:
+            return
+
+        workers = [usage for pid, usage in report.items() if pid != "parent" and usage]
+        total_pss = sum(usage["pss"] for usage in workers) + report["parent"]["pss"]
+
+        for pid, usage in report.items():
+            if usage:
+                logging.info(
+                    "Memory of %s: RSS %.1f MB, PSS %.1f MB, shared %.1f MB, private %.1f MB",
+                    pid,
+                    usage["rss"] / 2**20,
+                    usage["pss"] / 2**20,
+                    (usage["shared_clean"] + usage["shared_dirty"]) / 2**20,
+                    (usage["private_clean"] + usage["private_dirty"]) / 2**20,
+                )
+
+        logging.info("Total PSS of the parent and %d workers: %.1f MB", len(workers), total_pss / 2**20)
+
+    def stop(self, *_):
+        """Terminates the workers; serve_forever returns once they have exited. Usable as a signal handler."""
+
+        self._stopping.set()
+
+        for pid in list(self.worker_pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+
+            except ProcessLookupError:
+                self.worker_pids.discard(pid)
+
+    def _wait_for_workers(self):
+        """Waits for the stopped workers to exit, killing those still running after the graceful timeout."""
+
+        deadline = time.monotonic() + self.graceful_timeout
+
+        while self.worker_pids and time.monotonic() < deadline:
+            self._reap_workers()
+            time.sleep(0.05)
+
+        for pid in list(self.worker_pids):
+            logging.warning("Worker %d did not stop in time; killing it", pid)
+
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+        self.worker_pids.clear()
+
+    def serve_forever(self, poll_interval=0.5):
+        """
+        Forks the workers and supervises them until stop is called or the parent receives SIGTERM or SIGINT.
+
+        :param poll_interval: Seconds between checks for exited workers
+        """
+
+        if self.server is None:
+            self.bind()
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # Everything loaded so far is moved out of the collector's generations, so collections in the workers do
+        # not write to (and un-share) the pages holding it
+        gc.collect()
+        gc.freeze()
+
+        for _ in range(self.workers):
+            self._spawn_worker()
+
+        logging.info("Serving on http://%s:%d with %d workers", self.host, self.port, self.workers)
+        next_report = time.monotonic() + self.memory_report_interval
+
+        try:
+            while not self._stopping.is_set():
+                self._stopping.wait(poll_interval)
+                self._reap_workers()
+
+                if self.memory_report_interval and time.monotonic() >= next_report:
+                    self._log_memory_report()
+                    next_report = time.monotonic() + self.memory_report_interval
+
+        finally:
+            self.stop()
+            self._wait_for_workers()
+            self.server.server_close()
+            gc.unfreeze()
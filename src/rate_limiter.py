@@ -0,0 +1,233 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _refill(tokens, updated_at, now, rate, capacity):
+    """
+    Works out how many tokens a bucket holds now.
+
+    :param tokens: Tokens held at the last update
+    :param updated_at: Time of the last update in seconds
+    :param now: Current time in seconds
+    :param rate: Number of tokens added per second
+    :param capacity: Maximum number of tokens held
+    :return: Number of tokens held now
+    """
+
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class TokenBucket:
+    """Class implementing a thread-safe token bucket that allows bursts up to its capacity and `rate` tokens a second."""
+
+    def __init__(self, rate, capacity=None):
+        """
+        Initializes a full bucket.
+
+        :param rate: Number of tokens added per second
+        :param capacity: Maximum number of tokens held; defaults to one second's worth, and at least one
+        """
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Adds the tokens accrued since the last update. Must be called with the lock held."""
+
+        self._tokens = _refill(self._tokens, self._updated_at, now, self.rate, self.capacity)
+        self._updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes tokens if enough are available, without waiting.
+
+        :param tokens: Number of tokens to take
+        :return: True if the tokens were taken; False otherwise
+        """
+
+        with self._lock:
+            self._refill(time.monotonic())
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+
+            return False
+
+    def acquire(self, tokens=1):
+        """
+        Takes tokens, waiting until enough are available.
+
+        :param tokens: Number of tokens to take
+        :return: Number of seconds spent waiting
+        """
+
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+
+                delay = (tokens - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+class KeyedRateLimiter:
+    """
+    Class implementing a token bucket per key, e.g. per phone number, held in memory. Only the most recently used
+    buckets are kept; a bucket that is dropped would have refilled to capacity anyway once idle long enough.
+    """
+
+    def __init__(self, rate, capacity=None, max_keys=100000):
+        """
+        Initializes the limiter.
+
+        :param rate: Number of tokens added to each bucket per second
+        :param capacity: Maximum number of tokens a bucket holds; defaults to one second's worth, and at least one
+        :param max_keys: Maximum number of buckets kept
+        """
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.max_keys = max_keys
+
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key, tokens=1):
+        """
+        Takes tokens from a key's bucket if enough are available, without waiting.
+
+        :param key: Key of the bucket
+        :param tokens: Number of tokens to take
+        :return: True if the tokens were taken; False otherwise
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            available, updated_at = self._buckets.pop(key, (self.capacity, now))
+            available = _refill(available, updated_at, now, self.rate, self.capacity)
+            allowed = available >= tokens
+
+            if allowed:
+                available -= tokens
+
+            self._buckets[key] = (available, now)
+
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed
+
+
+class SQLiteRateLimiter:
+    """
+    Class implementing the KeyedRateLimiter interface on a SQLite file, so every worker process on a host shares the
+    buckets. Should the database be unavailable, requests are allowed rather than failed.
+    """
+
+    def __init__(self, path, rate, capacity=None, table="rate_limits"):
+        """
+        Initializes the limiter, creating the database file and table if necessary.
+
+        :param path: Path of the SQLite database file
+        :param rate: Number of tokens added to each bucket per second
+        :param capacity: Maximum number of tokens a bucket holds; defaults to one second's worth, and at least one
+        :param table: Name of the table holding the buckets, so several limiters can share one file
+        """
+
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.table = table
+
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._connection().execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        """
+        Returns this thread's connection to the database; sqlite3 connections cannot be shared between threads.
+
+        :return: sqlite3.Connection
+        """
+
+        connection = getattr(self._local, "connection", None)
+
+        # A connection inherited from a parent process must not be used after a fork
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    def try_acquire(self, key, tokens=1):
+        """
+        Takes tokens from a key's bucket if enough are available, without waiting.
+
+        :param key: Key of the bucket
+        :param tokens: Number of tokens to take
+        :return: True if the tokens were taken or the database is unavailable; False otherwise
+        """
+
+        try:
+            connection = self._connection()
+            now = time.time()
+
+            # Take the write lock up front so no other process reads the bucket between our read and write
+            connection.execute("BEGIN IMMEDIATE")
+
+            try:
+                row = connection.execute(
+                    f"SELECT tokens, updated_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                available = _refill(*row, now, self.rate, self.capacity) if row else self.capacity
+                allowed = available >= tokens
+
+                if allowed:
+                    available -= tokens
+
+                connection.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (key, available, now),
+                )
+                connection.execute("COMMIT")
+
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+            # Drop buckets idle long enough to be full again every so often rather than on every request
+            self._writes += 1
+
+            if self._writes % 1000 == 0:
+                connection.execute(f"DELETE FROM {self.table} WHERE updated_at < ?", (now - self.capacity / self.rate,))
+
+        except sqlite3.Error as error:
+            logging.warning("Rate limiter unavailable, allowing request: %s", error)
+            return True
+
+        return allowed
@@ -1,49 +1,249 @@
 import string
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from nltk.tokenize import word_tokenize
+from src.cat_facts import is_fact_request
+from src.fast_parser import FastParser
+from src.utilities import LEMMA_CACHE_SIZE, NLP_FAST_PATH
+
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
 
 
 class RequestProcessor:
     """Class to handle text processing. Uses Natural Language Processing to understand user requests."""
 
-    def __init__(self):
-        self.acceptable_verbs = {"show", "get", "see", "send", "view", "give", "receive"}
+    def __init__(self, eager=False, lemma_cache_size=LEMMA_CACHE_SIZE, fast_path=NLP_FAST_PATH):
+        """
+        Initializes the processor. The stop words and lemmatizer are loaded once per processor, either on the first
+        request or, with eager set, immediately. Creating an eager processor before forking worker processes lets
+        every worker share the loaded corpora.
 
-    def process_request(self, user_request):
+        :param eager: Load and warm up the NLTK resources now instead of on the first request
+        :param lemma_cache_size: Maximum number of lemmatization results to keep in the LRU cache
+        :param fast_path: Try the NLTK-free FastParser first and only use NLTK for the requests it cannot parse
+        """
+
+        self.acceptable_verbs = {"show", "get", "see", "send", "view", "give", "receive", "tell"}
+        # Verbs that only ask for something when their object asks for a fact, e.g. "tell me a cat fact" but not
+        # "tell me a joke"
+        self.fact_verbs = {"tell"}
+        self.lemma_cache_size = lemma_cache_size
+        self.fast_parser = FastParser() if fast_path else None
+
+        self._stop_words = None
+        self._lemmatize = None
+        self._tokenize = None
+        self._load_lock = threading.Lock()
+
+        if eager:
+            self.warm_up()
+
+    def _load_resources(self):
+        """
+        Loads the stop words and builds the cached lemmatizer if that has not been done yet. NLTK itself is only
+        imported here, so importing this module stays cheap.
+        """
+
+        if self._lemmatize is not None:
+            return
+
+        with self._load_lock:
+            if self._lemmatize is None:
+                from nltk.corpus import stopwords
+                from nltk.stem import WordNetLemmatizer
+                from nltk.tokenize import word_tokenize
+
+                self._stop_words = frozenset(stopwords.words("english"))
+                self._tokenize = word_tokenize
+                self._lemmatize = lru_cache(maxsize=self.lemma_cache_size)(WordNetLemmatizer().lemmatize)
+
+    def warm_up(self):
+        """
+        Loads the NLTK resources and forces WordNet and the Punkt tokenizer to read their data, which they otherwise
+        do lazily in the middle of the first request.
+        """
+
+        self._load_resources()
+        self._tokenize("warm up")
+        self._lemmatize.__wrapped__("cats")
+
+    def lemma_cache_info(self):
         """
-        Given a raw user request, use NLTK to identify the action and the object of the request.
+        Returns the hit/miss statistics of the lemmatization cache.
+
+        :return: functools cache info tuple, or None if the resources have not been loaded yet
+        """
+
+        return self._lemmatize.cache_info() if self._lemmatize else None
+
+    def _filtered_tokens(self, user_request):
+        """
+        Tokenizes a request and removes the stop words.
 
         :param user_request: Raw user input (text)
-        :return: Tuple of (verb, object)
+        :return: List of tokens
         """
 
-        # Tokenize the sentence
-        tokens = word_tokenize(user_request.lower())
+        return [token for token in self._tokenize(user_request.lower()) if token not in self._stop_words]
 
-        # Remove stop words and lemmatize the tokens
-        stop_words = set(stopwords.words("english"))
-        lemmatizer = WordNetLemmatizer()
-        tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
+    def _find_action(self, tokens):
+        """
+        Finds the action and object in a list of lemmatized tokens.
+
+        :param tokens: List of lemmatized tokens without stop words
+        :return: Tuple of (verb, object)
+        """
 
-        # Find the action and object of the sentence
         action = ""
         obj = ""
 
         for i in range(len(tokens)):
             if tokens[i] in self.acceptable_verbs:
-                action = tokens[i].translate(str.maketrans("", "", string.punctuation)).strip()
-                obj = " ".join(tokens[i + 1 :]).translate(str.maketrans("", "", string.punctuation)).strip()
+                obj = " ".join(tokens[i + 1 :]).translate(PUNCTUATION_TABLE).strip()
+
+                if tokens[i] in self.fact_verbs and not is_fact_request(obj):
+                    obj = ""
+                    continue
+
+                action = tokens[i].translate(PUNCTUATION_TABLE).strip()
                 break
 
         return action, obj
 
+    @staticmethod
+    def resolve_keywords(action, obj, keyword_matcher):
+        """
+        Looks up the requested category and breed in the object of a request.
+
+        :param action: Verb of the request
+        :param obj: Object of the request
+        :param keyword_matcher: KeywordMatcher compiled from the category and breed tables, or None
+        :return: Tuple of (verb, object, category, breed)
+        """
+
+        category = None
+        breed = None
+
+        if action and obj and keyword_matcher:
+            requested = keyword_matcher.search(obj)
+            category = requested["category"]
+            breed = requested["breed"]
+
+        return action, obj, category, breed
+
+    def _fast_tokens(self, user_request):
+        """
+        Tokenizes, filters and lemmatizes a request with the fast parser, if enabled.
+
+        :param user_request: Raw user input (text)
+        :return: List of lemmatized tokens, or None if the request needs NLTK
+        """
+
+        return self.fast_parser.parse(user_request) if self.fast_parser else None
+
+    def process_request(self, user_request):
+        """
+        Given a raw user request, use NLTK to identify the action and the object of the request. Requests the fast
+        parser understands are handled without NLTK, with the same result.
+
+        :param user_request: Raw user input (text)
+        :return: Tuple of (verb, object)
+        """
+
+        tokens = self._fast_tokens(user_request)
+
+        if tokens is None:
+            self._load_resources()
+
+            # Tokenize the sentence, remove stop words and lemmatize the tokens
+            tokens = [self._lemmatize(token) for token in self._filtered_tokens(user_request)]
+
+        # Find the action and object of the sentence
+        return self._find_action(tokens)
+
+    def resolve_request(self, user_request, keyword_matcher=None):
+        """
+        Identifies the action and object of a request, and the category and breed asked for in the object.
+
+        :param user_request: Raw user input (text)
+        :param keyword_matcher: KeywordMatcher compiled from the category and breed tables
+        :return: Tuple of (verb, object, category, breed)
+        """
+
+        action, obj = self.process_request(user_request)
+        return self.resolve_keywords(action, obj, keyword_matcher)
+
+    def _process_batch(self, user_requests, keyword_matcher=None):
+        """
+        Resolves a batch of distinct requests, lemmatizing each distinct token of the batch only once.
+
+        :param user_requests: List of raw user inputs
+        :param keyword_matcher: KeywordMatcher compiled from the category and breed tables
+        :return: List of (verb, object, category, breed) tuples
+        """
+
+        lemmatized_requests = [self._fast_tokens(user_request) for user_request in user_requests]
+        slow_requests = [i for i, tokens in enumerate(lemmatized_requests) if tokens is None]
+
+        if slow_requests:
+            self._load_resources()
+
+            tokenized_requests = {i: self._filtered_tokens(user_requests[i]) for i in slow_requests}
+            vocabulary = {token for tokens in tokenized_requests.values() for token in tokens}
+            lemmas = {token: self._lemmatize(token) for token in vocabulary}
+
+            for i, tokens in tokenized_requests.items():
+                lemmatized_requests[i] = [lemmas[token] for token in tokens]
+
+        results = []
+
+        for tokens in lemmatized_requests:
+            action, obj = self._find_action(tokens)
+            results.append(self.resolve_keywords(action, obj, keyword_matcher))
+
+        return results
+
+    def process_many(self, user_requests, keyword_matcher=None, processes=1):
+        """
+        Resolves a batch of requests, e.g. when replaying archived messages. Identical requests are only processed
+        once, and with more than one process the distinct requests are spread over a process pool.
+
+        :param user_requests: Iterable of raw user inputs
+        :param keyword_matcher: KeywordMatcher compiled from the category and breed tables
+        :param processes: Number of worker processes; 1 processes the batch in this process
+        :return: List of (verb, object, category, breed) tuples in the same order as the requests
+        """
+
+        user_requests = list(user_requests)
+        distinct_requests = list(dict.fromkeys(user_requests))
+
+        if processes > 1 and len(distinct_requests) > 1:
+            chunk_count = min(len(distinct_requests), processes * 4)
+            chunks = [distinct_requests[i::chunk_count] for i in range(chunk_count)]
+            resolved = {}
+
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_initialize_worker,
+                initargs=(self.lemma_cache_size, self.fast_parser is not None),
+            ) as executor:
+                chunk_results = executor.map(_process_chunk, chunks, [keyword_matcher] * chunk_count)
+
+                for chunk, results in zip(chunks, chunk_results):
+                    resolved.update(zip(chunk, results))
+
+        else:
+            resolved = dict(zip(distinct_requests, self._process_batch(distinct_requests, keyword_matcher)))
+
+        return [resolved[user_request] for user_request in user_requests]
+
     @staticmethod
     def get_keywords_in_string(keywords, string_):
         """
         For a given list of keywords, search if any keyword exists in the given string. Return the first keyword
-        found in string.
+        found in string. This is a plain substring scan in keyword order; matching against the category and breed
+        tables is done with the precompiled KeywordMatcher instead.
 
         :param keywords: List of keywords
         :param string_: String to search in
@@ -55,3 +255,31 @@ class RequestProcessor:
                 return word
 
         return None
+
+
+# Processor owned by each process_many worker process
+_worker_processor = None
+
+
+def _initialize_worker(lemma_cache_size, fast_path):
+    """
+    Loads the NLTK resources once in a process_many worker process.
+
+    :param lemma_cache_size: Maximum number of lemmatization results to cache
+    :param fast_path: Whether the worker tries the FastParser first, as the calling processor does
+    """
+
+    global _worker_processor
+    _worker_processor = RequestProcessor(eager=True, lemma_cache_size=lemma_cache_size, fast_path=fast_path)
+
+
+def _process_chunk(user_requests, keyword_matcher):
+    """
+    Resolves a chunk of requests in a process_many worker process.
+
+    :param user_requests: List of distinct raw user inputs
+    :param keyword_matcher: KeywordMatcher compiled from the category and breed tables
+    :return: List of (verb, object, category, breed) tuples
+    """
+
+    return _worker_processor._process_batch(user_requests, keyword_matcher)
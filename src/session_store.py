@@ -0,0 +1,127 @@
+import re
+import threading
+
+IMAGE = "image"
+FACT = "fact"
+
+# Words that ask for the same again, e.g. "another one", "more please", "again!"
+FOLLOW_UP_WORDS = {"another", "more", "again", "next"}
+
+# Words a follow-up may contain besides a follow-up word, e.g. "send me another one please"
+FOLLOW_UP_FILLER_WORDS = {
+    "a",
+    "cat",
+    "cats",
+    "can",
+    "could",
+    "give",
+    "gimme",
+    "i",
+    "have",
+    "me",
+    "one",
+    "ones",
+    "pls",
+    "plz",
+    "please",
+    "send",
+    "show",
+    "some",
+    "thanks",
+    "you",
+}
+
+WORD = re.compile(r"[a-z]+")
+
+
+def is_follow_up(message):
+    """
+    Determines whether a message asks for the same as the sender's last request rather than something new.
+
+    :param message: Raw message body
+    :return: True if the message has a follow-up word and nothing but filler words besides; False otherwise
+    """
+
+    words = set(WORD.findall(message.lower()))
+    return bool(words & FOLLOW_UP_WORDS) and words <= FOLLOW_UP_WORDS | FOLLOW_UP_FILLER_WORDS
+
+
+class SessionStore:
+    """
+    Class to remember what each sender last asked for and the images already sent to them, so a follow-up such as
+    "another one" repeats the last request without the language processing, and no image is sent to a sender twice.
+    """
+
+    def __init__(self, backend, max_images=50):
+        """
+        Initializes the store.
+
+        :param backend: TTLCache for per-process sessions, or SQLiteCache to share them between worker processes; its
+        TTL is how long a session lasts after the sender's last message
+        :param max_images: Number of image urls remembered per sender
+        """
+
+        self.backend = backend
+        self.max_images = max_images
+
+        self._lock = threading.Lock()
+        self.follow_ups = 0
+
+    def get(self, number):
+        """
+        Looks up the session of a sender.
+
+        :param number: Number the message was sent from
+        :return: Dict with the "kind" of the last request (IMAGE or FACT), its "category" and "breed", and the image
+        urls "sent" to the sender, or None if the sender has no session
+        """
+
+        return self.backend.get(number) if number else None
+
+    def follow_up(self, session, message):
+        """
+        Determines whether a message repeats the last request of a session.
+
+        :param session: Session of the sender, or None
+        :param message: Raw message body
+        :return: True if the message is a follow-up to the session's last request; False otherwise
+        """
+
+        if session is None or not is_follow_up(message):
+            return False
+
+        with self._lock:
+            self.follow_ups += 1
+
+        return True
+
+    def remember(self, number, session, kind, category=None, breed=None, image_url=None):
+        """
+        Stores a sender's last request.
+
+        :param number: Number the message was sent from
+        :param session: Session of the sender before this request, or None
+        :param kind: IMAGE or FACT
+        :param category: Category keyword of the request, or None
+        :param breed: Breed name of the request, or None
+        :param image_url: Url of the image sent, or None
+        """
+
+        if not number:
+            return
+
+        sent = list(session["sent"]) if session else []
+
+        if image_url:
+            sent = (sent + [image_url])[-self.max_images :]
+
+        self.backend.set(number, {"kind": kind, "category": category, "breed": breed, "sent": sent})
+
+    def stats(self):
+        """
+        Returns the session counters for monitoring.
+
+        :return: Dict with the follow-ups answered from a session and the number of sessions
+        """
+
+        return {"follow_ups": self.follow_ups, "sessions": len(self.backend)}
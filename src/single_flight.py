@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class _Flight:
+    """State of one call shared by the callers that asked for the same key while it ran."""
+
+    def __init__(self, done):
+        self.done = done
+        self.callers = 0
+        self.items = deque()
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Class to coalesce concurrent calls for the same key into a single call. The call returns a batch of items, every
+    caller that joined it gets a different item, and the items left over once every caller has taken one are handed
+    to a callback, e.g. to pool them for later requests.
+    """
+
+    event_factory = threading.Event
+
+    def __init__(self, on_leftovers=None):
+        """
+        Initializes the coalescer.
+
+        :param on_leftovers: Optional callable taking (key, list of items) for the items no caller took
+        """
+
+        self.on_leftovers = on_leftovers
+
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        """
+        Joins the running call for a key, or starts one.
+
+        :param key: Hashable key of the call
+        :return: Tuple of (flight, whether this caller makes the call)
+        """
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self._flights[key] = _Flight(self.event_factory())
+                self.calls += 1
+
+            else:
+                self.coalesced += 1
+
+            flight.callers += 1
+
+        return flight, leader
+
+    def _finish(self, key, flight, items=(), error=None):
+        """Records the outcome of a call; callers arriving from now on start a new call."""
+
+        with self._lock:
+            flight.items.extend(items)
+            flight.error = error
+
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _take(self, key, flight, exclude=()):
+        """
+        Takes this caller's item from a finished call.
+
+        :param exclude: Items this caller does not want; they are left for the other callers
+        :return: Item, or None if the other callers took every item not excluded
+        :raises Exception: The exception raised by the call
+        """
+
+        with self._lock:
+            flight.callers -= 1
+            item = None
+
+            if flight.error is None:
+                item = next((candidate for candidate in flight.items if candidate not in exclude), None)
+
+                if item is not None:
+                    flight.items.remove(item)
+
+            leftovers = list(flight.items) if flight.callers == 0 else []
+
+            if flight.callers == 0:
+                flight.items.clear()
+
+        if leftovers and self.on_leftovers:
+            self.on_leftovers(key, leftovers)
+
+        if flight.error is not None:
+            raise flight.error
+
+        return item
+
+    def take(self, key, fetch, exclude=()):
+        """
+        Takes an item for a key, sharing the call made by any concurrent caller with the same key.
+
+        :param key: Hashable key, e.g. the search parameters
+        :param fetch: Callable taking no arguments and returning a list of items
+        :param exclude: Items this caller does not want, e.g. images already sent to the requester
+        :return: Item, or None if the batch ran out of items not excluded before this caller's turn
+        """
+
+        flight, leader = self._join(key)
+
+        if leader:
+            try:
+                self._finish(key, flight, items=fetch())
+
+            # Cancellation and interrupts end the call too, or later callers would wait on a flight that never lands
+            except BaseException as error:
+                self._finish(key, flight, error=error)
+
+            finally:
+                flight.done.set()
+
+        else:
+            flight.done.wait()
+
+        return self._take(key, flight, exclude)
+
+    def stats(self):
+        """
+        Returns the coalescing counters.
+
+        :return: Dict with the calls made and the callers that shared another caller's call
+        """
+
+        return {"calls": self.calls, "coalesced": self.coalesced}
+
+
+class AsyncSingleFlight(SingleFlight):
+    """Class to coalesce concurrent calls like SingleFlight for coroutines running on one event loop."""
+
+    event_factory = asyncio.Event
+
+    async def take(self, key, fetch, exclude=()):
+        """
+        Takes an item for a key, sharing the call made by any concurrent caller with the same key.
+
+        :param key: Hashable key, e.g. the search parameters
+        :param fetch: Coroutine function taking no arguments and returning a list of items
+        :param exclude: Items this caller does not want, e.g. images already sent to the requester
+        :return: Item, or None if the batch ran out of items not excluded before this caller's turn
+        """
+
+        flight, leader = self._join(key)
+
+        if leader:
+            try:
+                self._finish(key, flight, items=await fetch())
+
+            except BaseException as error:
+                self._finish(key, flight, error=error)
+
+            finally:
+                flight.done.set()
+
+        else:
+            await flight.done.wait()
+
+        return self._take(key, flight, exclude)
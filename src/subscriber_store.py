@@ -0,0 +1,278 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class SubscriberStore:
+    """
+    Class to keep broadcast subscribers and the progress of each broadcast run in a SQLite file.
+
+    Each delivery is claimed before it is sent and recorded after, so a run that is interrupted can be resumed without
+    messaging anyone twice.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the store, creating the database file and tables if necessary.
+
+        :param path: Path of the SQLite database file
+        """
+
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS subscribers (number TEXT PRIMARY KEY, category TEXT NOT NULL DEFAULT '', "
+            "breed TEXT NOT NULL DEFAULT '', active INTEGER NOT NULL DEFAULT 1, subscribed_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS subscribers_segment ON subscribers (active, category, breed)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS broadcast_runs (run_id TEXT PRIMARY KEY, started_at REAL NOT NULL, "
+            "finished_at REAL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS broadcast_segments (run_id TEXT NOT NULL, category TEXT NOT NULL, "
+            "breed TEXT NOT NULL, image_url TEXT, message TEXT NOT NULL, PRIMARY KEY (run_id, category, breed))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS broadcast_deliveries (run_id TEXT NOT NULL, number TEXT NOT NULL, "
+            "status TEXT NOT NULL, sid TEXT, error TEXT, updated_at REAL NOT NULL, PRIMARY KEY (run_id, number))"
+        )
+
+    def _connection(self):
+        """
+        Returns this thread's connection to the database; sqlite3 connections cannot be shared between threads.
+
+        :return: sqlite3.Connection
+        """
+
+        connection = getattr(self._local, "connection", None)
+
+        # A connection inherited from a parent process must not be used after a fork
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    @staticmethod
+    def _resolve_keyword(keyword_matcher, kind, text):
+        """
+        Looks up the category or breed of a segment in the keyword tables.
+
+        :param keyword_matcher: KeywordMatcher compiled from the category and breed tables
+        :param kind: "category" or "breed"
+        :param text: Category or breed as given, e.g. "hats", or None
+        :return: Keyword from the tables, e.g. "hat", or None without text
+        :raises ValueError: If the text names no keyword of that kind
+        """
+
+        if not text:
+            return None
+
+        keyword = keyword_matcher.search(text).get(kind)
+
+        if keyword is None:
+            raise ValueError(f"Unknown {kind}: {text}")
+
+        return keyword
+
+    def subscribe(self, number, category=None, breed=None, keyword_matcher=None):
+        """
+        Adds a subscriber, or updates the segment of an existing one and reactivates them.
+
+        :param number: Phone number of the subscriber
+        :param category: Optional category keyword of the images they receive
+        :param breed: Optional breed name of the images they receive
+        :param keyword_matcher: KeywordMatcher compiled from the category and breed tables; if given, the category and
+        breed are stored as the keywords it finds in them, e.g. "hat" for "hats"
+        :raises ValueError: If the category or breed is not in the keyword matcher's tables
+        """
+
+        if keyword_matcher is not None:
+            category = self._resolve_keyword(keyword_matcher, "category", category)
+            breed = self._resolve_keyword(keyword_matcher, "breed", breed)
+
+        self._connection().execute(
+            "INSERT INTO subscribers (number, category, breed, active, subscribed_at) VALUES (?, ?, ?, 1, ?) "
+            "ON CONFLICT (number) DO UPDATE SET category = excluded.category, breed = excluded.breed, active = 1",
+            (number, category or "", breed or "", time.time()),
+        )
+
+    def unsubscribe(self, number):
+        """
+        Stops sending broadcasts to a subscriber.
+
+        :param number: Phone number of the subscriber
+        :return: True if the number was subscribed; False otherwise
+        """
+
+        cursor = self._connection().execute(
+            "UPDATE subscribers SET active = 0 WHERE number = ? AND active = 1", (number,)
+        )
+        return cursor.rowcount > 0
+
+    def count(self):
+        """Returns the number of active subscribers."""
+
+        return self._connection().execute("SELECT COUNT(*) FROM subscribers WHERE active = 1").fetchone()[0]
+
+    def segments(self):
+        """
+        Lists the segments that have active subscribers.
+
+        :return: List of (category, breed) tuples, with None for an unset category or breed
+        """
+
+        rows = self._connection().execute(
+            "SELECT DISTINCT category, breed FROM subscribers WHERE active = 1 ORDER BY category, breed"
+        )
+        return [(category or None, breed or None) for category, breed in rows]
+
+    def pending_numbers(self, run_id, category, breed, after="", limit=500):
+        """
+        Lists active subscribers in a segment that the run has not tried to message yet, in number order.
+
+        :param run_id: Broadcast run id
+        :param category: Category of the segment, or None
+        :param breed: Breed of the segment, or None
+        :param after: Only return numbers after this one, to page through large segments
+        :param limit: Maximum number of numbers to return
+        :return: List of phone numbers
+        """
+
+        rows = self._connection().execute(
+            "SELECT s.number FROM subscribers s LEFT JOIN broadcast_deliveries d "
+            "ON d.run_id = ? AND d.number = s.number "
+            "WHERE s.active = 1 AND s.category = ? AND s.breed = ? AND s.number > ? "
+            "AND (d.number IS NULL OR d.status = 'failed') ORDER BY s.number LIMIT ?",
+            (run_id, category or "", breed or "", after, limit),
+        )
+        return [number for (number,) in rows]
+
+    def start_run(self, run_id):
+        """
+        Records the start of a run; resuming an existing run keeps its original start time.
+
+        :param run_id: Broadcast run id
+        """
+
+        self._connection().execute(
+            "INSERT OR IGNORE INTO broadcast_runs (run_id, started_at) VALUES (?, ?)", (run_id, time.time())
+        )
+
+    def finish_run(self, run_id):
+        """
+        Records that every segment of a run has been worked through.
+
+        :param run_id: Broadcast run id
+        """
+
+        self._connection().execute("UPDATE broadcast_runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def is_finished(self, run_id):
+        """
+        Determines whether a run has been completed.
+
+        :param run_id: Broadcast run id
+        :return: True if the run finished; False otherwise
+        """
+
+        row = (
+            self._connection().execute("SELECT finished_at FROM broadcast_runs WHERE run_id = ?", (run_id,)).fetchone()
+        )
+        return bool(row and row[0])
+
+    def get_segment_image(self, run_id, category, breed):
+        """
+        Looks up the image picked for a segment earlier in the run.
+
+        :param run_id: Broadcast run id
+        :param category: Category of the segment, or None
+        :param breed: Breed of the segment, or None
+        :return: Tuple of (image url, text message), or None if no image was picked yet
+        """
+
+        row = (
+            self._connection()
+            .execute(
+                "SELECT image_url, message FROM broadcast_segments WHERE run_id = ? AND category = ? AND breed = ?",
+                (run_id, category or "", breed or ""),
+            )
+            .fetchone()
+        )
+        return tuple(row) if row else None
+
+    def save_segment_image(self, run_id, category, breed, image_url, message):
+        """
+        Records the image picked for a segment; an image saved earlier is kept.
+
+        :param run_id: Broadcast run id
+        :param category: Category of the segment, or None
+        :param breed: Breed of the segment, or None
+        :param image_url: Url of the image
+        :param message: Text sent with the image
+        :return: Tuple of (image url, text message) in effect for the segment
+        """
+
+        self._connection().execute(
+            "INSERT OR IGNORE INTO broadcast_segments (run_id, category, breed, image_url, message) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (run_id, category or "", breed or "", image_url, message),
+        )
+        return self.get_segment_image(run_id, category, breed)
+
+    def claim(self, run_id, number):
+        """
+        Marks a delivery as being sent. Only deliveries never attempted, or known to have failed, can be claimed, so
+        a message whose outcome is unknown (e.g. the process died mid-send) is never sent again.
+
+        :param run_id: Broadcast run id
+        :param number: Phone number of the subscriber
+        :return: True if the caller should send the message; False otherwise
+        """
+
+        cursor = self._connection().execute(
+            "INSERT INTO broadcast_deliveries (run_id, number, status, updated_at) VALUES (?, ?, 'sending', ?) "
+            "ON CONFLICT (run_id, number) DO UPDATE SET status = 'sending', error = NULL, "
+            "updated_at = excluded.updated_at WHERE status = 'failed'",
+            (run_id, number, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def record(self, run_id, number, status, sid=None, error=None):
+        """
+        Records the outcome of a claimed delivery.
+
+        :param run_id: Broadcast run id
+        :param number: Phone number of the subscriber
+        :param status: "sent", "failed" (the message was not accepted and may be retried) or "unknown"
+        :param sid: Twilio message SID of a sent message
+        :param error: Description of the error of a failed delivery
+        """
+
+        self._connection().execute(
+            "UPDATE broadcast_deliveries SET status = ?, sid = ?, error = ?, updated_at = ? "
+            "WHERE run_id = ? AND number = ?",
+            (status, sid, error, time.time(), run_id, number),
+        )
+
+    def run_summary(self, run_id):
+        """
+        Counts the deliveries of a run by status.
+
+        :param run_id: Broadcast run id
+        :return: Dict mapping status to count
+        """
+
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) FROM broadcast_deliveries WHERE run_id = ? GROUP BY status", (run_id,)
+        )
+        return dict(rows.fetchall())
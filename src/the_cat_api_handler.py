@@ -1,20 +1,233 @@
 import logging
+import os
+import threading
+import time
+from functools import partial
 
 import requests
-from nltk.stem import WordNetLemmatizer
-
-from src.utilities import CAT_API_KEY
-
-CAT_API_URL = "https://api.thecatapi.com/v1"
-CAT_API_HEADER = {"x-api-key": CAT_API_KEY}
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.connection_pools import reset_after_fork
+from src.fallback_images import FallbackImages
+from src.id_table_cache import IDTableCache
+from src.image_pool import ImagePool
+from src.single_flight import SingleFlight
+from src.utilities import (
+    CAT_API_COALESCE_BATCH,
+    CAT_API_CONNECT_TIMEOUT,
+    CAT_API_FAILURE_THRESHOLD,
+    CAT_API_FALLBACK_PATH,
+    CAT_API_FALLBACK_SAVE_INTERVAL,
+    CAT_API_FALLBACK_SIZE,
+    CAT_API_ID_CACHE_PATH,
+    CAT_API_ID_CACHE_TTL,
+    CAT_API_KEY,
+    CAT_API_MAX_RETRIES,
+    CAT_API_POOL_SIZE,
+    CAT_API_READ_TIMEOUT,
+    CAT_API_RECOVERY_TIMEOUT,
+    CAT_API_URL,
+    CAT_IMAGE_POOL_LOW_WATER_MARK,
+    CAT_IMAGE_POOL_SIZE,
+)
+from src.vocabulary_index import VocabularyIndex
+
+CAT_API_HEADER = {"x-api-key": CAT_API_KEY} if CAT_API_KEY else {}
+RANDOM_CAT_MESSAGE = "Here is a random cat!"
+UNAVAILABLE_MESSAGE = "Sorry, I couldn't fetch a cat right now. Please try again later."
+
+# TheCatAPI calls made for a requester who has already been sent every image they returned, before one is sent again
+MAX_EXCLUDED_FETCHES = 3
+
+# Fraction of the id cache TTL to wait after a failed id refresh before trying again
+ID_REFRESH_RETRY_FRACTION = 0.1
+
+
+class CatAPIError(Exception):
+    """Raised when TheCatAPI answers an image search with an error or without images."""
 
 
 class CatAPIHandler:
     """Class to handle TheCatAPI services."""
 
-    def __init__(self):
-        self.CATEGORY_IDS = self._get_category_ids()
-        self.BREED_IDS = self._get_breed_ids()
+    def __init__(
+        self,
+        image_pool_size=CAT_IMAGE_POOL_SIZE,
+        image_pool_low_water_mark=CAT_IMAGE_POOL_LOW_WATER_MARK,
+        id_cache_path=CAT_API_ID_CACHE_PATH,
+        id_cache_ttl=CAT_API_ID_CACHE_TTL,
+        pool_size=CAT_API_POOL_SIZE,
+        connect_timeout=CAT_API_CONNECT_TIMEOUT,
+        read_timeout=CAT_API_READ_TIMEOUT,
+        max_retries=CAT_API_MAX_RETRIES,
+        failure_threshold=CAT_API_FAILURE_THRESHOLD,
+        recovery_timeout=CAT_API_RECOVERY_TIMEOUT,
+        fallback_path=CAT_API_FALLBACK_PATH,
+        fallback_size=CAT_API_FALLBACK_SIZE,
+        fallback_save_interval=CAT_API_FALLBACK_SAVE_INTERVAL,
+        coalesce_batch=CAT_API_COALESCE_BATCH,
+    ):
+        """
+        Initializes the handler with the category and breed ids. The ids are read from the local cache file when
+        one exists, so only the first start (or a start with an empty cache) has to wait for TheCatAPI.
+
+        :param image_pool_size: Number of pre-fetched image urls to keep for each search; 0 disables the pool
+        :param image_pool_low_water_mark: Pool level below which a search is refilled in the background
+        :param id_cache_path: Path of the category and breed id cache file; None disables the cache
+        :param id_cache_ttl: Number of seconds after which the cached ids are refreshed in the background
+        :param pool_size: Maximum number of kept-alive connections to TheCatAPI
+        :param connect_timeout: Seconds to wait for a connection to TheCatAPI
+        :param read_timeout: Seconds to wait for TheCatAPI to respond
+        :param max_retries: Number of retries for connection errors and 429/5xx responses
+        :param failure_threshold: Number of consecutive failed image searches after which TheCatAPI is not called
+        :param recovery_timeout: Seconds before an image search is tried again after the failure threshold is reached
+        :param fallback_path: Path of the file remembering image urls to reply with while TheCatAPI is unavailable
+        :param fallback_size: Number of fallback image urls to remember for each search
+        :param fallback_save_interval: Minimum number of seconds between writes of the fallback image file
+        :param coalesce_batch: Minimum number of images requested by a call shared between concurrent searches
+        """
+
+        self.session = self._create_session(pool_size, max_retries)
+        self.timeout = (connect_timeout, read_timeout)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, recovery_timeout, name="TheCatAPI")
+        self.fallback_images = FallbackImages(fallback_path, fallback_size, fallback_save_interval)
+        self.coalesce_batch = coalesce_batch
+        self.single_flight = SingleFlight(on_leftovers=self._pool_leftovers)
+
+        self.CATEGORY_IDS = {}
+        self.BREED_IDS = {}
+        self.keyword_matcher = VocabularyIndex({"category": {}, "breed": {}})
+        self._ids_fetched_at = 0
+        self._id_refresh_failed_at = 0
+        self._id_refresh_lock = threading.Lock()
+        # A refresh running in a parent process when it forks would leave the lock held in the child forever
+        os.register_at_fork(after_in_child=self._reset_id_refresh_lock)
+        self._id_cache = IDTableCache(id_cache_path, id_cache_ttl) if id_cache_path else None
+
+        cached = self._id_cache.load() if self._id_cache else None
+
+        if cached:
+            self._set_id_tables(cached["category_ids"], cached["breed_ids"], cached["fetched_at"])
+            self.refresh_ids_if_stale()
+
+        else:
+            self.refresh_ids()
+
+        self.image_pool = None
+
+        if image_pool_size > 0:
+            self.image_pool = ImagePool(
+                fetch_function=self._fetch_image_urls,
+                size=image_pool_size,
+                low_water_mark=image_pool_low_water_mark,
+            )
+
+    @staticmethod
+    def _create_session(pool_size, max_retries):
+        """
+        Creates the session used for every call to TheCatAPI, so connections are kept alive and reused instead of
+        opening a new TCP and TLS connection per request.
+
+        :param pool_size: Maximum number of kept-alive connections
+        :param max_retries: Number of retries for connection errors and 429/5xx responses
+        :return: requests.Session
+        """
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.2,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.headers.update(CAT_API_HEADER)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        return reset_after_fork(session)
+
+    def _set_id_tables(self, category_ids, breed_ids, fetched_at):
+        """
+        Swaps in new category and breed id tables along with a vocabulary index built from them.
+
+        :param category_ids: Dict mapping category keyword to category id
+        :param breed_ids: Dict mapping breed name to breed id
+        :param fetched_at: Time the tables were fetched from TheCatAPI
+        """
+
+        self.keyword_matcher = VocabularyIndex({"category": category_ids, "breed": breed_ids})
+        self.CATEGORY_IDS = category_ids
+        self.BREED_IDS = breed_ids
+        self._ids_fetched_at = fetched_at
+
+    @property
+    def ids_version(self):
+        """Returns a version string that changes whenever new category and breed ids are loaded."""
+
+        return str(self._ids_fetched_at)
+
+    def refresh_ids(self):
+        """Fetches the category and breed ids from TheCatAPI and writes them to the cache file."""
+
+        category_ids = self._get_category_ids()
+        breed_ids = self._get_breed_ids()
+        fetched_at = time.time()
+
+        self._set_id_tables(category_ids, breed_ids, fetched_at)
+
+        if self._id_cache:
+            self._id_cache.save(category_ids, breed_ids, fetched_at)
+
+    def _reset_id_refresh_lock(self):
+        self._id_refresh_lock = threading.Lock()
+
+    def refresh_ids_if_stale(self):
+        """
+        Starts a background refresh of the category and breed ids if they are older than the cache TTL, unless a
+        refresh failed within the last ID_REFRESH_RETRY_FRACTION of the TTL.
+        """
+
+        if not self._id_cache or not self._id_cache.is_stale(self._ids_fetched_at):
+            return
+
+        # While TheCatAPI is down, every request would otherwise start another refresh
+        if time.time() - self._id_refresh_failed_at < self._id_cache.ttl * ID_REFRESH_RETRY_FRACTION:
+            return
+
+        # Only one refresh at a time; requests keep using the current tables in the meantime
+        if not self._id_refresh_lock.acquire(blocking=False):
+            return
+
+        thread = threading.Thread(target=self._background_refresh_ids, daemon=True)
+        thread.start()
+
+    def _background_refresh_ids(self):
+        """Refresh thread body."""
+
+        try:
+            # Another worker may already have refreshed the shared cache file
+            cached = self._id_cache.load()
+
+            if cached and not self._id_cache.is_stale(cached["fetched_at"]):
+                self._set_id_tables(cached["category_ids"], cached["breed_ids"], cached["fetched_at"])
+
+            else:
+                self.refresh_ids()
+
+            logging.info(
+                "Refreshed TheCatAPI ids: %d categories, %d breeds", len(self.CATEGORY_IDS), len(self.BREED_IDS)
+            )
+
+        except Exception as error:
+            self._id_refresh_failed_at = time.time()
+            logging.warning("Failed to refresh TheCatAPI ids: %s", error)
+
+        finally:
+            self._id_refresh_lock.release()
 
     def _get_category_ids(self):
         """
@@ -26,11 +239,14 @@ class CatAPIHandler:
         category_ids = {}
         parameter = "/categories"
 
-        response = requests.get(url=CAT_API_URL + parameter, headers=CAT_API_HEADER)
+        response = self.session.get(url=CAT_API_URL + parameter, timeout=self.timeout)
 
         # list of each category
         json_data = response.json()
 
+        # Imported here so that importing this module does not import NLTK
+        from nltk.stem import WordNetLemmatizer
+
         lemmatizer = WordNetLemmatizer()
 
         for category_info in json_data:
@@ -50,7 +266,7 @@ class CatAPIHandler:
         breed_ids = {}
         parameter = "/breeds"
 
-        response = requests.get(url=CAT_API_URL + parameter, headers=CAT_API_HEADER)
+        response = self.session.get(url=CAT_API_URL + parameter, timeout=self.timeout)
 
         # list of each breed
         json_data = response.json()
@@ -62,19 +278,18 @@ class CatAPIHandler:
 
         return breed_ids
 
-    def get_cat_image(self, category=None, breed=None):
+    def _get_search_parameters(self, category=None, breed=None):
         """
-        Sends a request to TheCatAPI and retrieves only an image url.
+        Works out the image search parameters and reply text for a requested category or breed.
 
-        :param category: Optional parameter to get an image of a cat with a particular category. Valid categories
-        include boxes, clothes, hats, sinks, space, sunglasses, and ties.
-        :param breed: Optional parameter to get an image of a cat that is a specified breed.
-        :return: Tuple containing the image url and text message.
+        :param category: Optional category keyword
+        :param breed: Optional breed name
+        :return: Tuple containing a dict of search parameters and the text message.
         """
 
         # Category will get precedence if both category and breed are specified
         if category in self.CATEGORY_IDS:
-            parameter = f"/images/search?category_ids={self.CATEGORY_IDS[category]}"
+            parameters = {"category_ids": self.CATEGORY_IDS[category]}
 
             if category in {"hat", "tie"}:
                 message = f"Here is a cat wearing a {category}!"
@@ -93,26 +308,196 @@ class CatAPIHandler:
                 message = f"Here is a cat wearing sunglasses!"
 
         elif breed in self.BREED_IDS:
-            parameter = f"/images/search?breed_ids={self.BREED_IDS[breed]}"
+            parameters = {"breed_ids": self.BREED_IDS[breed]}
             message = f"Here is a {breed.title()} cat!"
 
         else:
-            parameter = "/images/search"
-            message = "Here is a random cat!"
+            parameters = {}
+            message = RANDOM_CAT_MESSAGE
 
-        # Make request to API and get relevant data
-        response = requests.get(url=CAT_API_URL + parameter, headers=CAT_API_HEADER)
-        json_data = response.json()
-        image_url = json_data[0]["url"]
-
-        # Log data
-        data = (
-            f"The Cat API Parameters:\n"
-            f"    Category?: {category}\n"
-            f"    Breed?: {breed}\n"
-            f"    API Parameter: {parameter}\n"
-            f"    Response Code: {response.status_code}\n"
+        return parameters, message
+
+    @staticmethod
+    def _parse_image_urls(parameters, limit, response_code, json_data):
+        """
+        Extracts the image urls from an image search response and logs the call.
+
+        :param parameters: Dict of search parameters
+        :param limit: Number of images requested
+        :param response_code: HTTP status code of the response
+        :param json_data: Decoded response body
+        :return: List of image urls
+        :raises CatAPIError: If the response is an error or has no images
+        """
+
+        if response_code != 200 or not isinstance(json_data, list) or not json_data:
+            raise CatAPIError(f"TheCatAPI image search {parameters} failed with status {response_code}: {json_data}")
+
+        logging.info(
+            "TheCatAPI image search %s limit=%d returned=%d status=%d", parameters, limit, len(json_data), response_code
+        )
+
+        return [image_info["url"] for image_info in json_data]
+
+    def _request_image_urls(self, parameters, limit):
+        """
+        Sends a request to TheCatAPI image search.
+
+        :param parameters: Dict of search parameters
+        :param limit: Number of images to request in one call
+        :return: List of image urls
+        """
+
+        response = self.session.get(
+            url=CAT_API_URL + "/images/search",
+            params={**parameters, "limit": limit},
+            timeout=self.timeout,
+        )
+
+        return self._parse_image_urls(parameters, limit, response.status_code, response.json())
+
+    def _fetch_image_urls(self, parameters, limit=1):
+        """
+        Sends a request to TheCatAPI image search through the circuit breaker, and remembers the returned urls as
+        fallback images.
+
+        :param parameters: Dict of search parameters
+        :param limit: Number of images to request in one call
+        :return: List of image urls
+        :raises CircuitOpenError: If TheCatAPI has been failing and is not being called
+        """
+
+        image_urls = self.circuit_breaker.call(self._request_image_urls, parameters, limit)
+        self._remember_images(parameters, image_urls)
+
+        return image_urls
+
+    def _remember_images(self, parameters, image_urls):
+        """
+        Adds fetched urls to the fallback images.
+
+        :param parameters: Dict of search parameters
+        :param image_urls: List of fetched image urls
+        """
+
+        self.fallback_images.add(parameters, image_urls)
+        self.fallback_images.save_later()
+
+    def _fallback_image(self, parameters, message, error):
+        """
+        Picks a remembered image url for a search that TheCatAPI could not serve.
+
+        :param parameters: Dict of search parameters
+        :param message: Text message of the requested image
+        :param error: Exception raised by the image search
+        :return: Tuple containing the image url and text message; the url is None if no image has been remembered
+        """
+
+        image_url = self.fallback_images.pick(parameters, any_search=False)
+
+        if image_url is None and parameters:
+            # An image remembered for another search does not show the requested category or breed
+            image_url = self.fallback_images.pick(parameters)
+            message = RANDOM_CAT_MESSAGE
+
+        logging.warning("TheCatAPI unavailable (%s); replying with fallback image %s", error, image_url)
+
+        if image_url is None:
+            return None, UNAVAILABLE_MESSAGE
+
+        return image_url, message
+
+    @property
+    def fetch_limit(self):
+        """Returns how many images to request when the pool cannot serve a search."""
+
+        # Fetch a full batch on a miss so that the following requests for this search are served from memory, and
+        # enough images for the concurrent searches sharing the call to get one each
+        return max(self.image_pool.size + 1 if self.image_pool else 1, self.coalesce_batch)
+
+    def _get_pooled_image(self, parameters, exclude=()):
+        """
+        Takes an image url for a search from the pool.
+
+        :param parameters: Dict of search parameters
+        :param exclude: Image urls not to take
+        :return: Image url, or None if the pool is disabled or has no url besides the excluded ones
+        """
+
+        return self.image_pool.get(parameters, exclude) if self.image_pool else None
+
+    def _pool_leftovers(self, key, image_urls):
+        """
+        Pools the images of a shared call that none of the concurrent searches took.
+
+        :param key: Pool key of the search parameters
+        :param image_urls: List of image urls left over
+        """
+
+        if self.image_pool:
+            self.image_pool.put(dict(key), image_urls)
+
+    def _fetch_shared_image(self, parameters, exclude=()):
+        """
+        Fetches an image url for a search, sharing one TheCatAPI call between every concurrent search with the same
+        parameters. Each search gets a different image; a search arriving after the shared batch ran out starts the
+        next call.
+
+        :param parameters: Dict of search parameters
+        :param exclude: Image urls not to return unless MAX_EXCLUDED_FETCHES calls found nothing else
+        :return: Image url
+        :raises CatAPIError: If every attempt ended with the batch taken by other searches
+        """
+
+        key = ImagePool._key(parameters)
+        fetch = partial(self._fetch_image_urls, parameters, limit=self.fetch_limit)
+
+        for attempt in range(MAX_EXCLUDED_FETCHES + 1):
+            # A requester who has been sent every image of several batches gets a repeat rather than no image
+            skip = exclude if attempt < MAX_EXCLUDED_FETCHES else ()
+            image_url = self.single_flight.take(key, fetch, skip)
+
+            if image_url is None:
+                # The rest of the batch may have been pooled by the last caller sharing it
+                image_url = self._get_pooled_image(parameters, skip)
+
+            if image_url is not None:
+                return image_url
+
+        raise CatAPIError(f"No image left for {parameters} after {MAX_EXCLUDED_FETCHES + 1} attempts")
+
+    @staticmethod
+    def _log_image_request(category, breed, parameters, pool_hit):
+        """Logs how an image request was served."""
+
+        logging.info(
+            "Image request category=%s breed=%s parameters=%s pool_hit=%s", category, breed, parameters, pool_hit
         )
-        logging.info(data)
+
+    def get_cat_image(self, category=None, breed=None, exclude=()):
+        """
+        Retrieves an image url from the pre-fetched pool, falling back to a request to TheCatAPI.
+
+        :param category: Optional parameter to get an image of a cat with a particular category. Valid categories
+        include boxes, clothes, hats, sinks, space, sunglasses, and ties.
+        :param breed: Optional parameter to get an image of a cat that is a specified breed.
+        :param exclude: Optional collection of image urls not to return, e.g. those already sent to the requester.
+        :return: Tuple containing the image url and text message.
+        """
+
+        self.refresh_ids_if_stale()
+
+        parameters, message = self._get_search_parameters(category=category, breed=breed)
+        image_url = self._get_pooled_image(parameters, exclude)
+        pool_hit = image_url is not None
+
+        if not pool_hit:
+            try:
+                image_url = self._fetch_shared_image(parameters, exclude)
+
+            except (CircuitOpenError, CatAPIError, requests.RequestException, ValueError) as error:
+                return self._fallback_image(parameters, message, error)
+
+        self._log_image_request(category, breed, parameters, pool_hit)
 
         return image_url, message
@@ -0,0 +1,280 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Class implementing a bounded in-memory LRU cache whose entries expire after a time to live."""
+
+    def __init__(self, max_size=1024, ttl=3600):
+        """
+        Initializes an empty cache.
+
+        :param max_size: Maximum number of entries; the least recently used entry is evicted beyond this
+        :param ttl: Number of seconds an entry stays valid
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Looks up a key.
+
+        :param key: Cache key
+        :param default: Value returned when the key is missing or expired
+        :return: Cached value, else default
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Stores a value.
+
+        :param key: Cache key
+        :param value: Value to store
+        """
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value):
+        """
+        Stores a value unless the key already holds one that has not expired. Checking and storing is atomic.
+
+        :param key: Cache key
+        :param value: Value to store
+        :return: True if the value was stored; False if the key was taken
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+            return True
+
+    def replace(self, key, expected, value):
+        """
+        Stores a value only if the key still holds the expected value. Checking and storing is atomic.
+
+        :param key: Cache key
+        :param expected: Value the key must hold, as returned by get
+        :param value: Value to store
+        :return: True if the value was stored; False if the key is missing, expired or holds another value
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] <= time.monotonic() or entry[1] != expected:
+                return False
+
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            return True
+
+    def delete(self, key):
+        """
+        Removes a key if it is present.
+
+        :param key: Cache key
+        """
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Class implementing the TTLCache interface on a SQLite file, so every worker process on a host shares the entries.
+    Keys must be strings and values must be JSON serializable.
+    """
+
+    def __init__(self, path, max_size=100000, ttl=3600, table="cache"):
+        """
+        Initializes the cache, creating the database file and table if necessary.
+
+        :param path: Path of the SQLite database file
+        :param max_size: Maximum number of entries; the entries closest to expiry are evicted beyond this
+        :param ttl: Number of seconds an entry stays valid
+        :param table: Name of the table holding the entries, so several caches can share one file
+        """
+
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.table = table
+
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._connection().execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        """
+        Returns this thread's connection to the database; sqlite3 connections cannot be shared between threads.
+
+        :return: sqlite3.Connection
+        """
+
+        connection = getattr(self._local, "connection", None)
+
+        # A connection inherited from a parent process must not be used after a fork
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    def get(self, key, default=None):
+        """
+        Looks up a key.
+
+        :param key: Cache key
+        :param default: Value returned when the key is missing or expired
+        :return: Cached value, else default
+        """
+
+        row = (
+            self._connection()
+            .execute(f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?", (key, time.time()))
+            .fetchone()
+        )
+
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        """
+        Stores a value.
+
+        :param key: Cache key
+        :param value: JSON serializable value to store
+        """
+
+        connection = self._connection()
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl),
+        )
+
+        # Trim the table every so often rather than on every write
+        self._writes += 1
+
+        if self._writes % 100 == 0:
+            self._trim(connection)
+
+    def add(self, key, value):
+        """
+        Stores a value unless the key already holds one that has not expired. Checking and storing is a single
+        statement, so of several processes adding the same key only one succeeds.
+
+        :param key: Cache key
+        :param value: JSON serializable value to store
+        :return: True if the value was stored; False if the key was taken
+        """
+
+        connection = self._connection()
+        now = time.time()
+        cursor = connection.execute(
+            f"INSERT INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+            f"value = excluded.value, expires_at = excluded.expires_at WHERE {self.table}.expires_at <= ?",
+            (key, json.dumps(value), now + self.ttl, now),
+        )
+
+        self._writes += 1
+
+        if self._writes % 100 == 0:
+            self._trim(connection)
+
+        return cursor.rowcount > 0
+
+    def replace(self, key, expected, value):
+        """
+        Stores a value only if the key still holds the expected value. Checking and storing is a single statement, so
+        of several processes replacing the same value only one succeeds.
+
+        :param key: Cache key
+        :param expected: Value the key must hold, as returned by get
+        :param value: JSON serializable value to store
+        :return: True if the value was stored; False if the key is missing, expired or holds another value
+        """
+
+        now = time.time()
+        cursor = self._connection().execute(
+            f"UPDATE {self.table} SET value = ?, expires_at = ? WHERE key = ? AND value = ? AND expires_at > ?",
+            (json.dumps(value), now + self.ttl, key, json.dumps(expected), now),
+        )
+
+        return cursor.rowcount > 0
+
+    def _trim(self, connection):
+        """
+        Deletes expired entries and evicts the entries closest to expiry beyond the maximum size.
+
+        :param connection: sqlite3.Connection to use
+        """
+
+        connection.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+        connection.execute(
+            f"DELETE FROM {self.table} WHERE key NOT IN "
+            f"(SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT ?)",
+            (self.max_size,),
+        )
+
+    def delete(self, key):
+        """
+        Removes a key if it is present.
+
+        :param key: Cache key
+        """
+
+        self._connection().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self):
+        return (
+            self._connection()
+            .execute(f"SELECT COUNT(*) FROM {self.table} WHERE expires_at > ?", (time.time(),))
+            .fetchone()[0]
+        )
@@ -1,19 +1,82 @@
 import logging as log
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
+import requests
+from requests.adapters import HTTPAdapter
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
+from urllib3.exceptions import NewConnectionError
 
-from src.utilities import TwilioCredentials
+from src.connection_pools import reset_after_fork
+from src.rate_limiter import TokenBucket
+from src.utilities import TWILIO_API_URL, TWILIO_SEND_RATE, TWILIO_SEND_WORKERS, TWILIO_TIMEOUT, TwilioCredentials
+
+# Outcomes of a message sent by send_many
+SENT = "sent"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+
+class BaseURLHttpClient(TwilioHttpClient):
+    """Twilio HTTP client that sends every request to another API host, such as a local stand-in."""
+
+    def __init__(self, base_url, **kwargs):
+        """
+        Initializes the client.
+
+        :param base_url: Scheme and host that replace those of every Twilio url, e.g. http://127.0.0.1:8081
+        """
+
+        super().__init__(**kwargs)
+        self.base_url = urlsplit(base_url)
+
+    def request(self, method, url, *args, **kwargs):
+        """Sends the request to the configured host instead of the host in the url."""
+
+        url = urlsplit(url)._replace(scheme=self.base_url.scheme, netloc=self.base_url.netloc).geturl()
+        return super().request(method, url, *args, **kwargs)
 
 
 class TwilioMessageHandler:
     """Class to handle Twilio services."""
 
-    def __init__(self):
-        """Initializes the object with the Twilio client."""
+    def __init__(self, send_workers=TWILIO_SEND_WORKERS, send_rate=TWILIO_SEND_RATE):
+        """
+        Initializes the object with the Twilio client.
+
+        :param send_workers: Number of messages send_many sends at the same time
+        :param send_rate: Messages per second send_many may start; 0 disables the cap
+        """
+
+        self.send_workers = send_workers
+        # No burst beyond a single message, so the cap holds from the first message on
+        self.send_rate_limiter = TokenBucket(send_rate, capacity=1) if send_rate > 0 else None
 
         try:
             self.twilio_credentials = TwilioCredentials()
-            self.twilio_client = Client(self.twilio_credentials.account_sid, self.twilio_credentials.auth_token)
+
+            if urlsplit(TWILIO_API_URL).netloc != "api.twilio.com":
+                http_client = BaseURLHttpClient(TWILIO_API_URL, timeout=TWILIO_TIMEOUT)
+
+            else:
+                # The client waits forever for a response unless given a timeout
+                http_client = TwilioHttpClient(timeout=TWILIO_TIMEOUT)
+
+            # Keep a connection alive for each concurrent sender rather than the default of 10
+            adapter = HTTPAdapter(pool_maxsize=max(send_workers, 10))
+            http_client.session.mount("https://", adapter)
+            http_client.session.mount("http://", adapter)
+            # serve.py creates this handler, and checks the credentials over the session, before forking its workers
+            reset_after_fork(http_client.session)
+
+            self.twilio_client = Client(
+                self.twilio_credentials.account_sid,
+                self.twilio_credentials.auth_token,
+                http_client=http_client,
+            )
             self.twilio_client.incoming_phone_numbers.list()
             log.info("Authentication to Twilio successful")
             self.successful_auth = True
@@ -42,18 +105,114 @@ class TwilioMessageHandler:
             media_url=[image_url],
         )
 
-        # Log data
-        data = (
-            f"Message Details:\n"
-            f"    Receiving Number: {receiving_number}\n"
-            f"    Outgoing Message: {text_message}\n"
-            f"    Image URL: {image_url}\n"
-            f"    Message SID: {message.sid}\n"
-            f"    Message Status: {message.status}\n"
-            "\n"
-        )
-        log.info(data)
-
-        log.info(f"Message has been {message.status} with SID {message.sid}")
+        log.debug("Outgoing message to %s: %s (image: %s)", receiving_number, text_message, image_url)
+        log.info("Message to %s has been %s with SID %s", receiving_number, message.status, message.sid)
 
         return message.sid
+
+    def _send_one(self, receiving_number, text_message, image_url=None):
+        """
+        Sends a message for send_many, turning its outcome into a result.
+
+        :return: Dict with the "to" number, the message "sid", the "status" (SENT, FAILED if Twilio did not accept the
+        message, or UNKNOWN if it may or may not have been accepted) and a description of the "error"
+        """
+
+        result = {"to": receiving_number, "sid": None, "status": SENT, "error": None}
+
+        try:
+            result["sid"] = self.send_message(receiving_number, text_message, image_url)
+
+        except Exception as error:
+            # Twilio may have accepted a message whose connection dropped or timed out after the request was sent
+            status = FAILED if isinstance(error, TwilioRestException) or self.is_unsent_error(error) else UNKNOWN
+            result.update(status=status, error=str(error))
+
+        else:
+            if result["sid"] is None:
+                result.update(status=FAILED, error="Twilio is not authenticated")
+
+        return result
+
+    def send_many(self, messages, rate_limiter=None, on_result=None):
+        """
+        Sends many messages over a bounded pool of threads sharing the client's kept-alive connections. Messages are
+        read from the iterable only when a sender is free and the rate cap allows another message, so a generator
+        can claim each message just before it is sent.
+
+        :param messages: Iterable of (receiving number, text message, image url) tuples
+        :param rate_limiter: TokenBucket pacing the sends; defaults to the TWILIO_SEND_RATE cap
+        :param on_result: Optional callable called with each result as soon as its message is sent, from a sender
+        thread
+        :return: List of the results of _send_one, in the order of the messages
+        """
+
+        rate_limiter = rate_limiter or self.send_rate_limiter
+        free_senders = threading.BoundedSemaphore(self.send_workers)
+        futures = []
+
+        def send(message):
+            try:
+                result = self._send_one(*message)
+
+                if on_result:
+                    on_result(result)
+
+                return result
+
+            finally:
+                free_senders.release()
+
+        with ThreadPoolExecutor(max_workers=self.send_workers, thread_name_prefix="twilio-send") as executor:
+            messages = iter(messages)
+
+            while True:
+                free_senders.acquire()
+                message = next(messages, None)
+
+                if message is None:
+                    free_senders.release()
+                    break
+
+                if rate_limiter:
+                    rate_limiter.acquire()
+
+                futures.append(executor.submit(send, message))
+
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def is_unsent_error(error):
+        """
+        Determines whether a send failed before its request reached Twilio, i.e. while connecting.
+
+        :param error: Exception raised while sending a message
+        :return: True if Twilio cannot have received the message; False otherwise
+        """
+
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+
+        if isinstance(error, requests.ConnectionError):
+            # urllib3 wraps a failure to connect in a MaxRetryError whose reason is a NewConnectionError
+            reason = getattr(error.args[0], "reason", None) if error.args else None
+            return isinstance(reason, NewConnectionError)
+
+        return False
+
+    @classmethod
+    def is_transient_error(cls, error):
+        """
+        Determines whether a failed send is worth retrying. Twilio rejects invalid requests (bad numbers, unverified
+        recipients, etc.) with 4xx responses that will fail again, so only throttling and server errors are retried.
+        A read timeout or a connection reset may come after Twilio accepted the message, and a retry would send it
+        twice, so only errors raised while connecting are retried.
+
+        :param error: Exception raised while sending a message
+        :return: True if the send should be retried; False otherwise
+        """
+
+        if isinstance(error, TwilioRestException):
+            return error.status == 429 or error.status >= 500
+
+        return cls.is_unsent_error(error)
@@ -1,3 +1,4 @@
+import math
 import os
 
 from dotenv import load_dotenv
@@ -8,6 +9,127 @@ load_dotenv()
 CAT_API_KEY = os.getenv("CAT_API_KEY")
 MY_NUMBER = os.getenv("MY_NUMBER")
 
+# API base urls; overridden to point at local stand-ins, e.g. by the benchmarks
+CAT_API_URL = os.getenv("CAT_API_URL", "https://api.thecatapi.com/v1")
+TWILIO_API_URL = os.getenv("TWILIO_API_URL", "https://api.twilio.com")
+
+# Logging settings
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1") == "1"
+LOG_ROTATE = os.getenv("LOG_ROTATE", "size")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+
+# How application.py creates the TheCatAPI, Twilio and NLP handlers: "eager" on import, "background" on a thread
+# started on import, or "lazy" on first use (or on the first /ready probe)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+
+# Natural language processing settings
+NLP_PRELOAD = os.getenv("NLP_PRELOAD", "1") == "1"
+LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", 4096))
+NLP_FAST_PATH = os.getenv("NLP_FAST_PATH", "1") == "1"
+
+# Cache of resolved requests keyed by message body; set INTENT_CACHE_PATH to share it between worker processes
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", 4096))
+INTENT_CACHE_TTL = int(os.getenv("INTENT_CACHE_TTL", 3600))
+INTENT_CACHE_PATH = os.getenv("INTENT_CACHE_PATH")
+
+# TheCatAPI connection settings
+CAT_API_POOL_SIZE = int(os.getenv("CAT_API_POOL_SIZE", 10))
+CAT_API_CONNECT_TIMEOUT = float(os.getenv("CAT_API_CONNECT_TIMEOUT", 3.05))
+CAT_API_READ_TIMEOUT = float(os.getenv("CAT_API_READ_TIMEOUT", 10.0))
+CAT_API_MAX_RETRIES = int(os.getenv("CAT_API_MAX_RETRIES", 2))
+
+# TheCatAPI circuit breaker; while open, replies use image urls remembered in CAT_API_FALLBACK_PATH
+CAT_API_FAILURE_THRESHOLD = int(os.getenv("CAT_API_FAILURE_THRESHOLD", 5))
+CAT_API_RECOVERY_TIMEOUT = float(os.getenv("CAT_API_RECOVERY_TIMEOUT", 30.0))
+CAT_API_FALLBACK_PATH = os.getenv("CAT_API_FALLBACK_PATH", f"{os.getcwd()}/cache/fallback_images.json")
+CAT_API_FALLBACK_SIZE = int(os.getenv("CAT_API_FALLBACK_SIZE", 50))
+CAT_API_FALLBACK_SAVE_INTERVAL = float(os.getenv("CAT_API_FALLBACK_SAVE_INTERVAL", 60.0))
+
+# Local cache of TheCatAPI category and breed ids
+CAT_API_ID_CACHE_PATH = os.getenv("CAT_API_ID_CACHE_PATH", f"{os.getcwd()}/cache/cat_api_ids.json")
+CAT_API_ID_CACHE_TTL = int(os.getenv("CAT_API_ID_CACHE_TTL", 86400))
+
+# Pre-fetched image pool settings
+CAT_IMAGE_POOL_SIZE = int(os.getenv("CAT_IMAGE_POOL_SIZE", 10))
+CAT_IMAGE_POOL_LOW_WATER_MARK = int(os.getenv("CAT_IMAGE_POOL_LOW_WATER_MARK", 3))
+
+# Concurrent searches for the same images share one TheCatAPI call requesting at least this many images
+CAT_API_COALESCE_BATCH = int(os.getenv("CAT_API_COALESCE_BATCH", 10))
+
+# Local mirror of the images sent in replies; enabled by setting IMAGE_MIRROR_BASE_URL to this application's public url
+IMAGE_MIRROR_BASE_URL = os.getenv("IMAGE_MIRROR_BASE_URL")
+IMAGE_MIRROR_DIRECTORY = os.getenv("IMAGE_MIRROR_DIRECTORY", f"{os.getcwd()}/cache/images")
+IMAGE_MIRROR_MAX_BYTES = int(os.getenv("IMAGE_MIRROR_MAX_BYTES", 500 * 1024 * 1024))
+
+# Shared HTTP client settings for the asynchronous entry point
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", 100))
+ASYNC_HTTP_TIMEOUT = float(os.getenv("ASYNC_HTTP_TIMEOUT", 10.0))
+
+# /sms rate limits; a rate of 0 disables a limit. Set RATE_LIMIT_PATH to share the limits between worker processes
+SMS_SENDER_RATE_PER_MINUTE = float(os.getenv("SMS_SENDER_RATE_PER_MINUTE", 6))
+SMS_SENDER_BURST = float(os.getenv("SMS_SENDER_BURST", 5))
+SMS_GLOBAL_RATE = float(os.getenv("SMS_GLOBAL_RATE", 10))
+SMS_GLOBAL_BURST = float(os.getenv("SMS_GLOBAL_BURST", 20))
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH")
+
+# Daily broadcast settings; Twilio sends one message a second from a long code number, more from toll-free and short codes
+BROADCAST_DB_PATH = os.getenv("BROADCAST_DB_PATH", f"{os.getcwd()}/cache/broadcast.db")
+BROADCAST_TIME = os.getenv("BROADCAST_TIME", "09:00")
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 1.0))
+
+# Webhook deduplication settings; IDEMPOTENCY_PATH shares the remembered MessageSids between worker processes
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 86400))
+IDEMPOTENCY_SIZE = int(os.getenv("IDEMPOTENCY_SIZE", 100000))
+IDEMPOTENCY_PATH = os.getenv("IDEMPOTENCY_PATH")
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", 10.0))
+
+# Seconds after which a webhook claim that never finished, e.g. because its process died, stops blocking Twilio's
+# retries of the message. A claim only covers working out the reply, as the reply is sent after the claim completes,
+# so the default outlasts every TheCatAPI attempt plus IDEMPOTENCY_PROCESSING_ALLOWANCE seconds for the language
+# processing and the session and cache lookups
+IDEMPOTENCY_PROCESSING_ALLOWANCE = 10.0
+IDEMPOTENCY_PENDING_TIMEOUT = float(
+    os.getenv(
+        "IDEMPOTENCY_PENDING_TIMEOUT",
+        (CAT_API_MAX_RETRIES + 1) * (CAT_API_CONNECT_TIMEOUT + CAT_API_READ_TIMEOUT) + IDEMPOTENCY_PROCESSING_ALLOWANCE,
+    )
+)
+
+# Per-sender sessions for follow-ups such as "another one"; SESSION_PATH shares them between worker processes
+SESSION_TTL = int(os.getenv("SESSION_TTL", 86400))
+SESSION_SIZE = int(os.getenv("SESSION_SIZE", 10000))
+SESSION_PATH = os.getenv("SESSION_PATH")
+SESSION_MAX_IMAGES = int(os.getenv("SESSION_MAX_IMAGES", 50))
+
+# Cat facts settings; the built-in facts are served unless CAT_FACTS_URL points at a fact API such as catfact.ninja
+CAT_FACTS_URL = os.getenv("CAT_FACTS_URL", "")
+CAT_FACTS_DB_PATH = os.getenv("CAT_FACTS_DB_PATH", f"{os.getcwd()}/cache/cat_facts.db")
+CAT_FACTS_PREFETCH_SIZE = int(os.getenv("CAT_FACTS_PREFETCH_SIZE", 500))
+CAT_FACTS_WITH_IMAGES = os.getenv("CAT_FACTS_WITH_IMAGES", "0") == "1"
+CAT_FACTS_MAX_LENGTH = int(os.getenv("CAT_FACTS_MAX_LENGTH", 200))
+
+# Outbound delivery queue settings
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", 4))
+DELIVERY_MAX_BACKLOG = int(os.getenv("DELIVERY_MAX_BACKLOG", 1000))
+DELIVERY_MAX_RETRIES = int(os.getenv("DELIVERY_MAX_RETRIES", 3))
+DELIVERY_RETRY_BACKOFF = float(os.getenv("DELIVERY_RETRY_BACKOFF", 0.5))
+
+# Seconds TwilioMessageHandler waits for Twilio to answer a request
+TWILIO_TIMEOUT = float(os.getenv("TWILIO_TIMEOUT", 10.0))
+
+# Bulk sends through TwilioMessageHandler.send_many
+TWILIO_SEND_WORKERS = int(os.getenv("TWILIO_SEND_WORKERS", 8))
+TWILIO_SEND_RATE = float(os.getenv("TWILIO_SEND_RATE", 0))
+
+# Pre-fork server settings (serve.py)
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", 5000))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", os.cpu_count() or 1))
+SERVE_MEMORY_REPORT_INTERVAL = float(os.getenv("SERVE_MEMORY_REPORT_INTERVAL", 300))
+
 
 class TwilioCredentials:
     def __init__(self):
@@ -20,3 +142,19 @@ class TwilioCredentials:
         """Returns True if any credential is empty; False otherwise"""
 
         return not (bool(self.account_sid) and bool(self.auth_token) and bool(self.phone_number))
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns the nearest-rank percentile of an already sorted list.
+
+    :param sorted_values: Sorted list of numbers
+    :param percent: Percentile between 0 and 100
+    :return: Percentile value, or None if the list is empty
+    """
+
+    if not sorted_values:
+        return None
+
+    index = max(0, min(len(sorted_values) - 1, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
@@ -0,0 +1,150 @@
+import string
+
+from src.keyword_matcher import KeywordMatcher
+
+ALPHABET = string.ascii_lowercase
+
+# Other names people use for TheCatAPI's categories and breeds; entries whose keyword is not in the tables are ignored
+ALIASES = {
+    "abyssinian": ["aby"],
+    "box": ["carton"],
+    "british shorthair": ["british blue"],
+    "clothes": ["costume", "outfit", "sweater"],
+    "exotic shorthair": ["exotic"],
+    "hat": ["cap"],
+    "maine coon": ["coon cat"],
+    "norwegian forest cat": ["norwegian forest", "wegie"],
+    "ragdoll": ["rag doll"],
+    "scottish fold": ["scottish"],
+    "space": ["astronaut", "outer space"],
+    "sphynx": ["hairless"],
+    "sunglass": ["shades"],
+}
+
+
+def plurals(token):
+    """
+    Builds the regular plural forms of a token.
+
+    :param token: Singular token, e.g. "box"
+    :return: Set of plural forms, e.g. {"boxes"}
+    """
+
+    if token.endswith(("s", "x", "z", "ch", "sh")):
+        return {token + "es"}
+
+    if token.endswith("y") and len(token) > 1 and token[-2] not in "aeiou":
+        return {token[:-1] + "ies", token + "s"}
+
+    return {token + "s"}
+
+
+def edits(token):
+    """
+    Builds every string one deletion, transposition, substitution or insertion away from a token.
+
+    :param token: Token
+    :return: Set of variants
+    """
+
+    splits = [(token[:i], token[i:]) for i in range(len(token) + 1)]
+    deletes = {left + right[1:] for left, right in splits if right}
+    transposes = {left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1}
+    substitutions = {left + letter + right[1:] for left, right in splits if right for letter in ALPHABET}
+    inserts = {left + letter + right for left, right in splits for letter in ALPHABET}
+
+    return (deletes | transposes | substitutions | inserts) - {token}
+
+
+class VocabularyIndex(KeywordMatcher):
+    """
+    Class to find category and breed keywords in text, like KeywordMatcher, while also accepting plurals, aliases,
+    keywords written as one word (e.g. "mainecoon") and single typos in longer words (e.g. "siamise"). Every accepted
+    form of a word is precomputed when the index is built, so searching still costs one dict lookup per token.
+
+    A typo must keep the first letter of the word: changing it mostly spells another English word, e.g. "mitten" or
+    "bitten" for "kitten", rather than a misspelling.
+    """
+
+    def __init__(self, keyword_tables, aliases=ALIASES, typo_min_length=6, typo_min_token_length=5):
+        """
+        Builds the index.
+
+        :param keyword_tables: Dict mapping a kind of keyword (e.g. "category") to an iterable of keywords
+        :param aliases: Dict mapping keywords to other names matching them
+        :param typo_min_length: Words of at least this many letters also match with one letter wrong, missing, extra or
+        swapped; shorter words only match exactly or in their plural form
+        :param typo_min_token_length: Misspelled tokens shorter than this never match, as short tokens are too often
+        another word
+        """
+
+        self.aliases = aliases
+        self.typo_min_length = typo_min_length
+        self.typo_min_token_length = typo_min_token_length
+        self._vocabulary = set()
+        self._word_forms = {}
+
+        super().__init__(keyword_tables)
+
+        self._build_word_forms()
+
+    def _variants(self, keyword):
+        """
+        Yields the token sequences that should match a keyword: those KeywordMatcher accepts, the keyword written as
+        one word and its aliases.
+
+        :param keyword: Keyword to index
+        :return: Generator of token lists
+        """
+
+        for name in [keyword, *self.aliases.get(keyword, [])]:
+            for tokens in super()._variants(name):
+                yield tokens
+
+                if len(tokens) > 1:
+                    yield ["".join(tokens)]
+
+    def _add(self, tokens, kind, keyword):
+        self._vocabulary.update(tokens)
+        super()._add(tokens, kind, keyword)
+
+    def _build_word_forms(self):
+        """
+        Maps the plural and misspelled forms of every indexed word to the word. Plurals take precedence over typos,
+        and a typo that could stand for two different words is left unmatched.
+        """
+
+        word_forms = {}
+
+        for word in self._vocabulary:
+            for form in plurals(word):
+                word_forms.setdefault(form, word)
+
+        typo_forms = {}
+
+        for word in self._vocabulary:
+            if len(word) < self.typo_min_length or not word.isalpha():
+                continue
+
+            for form in edits(word):
+                if len(form) < self.typo_min_token_length or form[0] != word[0]:
+                    continue
+
+                typo_forms[form] = None if typo_forms.get(form, word) != word else word
+
+        for form, word in typo_forms.items():
+            if word is not None:
+                word_forms.setdefault(form, word)
+
+        # An indexed word always stands for itself
+        self._word_forms = {form: word for form, word in word_forms.items() if form not in self._vocabulary}
+
+    def _text_tokens(self, text):
+        """
+        Splits the text being searched into tokens, replacing plurals and misspellings with the indexed word.
+
+        :param text: Text to search in
+        :return: List of tokens
+        """
+
+        return [self._word_forms.get(token, token) for token in self.tokenize(text)]
@@ -0,0 +1,37 @@
+import itertools
+import threading
+
+import pytest
+
+from src.id_table_cache import IDTableCache
+from src.the_cat_api_handler import CatAPIHandler
+
+
+class FakeImageSearch:
+    """Stand-in for TheCatAPI image search handing out numbered image urls and recording every call."""
+
+    def __init__(self):
+        self.calls = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __call__(self, parameters, limit):
+        with self.lock:
+            self.calls.append((parameters, limit))
+            return [f"https://cdn2.thecatapi.com/images/{next(self.counter)}.jpg" for _ in range(limit)]
+
+
+@pytest.fixture
+def offline_cat_api(tmp_path):
+    """Returns a CatAPIHandler whose ids come from a cache file and whose image searches never leave the process."""
+
+    id_cache_path = str(tmp_path / "cat_api_ids.json")
+    IDTableCache(id_cache_path).save({"box": 5, "hat": 1}, {"siamese": "siam", "bengal": "beng"})
+
+    cat_api = CatAPIHandler(
+        id_cache_path=id_cache_path, fallback_path=str(tmp_path / "fallback_images.json"), image_pool_size=0
+    )
+    cat_api.image_search = FakeImageSearch()
+    cat_api._request_image_urls = cat_api.image_search
+
+    return cat_api
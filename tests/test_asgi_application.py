@@ -0,0 +1,60 @@
+import asyncio
+
+import httpx
+import pytest
+
+import asgi_application
+
+asgi_application.config["TESTING"] = True
+
+
+class TestASGIRouteSMS:
+    @pytest.mark.parametrize(
+        "message,expected_response",
+        [
+            (
+                {"Body": "Hello, world!", "From": "+1234567890"},
+                [
+                    '"incoming_message": "Hello, world!"',
+                    '"receiving_number": "+1234567890"',
+                    '"outgoing_message": "Sorry, I didn\'t understand your request."',
+                    '"image_url": null',
+                ],
+            ),
+            (
+                {"Body": "Show me a picture of a siamese cat", "From": "+1234567890"},
+                [
+                    '"incoming_message": "Show me a picture of a siamese cat"',
+                    '"outgoing_message": "Here is a Siamese cat!"',
+                    '"image_url": "https://cdn2.thecatapi.com/images/',
+                ],
+            ),
+            (
+                {"Body": "Send me a cat sitting inside a box", "From": "+1234567890"},
+                [
+                    '"outgoing_message": "Here is a cat in a box!"',
+                    '"image_url": "https://cdn2.thecatapi.com/images/',
+                ],
+            ),
+        ],
+    )
+    def test_sms_reply(self, message, expected_response):
+        """Tests the asynchronous /sms route serves the same contract as application.py."""
+
+        async def post():
+            transport = httpx.ASGITransport(app=asgi_application.app)
+
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                return await client.post("/sms", data=message)
+
+        response = asyncio.run(post())
+        data = response.text
+
+        assert response.status_code == 200
+
+        for expected_str in expected_response:
+            if "image_url" in expected_str:
+                assert expected_str in data or "media.tumblr.com" in data
+
+            else:
+                assert expected_str in data
@@ -0,0 +1,166 @@
+from datetime import datetime
+
+import pytest
+from twilio.base.exceptions import TwilioRestException
+
+from src.broadcast import BroadcastEngine, DailyScheduler
+from src.rate_limiter import TokenBucket
+from src.subscriber_store import SubscriberStore
+from src.the_cat_api_handler import UNAVAILABLE_MESSAGE
+from src.twilio_messaging import TwilioMessageHandler
+from src.vocabulary_index import VocabularyIndex
+
+
+class FakeCatAPI:
+    """Stand-in for CatAPIHandler returning a new image url for every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_cat_image(self, category=None, breed=None):
+        self.calls.append((category, breed))
+        return f"https://cdn2.thecatapi.com/images/{len(self.calls)}.jpg", f"Here is a {category or breed} cat!"
+
+
+class UnavailableCatAPI(FakeCatAPI):
+    """Stand-in for CatAPIHandler while its circuit is open and no fallback image is remembered."""
+
+    def get_cat_image(self, category=None, breed=None):
+        self.calls.append((category, breed))
+        return None, UNAVAILABLE_MESSAGE
+
+
+class FakeTwilio(TwilioMessageHandler):
+    """Stand-in for TwilioMessageHandler that sends nothing and can fail for some numbers."""
+
+    def __init__(self, errors=None):
+        self.send_workers = 2
+        self.send_rate_limiter = None
+        self.errors = errors or {}
+        self.sent = []
+
+    def send_message(self, receiving_number, text_message, image_url=None):
+        if receiving_number in self.errors:
+            raise self.errors[receiving_number]
+
+        self.sent.append((receiving_number, image_url))
+        return f"MM{len(self.sent):032d}"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SubscriberStore(str(tmp_path / "broadcast.db"))
+    store.subscribe("+15550000001", category="box")
+    store.subscribe("+15550000002", category="box")
+    store.subscribe("+15550000003", breed="siamese")
+    store.subscribe("+15550000004")
+    store.subscribe("+15550000005")
+    store.unsubscribe("+15550000005")
+    return store
+
+
+def create_engine(store, twilio):
+    return BroadcastEngine(store, FakeCatAPI(), twilio, TokenBucket(rate=1000), page_size=1)
+
+
+class TestBroadcastEngine:
+    def test_run(self, store):
+        """Tests every active subscriber receives one message, with one image picked per segment."""
+
+        twilio = FakeTwilio()
+        engine = create_engine(store, twilio)
+
+        assert engine.run("2022-01-01") == {"sent": 4}
+        assert sorted(number for number, _ in twilio.sent) == [
+            "+15550000001",
+            "+15550000002",
+            "+15550000003",
+            "+15550000004",
+        ]
+        assert sorted(engine.cat_api.calls, key=str) == sorted(
+            [(None, None), (None, "siamese"), ("box", None)], key=str
+        )
+
+        images = dict(twilio.sent)
+        assert images["+15550000001"] == images["+15550000002"]
+
+    def test_resume(self, store):
+        """Tests a rerun only retries rejected deliveries, with the same image, and never resends the others."""
+
+        rejected = TwilioRestException(status=429, uri="/Messages.json")
+        twilio = FakeTwilio(errors={"+15550000002": rejected, "+15550000003": ConnectionError("reset by peer")})
+
+        assert create_engine(store, twilio).run("2022-01-01") == {"sent": 2, "failed": 1, "unknown": 1}
+
+        twilio.errors = {}
+        engine = create_engine(store, twilio)
+
+        assert engine.run("2022-01-01") == {"sent": 3, "unknown": 1}
+        assert [number for number, _ in twilio.sent].count("+15550000002") == 1
+        assert "+15550000003" not in [number for number, _ in twilio.sent]
+        assert engine.cat_api.calls == []
+        assert dict(twilio.sent)["+15550000002"] == dict(twilio.sent)["+15550000001"]
+
+    def test_circuit_open(self, store):
+        """Tests segments without an image are skipped rather than sent the apology, and are sent when resumed."""
+
+        twilio = FakeTwilio()
+        engine = BroadcastEngine(store, UnavailableCatAPI(), twilio, TokenBucket(rate=1000), page_size=1)
+
+        assert engine.run("2022-01-01") == {}
+        assert twilio.sent == []
+        assert store.get_segment_image("2022-01-01", "box", None) is None
+
+        assert create_engine(store, twilio).run("2022-01-01") == {"sent": 4}
+        assert all(image_url for _, image_url in twilio.sent)
+
+    def test_new_run(self, store):
+        """Tests each run id sends its own broadcast."""
+
+        twilio = FakeTwilio()
+        engine = create_engine(store, twilio)
+        engine.run("2022-01-01")
+        engine.run("2022-01-02")
+
+        assert len(twilio.sent) == 8
+        assert store.is_finished("2022-01-02")
+
+
+class TestSubscriberStore:
+    keyword_matcher = VocabularyIndex({"category": {"box": 5, "hat": 1}, "breed": {"siamese": "siam"}})
+
+    def test_subscribe_resolves_segment(self, tmp_path):
+        """Tests a segment is stored as the keywords of TheCatAPI's tables."""
+
+        store = SubscriberStore(str(tmp_path / "broadcast.db"))
+        store.subscribe("+15550000001", category="hats", keyword_matcher=self.keyword_matcher)
+        store.subscribe("+15550000002", breed="Siamese", keyword_matcher=self.keyword_matcher)
+        store.subscribe("+15550000003", keyword_matcher=self.keyword_matcher)
+
+        assert store.segments() == [(None, None), (None, "siamese"), ("hat", None)]
+
+    @pytest.mark.parametrize("category,breed", [("boat", None), (None, "dragon"), ("siamese", None), (None, "box")])
+    def test_subscribe_rejects_unknown_segment(self, tmp_path, category, breed):
+        """Tests a subscriber is not added to a segment that is not in TheCatAPI's tables."""
+
+        store = SubscriberStore(str(tmp_path / "broadcast.db"))
+
+        with pytest.raises(ValueError):
+            store.subscribe("+15550000001", category=category, breed=breed, keyword_matcher=self.keyword_matcher)
+
+        assert store.count() == 0
+
+
+class TestDailyScheduler:
+    @pytest.mark.parametrize(
+        "now,expected",
+        [
+            (datetime(2022, 1, 1, 8, 0), datetime(2022, 1, 1, 9, 0)),
+            (datetime(2022, 1, 1, 9, 0), datetime(2022, 1, 2, 9, 0)),
+            (datetime(2022, 1, 1, 23, 30), datetime(2022, 1, 2, 9, 0)),
+        ],
+    )
+    def test_next_run(self, now, expected):
+        """Tests DailyScheduler.next_run picks the next occurrence of the time of day."""
+
+        assert DailyScheduler(job=None, time_of_day="09:00").next_run(now) == expected
@@ -0,0 +1,129 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from src.cat_facts import DEFAULT_FACTS, CatFacts, FactStore, HTTPFactSource, StaticFactSource, is_fact_request
+
+API_FACTS = [f"Cat fact number {i}." for i in range(25)]
+
+
+class FactAPIHandler(BaseHTTPRequestHandler):
+    """Serves API_FACTS in pages like catfact.ninja."""
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        limit = int(query["limit"][0])
+        page = int(query["page"][0])
+        last_page = -(-len(API_FACTS) // limit)
+        data = [{"fact": fact, "length": len(fact)} for fact in API_FACTS[(page - 1) * limit : page * limit]]
+        body = json.dumps({"current_page": page, "last_page": last_page, "data": data}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fact_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FactAPIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/facts"
+    server.shutdown()
+    server.server_close()
+
+
+class FailingSource:
+    def fetch(self, limit):
+        raise requests.ConnectionError("fact API is down")
+
+
+class TestCatFacts:
+    @pytest.mark.parametrize(
+        "obj,expected",
+        [("cat fact", True), ("fact", True), ("cat trivia", True), ("cat hat", False), ("factory cat", False)],
+    )
+    def test_is_fact_request(self, obj, expected):
+        """Tests is_fact_request()."""
+
+        assert is_fact_request(obj) is expected
+
+    def test_http_source_pages(self, fact_api):
+        """Tests HTTPFactSource.fetch() follows the pages up to the limit."""
+
+        assert HTTPFactSource(fact_api, page_size=10).fetch(100) == API_FACTS
+        assert HTTPFactSource(fact_api, page_size=10).fetch(15) == API_FACTS[:15]
+
+    @pytest.mark.parametrize(
+        "data,expected",
+        [
+            ({"data": [{"fact": " A fact. "}, {"text": "Another fact."}], "current_page": 1, "last_page": 2}, True),
+            ({"data": [{"fact": "A fact."}, {"fact": 5}, {"length": 3}, None, 7, ["A list."]]}, False),
+            (["A fact.", {"fact": "Another fact."}, {"fact": None}], False),
+        ],
+    )
+    def test_parse_skips_malformed_entries(self, data, expected):
+        """Tests HTTPFactSource._parse() keeps the facts of a response and skips entries that are not a fact."""
+
+        facts, has_more = HTTPFactSource._parse(data)
+
+        assert facts and all(fact in {"A fact.", "Another fact."} for fact in facts)
+        assert has_more is expected
+
+    @pytest.mark.parametrize(
+        "data", [{"data": {"fact": "A fact."}}, "A fact.", 5, None, {"data": [], "last_page": "many"}]
+    )
+    def test_parse_unexpected_shape(self, data):
+        """Tests HTTPFactSource._parse() returns no facts for a response of an unexpected shape."""
+
+        assert HTTPFactSource._parse(data) == ([], False)
+
+    def test_store(self, tmp_path):
+        """Tests FactStore skips duplicates and only picks facts within the length limit."""
+
+        store = FactStore(str(tmp_path / "facts.db"))
+
+        assert store.random_fact() is None
+        assert store.add(["A short fact.", "A much longer fact about cats.", "A short fact."]) == 2
+        assert store.add(["A short fact."]) == 0
+        assert store.count() == 2
+
+        for _ in range(20):
+            assert store.random_fact(max_length=15) == "A short fact."
+
+        assert store.random_fact(max_length=5) is None
+        assert {store.random_fact() for _ in range(100)} == {"A short fact.", "A much longer fact about cats."}
+
+    def test_prefetch_on_creation(self, tmp_path, fact_api):
+        """Tests CatFacts fills an empty store in bulk and then serves facts without calling the source."""
+
+        store = FactStore(str(tmp_path / "facts.db"))
+        facts = CatFacts(store, HTTPFactSource(fact_api), prefetch_size=100)
+
+        assert store.count() == len(API_FACTS)
+
+        facts.source = FailingSource()
+
+        assert facts.get_fact() in API_FACTS
+        assert facts.stats() == {"facts": len(API_FACTS), "served": 1, "misses": 0}
+
+    def test_source_down(self, tmp_path):
+        """Tests CatFacts starts without facts while the source is down and fills the store once it is back."""
+
+        facts = CatFacts(FactStore(str(tmp_path / "facts.db")), FailingSource())
+        facts.source = StaticFactSource()
+
+        # The miss starts a background prefetch
+        assert facts.get_fact() is None
+        assert facts._prefetch_lock.acquire(timeout=5)
+
+        assert facts.get_fact() in DEFAULT_FACTS
+        assert facts.stats() == {"facts": len(DEFAULT_FACTS), "served": 1, "misses": 1}
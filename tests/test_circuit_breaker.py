@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.async_cat_api_handler import AsyncCatAPIHandler
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def fail():
+    raise ConnectionError("TheCatAPI unavailable")
+
+
+class TestCircuitBreaker:
+    def test_opens_after_failures(self):
+        """Tests the circuit opens after consecutive failures and then fails fast without calling the function."""
+
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+        calls = []
+
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            breaker.call(calls.append, "called")
+
+        assert calls == []
+        assert breaker.stats()["rejected"] == 1
+
+    def test_success_resets_failures(self):
+        """Tests only consecutive failures count towards opening the circuit."""
+
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+        assert breaker.call(lambda: "ok") == "ok"
+
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.parametrize("probe_succeeds,expected_state", [(True, "closed"), (False, "open")])
+    def test_half_open_probe(self, probe_succeeds, expected_state):
+        """Tests a single probe is let through after the recovery timeout and decides whether the circuit closes."""
+
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+        time.sleep(0.02)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+        if probe_succeeds:
+            breaker.record_success()
+
+        else:
+            breaker.record_failure()
+
+        assert breaker.state == expected_state
+
+    def test_abandoned_probe(self):
+        """Tests a probe ended without an outcome frees the probe slot without counting a failure."""
+
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+        time.sleep(0.02)
+
+        def interrupted():
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            breaker.call(interrupted)
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_cancelled_async_probe(self, offline_cat_api):
+        """Tests cancelling the asynchronous handler's probe request lets the next request probe TheCatAPI."""
+
+        breaker = offline_cat_api.circuit_breaker
+        breaker.failure_threshold = 1
+        breaker.recovery_timeout = 0.01
+        breaker.record_failure()
+
+        async def image_search(request):
+            await asyncio.sleep(10)
+
+        async def main():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(image_search)) as client:
+                probe = asyncio.create_task(AsyncCatAPIHandler(client, offline_cat_api)._fetch_image_urls({}))
+                await asyncio.sleep(0.05)
+                probe.cancel()
+
+                with pytest.raises(asyncio.CancelledError):
+                    await probe
+
+        time.sleep(0.02)
+        asyncio.run(main())
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
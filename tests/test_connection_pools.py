@@ -0,0 +1,56 @@
+import multiprocessing
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.connection_pools import reset_after_fork
+
+
+class ClientPortHandler(BaseHTTPRequestHandler):
+    """Answers with the client port of the connection, over kept-alive HTTP/1.1 connections."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = str(self.client_address[1]).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ClientPortHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def request_client_port(session, url, results):
+    results.put(session.get(url, timeout=5).text)
+
+
+@pytest.mark.parametrize("reset,expected_shared", [(True, False), (False, True)])
+def test_worker_opens_its_own_connection(server_url, reset, expected_shared):
+    """Tests a worker forked after the parent made a request does not reuse the parent's kept-alive connection."""
+
+    session = reset_after_fork(requests.Session()) if reset else requests.Session()
+    parent_port = session.get(server_url, timeout=5).text
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    worker = context.Process(target=request_client_port, args=(session, server_url, results))
+    worker.start()
+    worker_port = results.get(timeout=10)
+    worker.join(10)
+
+    assert worker.exitcode == 0
+    assert (worker_port == parent_port) is expected_shared
+    assert session.get(server_url, timeout=5).text == parent_port
@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+from src.delivery_queue import DeliveryQueue
+
+
+class FlakySender:
+    """Send function that fails a fixed number of times before succeeding."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, receiving_number, text_message, image_url=None):
+        with self.lock:
+            self.calls.append(receiving_number)
+
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("Twilio unavailable")
+
+        return "SM" + "0" * 32
+
+
+class TestDeliveryQueue:
+    @pytest.mark.parametrize(
+        "failures,max_retries,expected_delivered,expected_failed,expected_calls",
+        [
+            (0, 3, 1, 0, 1),
+            (2, 3, 1, 0, 3),
+            (5, 2, 0, 1, 3),
+        ],
+    )
+    def test_retry(self, failures, max_retries, expected_delivered, expected_failed, expected_calls):
+        """Tests DeliveryQueue retries failed deliveries with backoff."""
+
+        sender = FlakySender(failures)
+        delivery_queue = DeliveryQueue(sender, workers=1, max_retries=max_retries, backoff=0.001)
+
+        assert delivery_queue.enqueue(receiving_number="+1234567890", text_message="Hi!")
+        delivery_queue.join()
+
+        stats = delivery_queue.stats()
+        assert stats["delivered"] == expected_delivered
+        assert stats["failed"] == expected_failed
+        assert len(sender.calls) == expected_calls
+        delivery_queue.stop()
+
+    def test_non_retryable_error(self):
+        """Tests DeliveryQueue does not retry errors rejected by is_retryable."""
+
+        sender = FlakySender(failures=1)
+        delivery_queue = DeliveryQueue(sender, workers=1, backoff=0.001, is_retryable=lambda error: False)
+
+        delivery_queue.enqueue(receiving_number="+1234567890", text_message="Hi!")
+        delivery_queue.join()
+
+        assert len(sender.calls) == 1
+        assert delivery_queue.stats()["failed"] == 1
+        delivery_queue.stop()
+
+    def test_skipped(self):
+        """Tests a send function returning None counts as skipped rather than delivered."""
+
+        delivery_queue = DeliveryQueue(lambda **kwargs: None, workers=1)
+
+        delivery_queue.enqueue(receiving_number="+1234567890", text_message="Hi!")
+        delivery_queue.join()
+
+        stats = delivery_queue.stats()
+        assert (stats["delivered"], stats["failed"], stats["skipped"]) == (0, 0, 1)
+        assert stats["latency"]["count"] == 0
+        delivery_queue.stop()
+
+    def test_bounded_backlog(self):
+        """Tests DeliveryQueue rejects messages once the backlog is full."""
+
+        release = threading.Event()
+        delivery_queue = DeliveryQueue(lambda **kwargs: release.wait(), workers=1, max_backlog=2)
+
+        results = [delivery_queue.enqueue(text_message=str(i)) for i in range(5)]
+        release.set()
+        delivery_queue.join()
+
+        # One message is picked up by the worker, two wait in the backlog and the rest are rejected
+        assert results.count(False) >= 2
+        assert delivery_queue.stats()["rejected"] == results.count(False)
+        delivery_queue.stop()
+
+    def test_stats(self):
+        """Tests DeliveryQueue.stats() reports depth, in-flight count and latency."""
+
+        delivery_queue = DeliveryQueue(FlakySender(), workers=2)
+
+        for i in range(10):
+            delivery_queue.enqueue(receiving_number=str(i), text_message="Hi!")
+
+        delivery_queue.join()
+        stats = delivery_queue.stats()
+
+        assert stats["queue_depth"] == 0
+        assert stats["in_flight"] == 0
+        assert stats["workers"] == 2
+        assert stats["latency"]["count"] == 10
+        assert stats["latency"]["p50"] <= stats["latency"]["p99"] <= stats["latency"]["max"]
+        delivery_queue.stop()
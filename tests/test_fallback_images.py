@@ -0,0 +1,88 @@
+import time
+
+import requests
+
+from src.fallback_images import FallbackImages
+from src.the_cat_api_handler import RANDOM_CAT_MESSAGE, UNAVAILABLE_MESSAGE
+
+
+def unavailable(parameters, limit):
+    raise requests.ConnectionError("TheCatAPI is down")
+
+
+class TestFallbackImages:
+    def test_pick(self):
+        """Tests a url is picked from the same search, then from any search, and None without any url."""
+
+        fallback_images = FallbackImages(size=2)
+
+        assert fallback_images.pick({}) is None
+
+        fallback_images.add({"category_ids": 5}, ["box1.jpg", "box2.jpg", "box3.jpg"])
+
+        assert len(fallback_images) == 2
+        assert fallback_images.pick({"category_ids": 5}) in {"box2.jpg", "box3.jpg"}
+        assert fallback_images.pick({"breed_ids": "siam"}) in {"box2.jpg", "box3.jpg"}
+
+    def test_save_and_load(self, tmp_path):
+        """Tests the urls are kept in the file between restarts."""
+
+        path = str(tmp_path / "fallback_images.json")
+        fallback_images = FallbackImages(path)
+        fallback_images.add({"breed_ids": "siam"}, ["siam.jpg"])
+        fallback_images.save()
+
+        assert FallbackImages(path).pick({"breed_ids": "siam"}) == "siam.jpg"
+
+    def test_pick_same_search_only(self):
+        """Tests a url from another search is not picked when any_search is False."""
+
+        fallback_images = FallbackImages()
+        fallback_images.add({"category_ids": 5}, ["box.jpg"])
+
+        assert fallback_images.pick({"breed_ids": "siam"}, any_search=False) is None
+        assert fallback_images.pick({"category_ids": 5}, any_search=False) == "box.jpg"
+
+    def test_save_later(self, tmp_path):
+        """Tests changed urls are written on a background thread, and unchanged urls are not written again."""
+
+        path = tmp_path / "fallback_images.json"
+        fallback_images = FallbackImages(str(path), save_interval=0)
+        fallback_images.add({}, ["a.jpg"])
+        fallback_images.save_later()
+
+        deadline = time.monotonic() + 5
+
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert FallbackImages(str(path)).pick({}) == "a.jpg"
+
+        fallback_images.add({}, ["a.jpg"])
+
+        assert not fallback_images._dirty
+
+
+class TestFallbackCaption:
+    def test_same_search(self, offline_cat_api):
+        """Tests a fallback image of the requested search keeps the requested caption."""
+
+        offline_cat_api.fallback_images.add({"category_ids": 5}, ["box.jpg"])
+        offline_cat_api._request_image_urls = unavailable
+
+        assert offline_cat_api.get_cat_image(category="box") == ("box.jpg", "Here is a cat in a box!")
+
+    def test_other_search(self, offline_cat_api):
+        """Tests a fallback image of another search gets a generic caption."""
+
+        offline_cat_api.fallback_images.add({"category_ids": 5}, ["box.jpg"])
+        offline_cat_api._request_image_urls = unavailable
+
+        assert offline_cat_api.get_cat_image(breed="siamese") == ("box.jpg", RANDOM_CAT_MESSAGE)
+
+    def test_nothing_remembered(self, offline_cat_api):
+        """Tests the apology is sent when no image has been remembered."""
+
+        offline_cat_api._request_image_urls = unavailable
+
+        assert offline_cat_api.get_cat_image(breed="siamese") == (None, UNAVAILABLE_MESSAGE)
@@ -0,0 +1,87 @@
+import json
+import time
+
+import pytest
+
+from src.id_table_cache import IDTableCache
+
+category_ids = {"hat": 1, "space": 2, "box": 5}
+breed_ids = {"bengal": "beng", "siamese": "siam"}
+
+
+class TestIDTableCache:
+    def test_save_and_load(self, tmp_path):
+        """Tests IDTableCache.save() and IDTableCache.load() round trip the tables."""
+
+        id_cache = IDTableCache(str(tmp_path / "cache" / "ids.json"))
+        assert id_cache.load() is None
+
+        id_cache.save(category_ids, breed_ids, fetched_at=123.0)
+        cached = id_cache.load()
+
+        assert cached["category_ids"] == category_ids
+        assert cached["breed_ids"] == breed_ids
+        assert cached["fetched_at"] == 123.0
+
+    @pytest.mark.parametrize(
+        "contents",
+        [
+            "",
+            "not json",
+            json.dumps({"category_ids": category_ids}),
+            json.dumps({"fetched_at": 1, "category_ids": {}, "breed_ids": {}}),
+        ],
+    )
+    def test_load_unusable_cache(self, tmp_path, contents):
+        """Tests IDTableCache.load() ignores corrupt or empty cache files."""
+
+        path = tmp_path / "ids.json"
+        path.write_text(contents)
+
+        assert IDTableCache(str(path)).load() is None
+
+    @pytest.mark.parametrize(
+        "age,ttl,expected",
+        [
+            (0, 60, False),
+            (30, 60, False),
+            (61, 60, True),
+            (1, 0, True),
+        ],
+    )
+    def test_is_stale(self, age, ttl, expected):
+        """Tests IDTableCache.is_stale()."""
+
+        assert IDTableCache("ids.json", ttl=ttl).is_stale(time.time() - age) == expected
+
+
+class TestStaleIDRefresh:
+    def test_failed_refresh_backs_off(self, offline_cat_api):
+        """Tests CatAPIHandler.refresh_ids_if_stale() does not retry straight after a failed refresh."""
+
+        attempts = []
+
+        def failing_refresh():
+            attempts.append(time.time())
+            raise ConnectionError("TheCatAPI is down")
+
+        offline_cat_api._id_cache.ttl = 60
+        offline_cat_api._id_cache.load = lambda: None
+        offline_cat_api.refresh_ids = failing_refresh
+        offline_cat_api._ids_fetched_at = 0
+
+        def refresh_and_wait():
+            offline_cat_api.refresh_ids_if_stale()
+
+            # The refresh thread releases the lock when it is done
+            with offline_cat_api._id_refresh_lock:
+                pass
+
+        refresh_and_wait()
+        refresh_and_wait()
+        assert len(attempts) == 1
+
+        # Retried once a tenth of the TTL has passed
+        offline_cat_api._id_refresh_failed_at -= 7
+        refresh_and_wait()
+        assert len(attempts) == 2
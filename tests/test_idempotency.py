@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.idempotency import DONE, PENDING, IdempotencyIndex
+from src.ttl_cache import SQLiteCache, TTLCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def index(request, tmp_path):
+    """Returns an index on either cache backend."""
+
+    if request.param == "memory":
+        backend = TTLCache(max_size=100, ttl=60)
+
+    else:
+        backend = SQLiteCache(str(tmp_path / "idempotency.db"), max_size=100, ttl=60, table="message_sids")
+
+    return IdempotencyIndex(backend, wait_timeout=2, poll_interval=0.01)
+
+
+class TestIdempotencyIndex:
+    def test_duplicate_returns_cached_response(self, index):
+        """Tests a repeated key gets the first response without calling the handler again."""
+
+        calls = []
+
+        def handler():
+            calls.append(1)
+            return {"outgoing_message": f"reply {len(calls)}"}
+
+        assert index.handle("SM1", handler) == {"outgoing_message": "reply 1"}
+        assert index.handle("SM1", handler) == {"outgoing_message": "reply 1"}
+        assert index.handle("SM2", handler) == {"outgoing_message": "reply 2"}
+        assert len(calls) == 2
+        assert index.stats() == {"duplicates": 1, "gave_up_waiting": 0, "size": 2}
+
+    def test_without_key(self, index):
+        """Tests messages without a key are always handled."""
+
+        calls = []
+
+        index.handle(None, lambda: calls.append(1))
+        index.handle(None, lambda: calls.append(1))
+
+        assert len(calls) == 2
+
+    def test_concurrent_retry_waits(self, index):
+        """Tests a retry arriving while the first delivery is being handled waits for its response."""
+
+        started = threading.Event()
+        calls = []
+
+        def slow_handler():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return {"outgoing_message": "slow reply"}
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(index.handle("SM1", slow_handler)))
+        first.start()
+        started.wait(1)
+
+        assert index.handle("SM1", slow_handler, pending_response="pending") == {"outgoing_message": "slow reply"}
+
+        first.join()
+        assert results == [{"outgoing_message": "slow reply"}]
+        assert len(calls) == 1
+
+    def test_gives_up_waiting(self, index):
+        """Tests a retry gets the pending response once the wait times out."""
+
+        index.wait_timeout = 0.05
+        assert index.claim("SM1") == (None, None)
+
+        assert index.handle("SM1", lambda: "handled again", pending_response="pending") == "pending"
+        assert index.stats()["gave_up_waiting"] == 1
+
+    def test_failed_handler_releases_key(self, index):
+        """Tests a handler that raises leaves the key free for the retry."""
+
+        def failing_handler():
+            raise RuntimeError("TheCatAPI timed out")
+
+        with pytest.raises(RuntimeError):
+            index.handle("SM1", failing_handler)
+
+        assert index.handle("SM1", lambda: "retried") == "retried"
+
+    def test_stale_claim_is_taken_over(self, index):
+        """Tests a claim that never finished stops blocking retries after the pending timeout."""
+
+        index.pending_timeout = 0.05
+        assert index.claim("SM1") == (None, None)
+        assert index.claim("SM1") == (PENDING, None)
+
+        time.sleep(0.1)
+
+        assert index.claim("SM1") == (None, None)
+        index.complete("SM1", "reply")
+        assert index.claim("SM1") == (DONE, "reply")
+
+    def test_stale_claim_is_taken_over_once(self, index):
+        """Tests of several retries finding the same stale claim only one takes it over."""
+
+        index.pending_timeout = 0.05
+        assert index.claim("SM1") == (None, None)
+
+        time.sleep(0.1)
+
+        barrier = threading.Barrier(4)
+        results = []
+
+        def retry():
+            barrier.wait()
+            results.append(index.claim("SM1"))
+
+        threads = [threading.Thread(target=retry) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert results.count((None, None)) == 1
+        assert results.count((PENDING, None)) == 3
+
+    def test_handle_async(self, index):
+        """Tests IdempotencyIndex.handle_async() deduplicates concurrent coroutines."""
+
+        calls = []
+
+        async def handler():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "reply"
+
+        async def run():
+            return await asyncio.gather(*(index.handle_async("SM1", handler) for _ in range(3)))
+
+        assert asyncio.run(run()) == ["reply"] * 3
+        assert len(calls) == 1
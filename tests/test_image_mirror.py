@@ -0,0 +1,90 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.image_mirror import ImageMirror
+
+IMAGES = {"/a.jpg": b"\xff\xd8 cat a" * 100, "/b.jpg": b"\xff\xd8 cat b" * 100, "/a-copy.jpg": b"\xff\xd8 cat a" * 100}
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """Serves the test images like a CDN."""
+
+    def log_message(self, format, *args):
+        """Silences the per-request access log."""
+
+    def do_GET(self):
+        self.server.requests += 1
+        content = IMAGES.get(self.path)
+
+        if content is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+@pytest.fixture
+def cdn():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def cdn_url(server, path):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+class TestImageMirror:
+    def test_mirror(self, cdn, tmp_path):
+        """Tests an image is downloaded once, stored under its content hash and deduplicated across urls."""
+
+        mirror = ImageMirror(str(tmp_path), "https://cats.example.com/")
+
+        url = mirror.mirror(cdn_url(cdn, "/a.jpg"))
+        name = url.rsplit("/", 1)[1]
+
+        assert url.startswith("https://cats.example.com/images/")
+        assert mirror.mirror(cdn_url(cdn, "/a.jpg")) == url
+        assert mirror.mirror(cdn_url(cdn, "/a-copy.jpg")) == url
+        assert cdn.requests == 2
+        assert os.listdir(tmp_path) == [name]
+
+        with open(mirror.path(name), "rb") as image_file:
+            assert image_file.read() == IMAGES["/a.jpg"]
+
+    def test_failure_keeps_original_url(self, cdn, tmp_path):
+        """Tests the original url is returned when the image cannot be downloaded."""
+
+        mirror = ImageMirror(str(tmp_path), "https://cats.example.com")
+        url = cdn_url(cdn, "/missing.jpg")
+
+        assert mirror.mirror(url) == url
+        assert mirror.stats()["failures"] == 1
+
+    def test_size_cap(self, cdn, tmp_path):
+        """Tests the least recently used image is deleted when the mirror exceeds its size cap."""
+
+        mirror = ImageMirror(str(tmp_path), "https://cats.example.com", max_bytes=len(IMAGES["/a.jpg"]) + 10)
+        first = mirror.mirror(cdn_url(cdn, "/a.jpg")).rsplit("/", 1)[1]
+        os.utime(os.path.join(tmp_path, first), (0, 0))
+        second = mirror.mirror(cdn_url(cdn, "/b.jpg")).rsplit("/", 1)[1]
+
+        assert os.listdir(tmp_path) == [second]
+        assert mirror.path(first) is None
+
+    @pytest.mark.parametrize("name", ["../secret.jpg", "cat.jpg", "0" * 64 + ".exe"])
+    def test_invalid_name(self, tmp_path, name):
+        """Tests names that are not content hashes are never resolved to a path."""
+
+        assert ImageMirror(str(tmp_path), "https://cats.example.com").path(name) is None
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from src.image_pool import ImagePool
+
+
+class FakeImageSearch:
+    """Fetch function that hands out numbered image urls and records every call."""
+
+    def __init__(self):
+        self.calls = []
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, parameters, limit=1):
+        with self.lock:
+            self.calls.append((parameters, limit))
+            urls = [f"https://cdn2.thecatapi.com/images/{self.counter + i}.jpg" for i in range(limit)]
+            self.counter += limit
+
+        return urls
+
+
+class TestImagePool:
+    @pytest.mark.parametrize(
+        "parameters",
+        [
+            {},
+            {"category_ids": 5},
+            {"breed_ids": "beng"},
+        ],
+    )
+    def test_get(self, parameters):
+        """Tests ImagePool.get() serves distinct pooled urls per search."""
+
+        fetch = FakeImageSearch()
+        image_pool = ImagePool(fetch, size=5, low_water_mark=0)
+
+        assert image_pool.get(parameters) is None
+
+        image_pool.put(parameters, fetch(parameters, limit=5))
+        image_urls = [image_pool.get(parameters) for _ in range(5)]
+
+        assert len(set(image_urls)) == 5
+        assert image_pool.get(parameters) is None
+        assert image_pool.get({"category_ids": 999}) is None
+        assert image_pool.stats()["hits"] == 5
+
+    def test_get_exclude(self):
+        """Tests ImagePool.get() skips excluded urls and leaves them pooled."""
+
+        image_pool = ImagePool(FakeImageSearch(), size=5, low_water_mark=0)
+        image_pool.put({}, ["a", "b", "c"])
+
+        assert image_pool.get({}, exclude={"a", "b"}) == "c"
+        assert image_pool.get({}, exclude={"a", "b"}) is None
+        assert image_pool.get({}) == "a"
+
+    def test_put(self):
+        """Tests ImagePool.put() ignores duplicates and respects the pool size."""
+
+        image_pool = ImagePool(FakeImageSearch(), size=3)
+        image_pool.put({}, ["a", "a", "b", "c", "d"])
+
+        assert image_pool.stats()["pools"] == {"random": 3}
+
+    def test_refill_below_low_water_mark(self):
+        """Tests ImagePool refills a search in the background with a single batched fetch."""
+
+        fetch = FakeImageSearch()
+        image_pool = ImagePool(fetch, size=10, low_water_mark=5)
+        image_pool.put({"category_ids": 1}, fetch({"category_ids": 1}, limit=6))
+
+        threads = []
+        refill_in_background = image_pool.refill_in_background
+        image_pool.refill_in_background = lambda parameters: threads.append(refill_in_background(parameters))
+
+        image_pool.get({"category_ids": 1})
+        image_pool.get({"category_ids": 1})
+
+        for thread in filter(None, threads):
+            thread.join(timeout=1)
+
+        assert fetch.calls[-1] == ({"category_ids": 1}, 6)
+        assert image_pool.stats()["pools"] == {"category_ids=1": 10}
@@ -0,0 +1,40 @@
+import pytest
+
+from src.intent_cache import IntentCache
+from src.ttl_cache import TTLCache
+
+
+class TestIntentCache:
+    @pytest.mark.parametrize(
+        "message,expected",
+        [
+            ("Show me a cat", "show me a cat"),
+            ("  Show   me a\tcat!  ", "show me a cat"),
+            ("Show me a cat?!", "show me a cat"),
+            ("Show me a cat, please.", "show me a cat, please"),
+            ("", ""),
+        ],
+    )
+    def test_normalize(self, message, expected):
+        """Tests IntentCache.normalize()."""
+
+        assert IntentCache.normalize(message) == expected
+
+    def test_resolve(self):
+        """Tests IntentCache.resolve() only resolves each normalized message once per version."""
+
+        calls = []
+
+        def resolver(message):
+            calls.append(message)
+            return "show", "cat box", "box", None
+
+        intent_cache = IntentCache(TTLCache())
+
+        assert intent_cache.resolve("Show me a cat in a box", resolver) == ("show", "cat box", "box", None)
+        assert intent_cache.resolve("show me a cat in a box!", resolver) == ("show", "cat box", "box", None)
+        assert len(calls) == 1
+
+        intent_cache.resolve("Show me a cat in a box", resolver, version="2")
+        assert len(calls) == 2
+        assert intent_cache.stats() == {"hits": 1, "misses": 2, "size": 2}
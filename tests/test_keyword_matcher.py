@@ -0,0 +1,62 @@
+import pytest
+
+from src.keyword_matcher import KeywordMatcher
+
+category_ids = {"hat": 1, "space": 2, "sunglass": 4, "box": 5, "tie": 7, "sink": 14, "clothes": 15}
+breed_ids = {
+    "rex": "rex",
+    "cornish rex": "crex",
+    "devon rex": "drex",
+    "american shorthair": "asho",
+    "norwegian forest cat": "norw",
+    "pixie-bob": "pixi",
+    "siamese": "siam",
+}
+
+
+class TestKeywordMatcher:
+    keyword_matcher = KeywordMatcher({"category": category_ids, "breed": breed_ids})
+
+    @pytest.mark.parametrize(
+        "text,expected_category,expected_breed",
+        [
+            ("", None, None),
+            ("cat", None, None),
+            ("cat hat", "hat", None),
+            ("cat wearing sunglass", "sunglass", None),
+            ("picture siamese cat", None, "siamese"),
+            ("cornish rex", None, "cornish rex"),
+            ("devon rex", None, "devon rex"),
+            ("rex cat", None, "rex"),
+            ("norwegian forest cat", None, "norwegian forest cat"),
+            ("norwegian forest", None, None),
+            ("american shorthair box", "box", "american shorthair"),
+            ("american shorthair wearing hat", "hat", "american shorthair"),
+            ("pixiebob", None, "pixie-bob"),
+            ("pixie-bob", None, "pixie-bob"),
+            ("cat in a sink, please!", "sink", None),
+            ("chat with whatever", None, None),
+            ("boxer in spaceship", None, None),
+            ("hat tie", "hat", None),
+        ],
+    )
+    def test_search(self, text, expected_category, expected_breed):
+        """Tests KeywordMatcher.search()."""
+
+        assert self.keyword_matcher.search(text) == {"category": expected_category, "breed": expected_breed}
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            (
+                "devon rex or cornish rex in a box",
+                [("breed", "devon rex"), ("breed", "cornish rex"), ("category", "box")],
+            ),
+            ("tie hat tie", [("category", "tie"), ("category", "hat"), ("category", "tie")]),
+            ("nothing here", []),
+        ],
+    )
+    def test_find_all(self, text, expected):
+        """Tests KeywordMatcher.find_all()."""
+
+        assert self.keyword_matcher.find_all(text) == expected
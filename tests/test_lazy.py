@@ -0,0 +1,60 @@
+import threading
+
+from src.lazy import LazyProxy, initialize, initialize_in_background, is_initialized
+
+
+class Handler:
+    """Stand-in for a handler that is expensive to create."""
+
+    created = 0
+
+    def __init__(self):
+        Handler.created += 1
+        self.value = "ready"
+
+    def get(self):
+        return self.value
+
+
+class TestLazyProxy:
+    def test_created_on_first_use(self):
+        """Tests LazyProxy only creates the object on first attribute access and forwards to it afterwards."""
+
+        Handler.created = 0
+        proxy = LazyProxy(Handler)
+
+        assert not is_initialized(proxy)
+        assert Handler.created == 0
+
+        assert proxy.get() == "ready"
+        proxy.value = "changed"
+
+        assert is_initialized(proxy)
+        assert proxy.get() == "changed"
+        assert Handler.created == 1
+
+    def test_concurrent_initialization(self):
+        """Tests concurrent first uses wait for a single creation."""
+
+        Handler.created = 0
+        proxy = LazyProxy(Handler)
+        threads = [threading.Thread(target=initialize, args=(proxy,)) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert Handler.created == 1
+
+    def test_initialize_in_background(self):
+        """Tests initialize_in_background runs every step, even after one fails."""
+
+        proxy = LazyProxy(Handler)
+
+        def fail():
+            raise ConnectionError("offline")
+
+        assert initialize_in_background(fail, lambda: initialize(proxy)).wait(timeout=5)
+        assert is_initialized(proxy)
@@ -0,0 +1,124 @@
+import json
+import logging
+import logging.handlers
+
+import pytest
+
+from src.logging_setup import (
+    JSONFormatter,
+    RequestIdFilter,
+    _use_watched_file_handlers,
+    configure_logging,
+    request_id_var,
+)
+
+
+def make_record(message, *args, **extra):
+    """Creates a record as a logger call with the given arguments and extra fields would."""
+
+    record = logging.LogRecord("test", logging.INFO, __file__, 10, message, args, None)
+    record.__dict__.update(extra)
+    RequestIdFilter().filter(record)
+    return record
+
+
+class TestJSONFormatter:
+    def test_fields(self):
+        """Tests a record is rendered as one JSON line with the message, request id and extra fields."""
+
+        token = request_id_var.set("SM123")
+
+        try:
+            record = make_record("Replied to %s", "+15555555555", status="image", stage_timings_ms={"cat_api": 1.5})
+
+        finally:
+            request_id_var.reset(token)
+
+        line = JSONFormatter().format(record)
+        entry = json.loads(line)
+
+        assert "\n" not in line
+        assert entry["level"] == "INFO"
+        assert entry["message"] == "Replied to +15555555555"
+        assert entry["request_id"] == "SM123"
+        assert entry["status"] == "image"
+        assert entry["stage_timings_ms"] == {"cat_api": 1.5}
+
+    def test_without_request_id(self):
+        """Tests records logged outside a request have no request id."""
+
+        entry = json.loads(JSONFormatter().format(make_record("Refreshed")))
+
+        assert "request_id" not in entry
+
+
+@pytest.fixture
+def restore_root_logger():
+    """Restores the handlers and level of the root logger after a test configures logging."""
+
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+
+    yield
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    for handler in handlers:
+        root.addHandler(handler)
+
+    root.setLevel(level)
+
+
+def read_entries(tmp_path):
+    """Reads the JSON entries of the log file."""
+
+    with open(tmp_path / "cat-of-the-day.log", "r") as logfile:
+        return [json.loads(line) for line in logfile]
+
+
+def test_configure_logging(tmp_path, restore_root_logger):
+    """Tests records are written to the log file by the queue listener."""
+
+    listener = configure_logging(str(tmp_path), log_format="json", use_queue=True)
+    logging.getLogger("test").info("Message received: %s", "Show me a cat")
+    listener.stop()
+
+    assert read_entries(tmp_path)[0]["message"] == "Message received: Show me a cat"
+
+
+def test_queued_exception(tmp_path, restore_root_logger):
+    """Tests a record queued with an exception keeps its traceback in its own JSON field."""
+
+    listener = configure_logging(str(tmp_path), log_format="json", use_queue=True)
+
+    try:
+        raise ValueError("upstream down")
+
+    except ValueError:
+        logging.getLogger("test").exception("Refresh failed for %s", "breeds")
+
+    listener.stop()
+    entry = read_entries(tmp_path)[0]
+
+    assert entry["message"] == "Refresh failed for breeds"
+    assert entry["exception"].startswith("Traceback")
+    assert "ValueError: upstream down" in entry["exception"]
+
+
+def test_use_watched_file_handlers(tmp_path):
+    """Tests a forked worker appends to the parent's log file instead of rotating it."""
+
+    formatter = JSONFormatter()
+    rotating_handler = logging.handlers.RotatingFileHandler(str(tmp_path / "cat-of-the-day.log"), maxBytes=10)
+    rotating_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+
+    watched_handler, worker_stream_handler = _use_watched_file_handlers([rotating_handler, stream_handler])
+
+    assert isinstance(watched_handler, logging.handlers.WatchedFileHandler)
+    assert watched_handler.baseFilename == rotating_handler.baseFilename
+    assert watched_handler.formatter is formatter
+    assert worker_stream_handler is stream_handler
+
+    watched_handler.close()
@@ -0,0 +1,66 @@
+import pytest
+
+from src.metrics import MetricsRegistry, timed
+
+
+class TestMetricsRegistry:
+    def test_counter(self):
+        """Tests Counter samples in the Prometheus text format."""
+
+        metrics = MetricsRegistry()
+        requests = metrics.counter("sms_requests_total", "Handled requests", labels=("outcome",))
+        requests.inc(outcome="image")
+        requests.inc(outcome="image")
+        requests.inc(3, outcome="too_long")
+
+        rendered = metrics.render()
+
+        assert "# TYPE sms_requests_total counter" in rendered
+        assert 'sms_requests_total{outcome="image"} 2' in rendered
+        assert 'sms_requests_total{outcome="too_long"} 3' in rendered
+
+    def test_histogram(self):
+        """Tests Histogram buckets are cumulative and include +Inf, sum and count."""
+
+        metrics = MetricsRegistry()
+        durations = metrics.histogram("stage_seconds", "Stage durations", labels=("stage",), buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.5, 5.0):
+            durations.observe(value, stage="cat_api")
+
+        rendered = metrics.render()
+
+        assert 'stage_seconds_bucket{stage="cat_api",le="0.1"} 1' in rendered
+        assert 'stage_seconds_bucket{stage="cat_api",le="1.0"} 2' in rendered
+        assert 'stage_seconds_bucket{stage="cat_api",le="+Inf"} 3' in rendered
+        assert 'stage_seconds_sum{stage="cat_api"} 5.55' in rendered
+        assert 'stage_seconds_count{stage="cat_api"} 3' in rendered
+
+    def test_callback(self):
+        """Tests CallbackMetric reads its value when rendered."""
+
+        metrics = MetricsRegistry()
+        depth = [0]
+        metrics.callback("delivery_queue_depth", "Replies waiting", lambda: depth[0])
+        depth[0] = 7
+
+        assert "delivery_queue_depth 7" in metrics.render()
+
+    def test_timed(self):
+        """Tests timed() records durations and counts exceptions."""
+
+        metrics = MetricsRegistry()
+        durations = metrics.histogram("stage_seconds", "Stage durations", labels=("stage",))
+        errors = metrics.counter("stage_errors_total", "Stage errors", labels=("stage",))
+
+        with timed(durations, errors, stage="parse"):
+            pass
+
+        with pytest.raises(ValueError):
+            with timed(durations, errors, stage="parse"):
+                raise ValueError()
+
+        rendered = metrics.render()
+
+        assert 'stage_seconds_count{stage="parse"} 2' in rendered
+        assert 'stage_errors_total{stage="parse"} 1' in rendered
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import signal
+import urllib.request
+
+import pytest
+
+from src.prefork import PreforkServer, memory_usage
+
+
+def worker_pid_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [str(os.getpid()).encode()]
+
+
+class TestPrefork:
+    def test_memory_usage(self):
+        """Tests memory_usage() reads the RSS and PSS of this process."""
+
+        usage = memory_usage()
+
+        if usage is None:
+            pytest.skip("/proc/<pid>/smaps_rollup is not available")
+
+        assert usage["rss"] > 0
+        assert 0 < usage["pss"] <= usage["rss"]
+        assert memory_usage(2**22 + 1) is None
+
+    def test_serve_forever(self):
+        """Tests PreforkServer serves requests from its workers and stops them on SIGTERM."""
+
+        server = PreforkServer(worker_pid_app, port=0, workers=2, memory_report_interval=0, graceful_timeout=5)
+        server.bind()
+
+        parent = multiprocessing.get_context("fork").Process(target=server.serve_forever)
+        parent.start()
+        server.server.server_close()
+
+        try:
+            pids = set()
+
+            for _ in range(20):
+                with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/", timeout=5) as response:
+                    pids.add(int(response.read()))
+
+            assert pids
+            assert os.getpid() not in pids
+            assert parent.pid not in pids
+
+        finally:
+            os.kill(parent.pid, signal.SIGTERM)
+            parent.join(10)
+
+        assert parent.exitcode == 0
+
+        for pid in pids:
+            with pytest.raises(ProcessLookupError):
+                os.kill(pid, 0)
+
+    def test_on_worker_exit(self, tmp_path):
+        """Tests a stopping worker runs on_worker_exit before it leaves."""
+
+        def on_worker_exit():
+            (tmp_path / str(os.getpid())).touch()
+
+        server = PreforkServer(
+            worker_pid_app,
+            port=0,
+            workers=2,
+            memory_report_interval=0,
+            graceful_timeout=5,
+            on_worker_exit=on_worker_exit,
+        )
+        server.bind()
+
+        parent = multiprocessing.get_context("fork").Process(target=server.serve_forever)
+        parent.start()
+        server.server.server_close()
+
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/", timeout=5) as response:
+                pid = response.read().decode()
+
+        finally:
+            os.kill(parent.pid, signal.SIGTERM)
+            parent.join(10)
+
+        assert parent.exitcode == 0
+        assert (tmp_path / pid).exists()
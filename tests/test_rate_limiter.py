@@ -0,0 +1,69 @@
+import time
+
+from src.rate_limiter import KeyedRateLimiter, SQLiteRateLimiter, TokenBucket
+
+
+class TestTokenBucket:
+    def test_burst(self):
+        """Tests TokenBucket allows a burst up to its capacity and then refuses."""
+
+        bucket = TokenBucket(rate=1, capacity=3)
+
+        assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+    def test_acquire_waits(self):
+        """Tests TokenBucket.acquire waits for tokens to be added at the configured rate."""
+
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+
+        for _ in range(6):
+            bucket.acquire()
+
+        # The first token is available immediately, the other five take 1/50 s each
+        assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+class TestKeyedRateLimiter:
+    def test_keys(self):
+        """Tests KeyedRateLimiter keeps a separate bucket for each key."""
+
+        limiter = KeyedRateLimiter(rate=0.001, capacity=2)
+
+        assert [limiter.try_acquire("+15550000001") for _ in range(3)] == [True, True, False]
+        assert limiter.try_acquire("+15550000002")
+
+    def test_max_keys(self):
+        """Tests KeyedRateLimiter drops the least recently used buckets beyond max_keys."""
+
+        limiter = KeyedRateLimiter(rate=0.001, capacity=1, max_keys=2)
+        limiter.try_acquire("a")
+        limiter.try_acquire("b")
+        limiter.try_acquire("c")
+
+        assert limiter.try_acquire("a")
+        assert not limiter.try_acquire("c")
+
+
+class TestSQLiteRateLimiter:
+    def test_shared(self, tmp_path):
+        """Tests SQLiteRateLimiter instances on the same file share their buckets, as worker processes would."""
+
+        path = str(tmp_path / "rate_limits.db")
+        first = SQLiteRateLimiter(path, rate=0.001, capacity=2)
+        second = SQLiteRateLimiter(path, rate=0.001, capacity=2)
+
+        assert first.try_acquire("+15550000001")
+        assert second.try_acquire("+15550000001")
+        assert not first.try_acquire("+15550000001")
+        assert second.try_acquire("+15550000002")
+
+    def test_refill(self, tmp_path):
+        """Tests SQLiteRateLimiter refills buckets at the configured rate."""
+
+        limiter = SQLiteRateLimiter(str(tmp_path / "rate_limits.db"), rate=50, capacity=1)
+
+        assert limiter.try_acquire("*")
+        assert not limiter.try_acquire("*")
+        time.sleep(0.05)
+        assert limiter.try_acquire("*")
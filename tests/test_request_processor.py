@@ -1,38 +1,90 @@
 import pytest
 
+from src import request_processor as request_processor_module
+from src.fast_parser import FastParser
+from src.keyword_matcher import KeywordMatcher
 from src.request_processor import RequestProcessor
 
+PROCESS_REQUEST_CASES = [
+    ("", "", ""),
+    ("Want a savannah", "", ""),
+    ("Need me a russian blue", "", ""),
+    ("Show me a picture of a siamese cat", "show", "picture siamese cat"),
+    ("Send me a picture of a cat wearing sunglasses", "send", "picture cat wearing sunglass"),
+    ("Get a cat in a hat", "get", "cat hat"),
+    ("I want to see a cat in space!", "see", "cat space"),
+    ("Let me see a cat in a box", "see", "cat box"),
+    ("I wish to view a cat wearing a tie", "view", "cat wearing tie"),
+    ("Show me a domestic shorthair kitty", "show", "domestic shorthair kitty"),
+    ("Show me an egyptian mau cat", "show", "egyptian mau cat"),
+    ("Can you send me a picture of a javanese kitty?", "send", "picture javanese kitty"),
+    ("Will you show me a cat wearing clothes?", "show", "cat wearing clothes"),
+    ("I need to view an american shorthair wearing a hat", "view", "american shorthair wearing hat"),
+    ("I want to receive a bengal cat", "receive", "bengal cat"),
+    ("Give me a norwegian forest cat", "give", "norwegian forest cat"),
+    ("Tell me a cat fact", "tell", "cat fact"),
+    ("Tell me a joke", "", ""),
+    ("Tell me a joke, then show me a cat", "show", "cat"),
+]
+
 
 class TestRequestProcessor:
     @pytest.mark.parametrize(
         "test_request,expected_verb,expected_object",
-        [
-            ("", "", ""),
-            ("Want a savannah", "", ""),
-            ("Need me a russian blue", "", ""),
-            ("Show me a picture of a siamese cat", "show", "picture siamese cat"),
-            ("Send me a picture of a cat wearing sunglasses", "send", "picture cat wearing sunglass"),
-            ("Get a cat in a hat", "get", "cat hat"),
-            ("I want to see a cat in space!", "see", "cat space"),
-            ("Let me see a cat in a box", "see", "cat box"),
-            ("I wish to view a cat wearing a tie", "view", "cat wearing tie"),
-            ("Show me a domestic shorthair kitty", "show", "domestic shorthair kitty"),
-            ("Show me an egyptian mau cat", "show", "egyptian mau cat"),
-            ("Can you send me a picture of a javanese kitty?", "send", "picture javanese kitty"),
-            ("Will you show me a cat wearing clothes?", "show", "cat wearing clothes"),
-            ("I need to view an american shorthair wearing a hat", "view", "american shorthair wearing hat"),
-            ("I want to receive a bengal cat", "receive", "bengal cat"),
-            ("Give me a norwegian forest cat", "give", "norwegian forest cat"),
-        ],
+        PROCESS_REQUEST_CASES,
     )
-    def test_process_request(self, test_request, expected_verb, expected_object):
+    @pytest.mark.parametrize("fast_path", [True, False])
+    def test_process_request(self, test_request, expected_verb, expected_object, fast_path):
         """Tests RequestProcessor.process_request()."""
 
-        request_processor = RequestProcessor()
+        request_processor = RequestProcessor(fast_path=fast_path)
         verb, object_ = request_processor.process_request(test_request)
         assert verb == expected_verb, f"{verb} != {expected_verb}"
         assert object_ == expected_object, f"{object_} != {expected_object}"
 
+    @pytest.mark.parametrize("test_request,expected_verb,expected_object", PROCESS_REQUEST_CASES)
+    def test_fast_parser(self, test_request, expected_verb, expected_object):
+        """Tests FastParser handles every request without NLTK and finds the same action and object."""
+
+        request_processor = RequestProcessor(fast_path=True)
+        tokens = request_processor.fast_parser.parse(test_request)
+
+        assert tokens is not None, "fell back to NLTK"
+        assert request_processor._find_action(tokens) == (expected_verb, expected_object)
+
+    @pytest.mark.parametrize(
+        "tokens,expected",
+        [
+            (["tell", "fact"], ("tell", "fact")),
+            (["tell", "cat", "trivia"], ("tell", "cat trivia")),
+            (["tell", "joke"], ("", "")),
+            (["tell", "dog"], ("", "")),
+            (["tell", "factory", "cat"], ("", "")),
+        ],
+    )
+    def test_tell_asks_for_facts_only(self, tokens, expected):
+        """Tests "tell" is only understood as a request when its object asks for a fact."""
+
+        assert RequestProcessor(fast_path=False)._find_action(tokens) == expected
+
+    @pytest.mark.parametrize("fast_path", [True, False])
+    def test_tell_about(self, fast_path):
+        """Tests "tell me about dogs" is not mistaken for a request for a cat image."""
+
+        assert RequestProcessor(fast_path=fast_path).process_request("Tell me about dogs") == ("", "")
+
+    @pytest.mark.parametrize(
+        "test_request",
+        ["I'd like to see a cat", "Show me 2 cats. Now", "Show me geese", "Send cats in glass cases", "Gimme a cat"],
+    )
+    def test_fast_parser_fallback(self, test_request):
+        """Tests FastParser leaves requests it cannot tokenize or lemmatize exactly like NLTK to the full path."""
+
+        fast_parser = FastParser()
+
+        assert fast_parser.parse(test_request) is None
+        assert fast_parser.stats() == {"hits": 0, "fallbacks": 1}
+
     @pytest.mark.parametrize(
         "keywords,string_,expected",
         [
@@ -54,3 +106,44 @@ class TestRequestProcessor:
 
         request_processor = RequestProcessor()
         assert request_processor.get_keywords_in_string(keywords, string_) == expected
+
+    def test_lemma_cache(self):
+        """Tests RequestProcessor caches lemmatization results across requests."""
+
+        request_processor = RequestProcessor(eager=True, lemma_cache_size=16, fast_path=False)
+        request_processor.process_request("Show me a cat in a box")
+        misses = request_processor.lemma_cache_info().misses
+
+        assert request_processor.process_request("Show me a cat in a box") == ("show", "cat box")
+        assert request_processor.lemma_cache_info().misses == misses
+        assert request_processor.lemma_cache_info().hits >= 3
+
+    @pytest.mark.parametrize("processes", [1, 2])
+    def test_process_many(self, processes):
+        """Tests RequestProcessor.process_many() matches resolving each request on its own."""
+
+        keyword_matcher = KeywordMatcher({"category": {"hat": 1, "box": 5}, "breed": {"siamese": "siam"}})
+        user_requests = [
+            "Show me a picture of a siamese cat",
+            "Want a savannah",
+            "Get a cat in a hat",
+            "Show me a picture of a siamese cat",
+            "",
+            "Let me see a cat in a box",
+            "Get a cat in a hat",
+        ]
+
+        request_processor = RequestProcessor()
+        expected = [request_processor.resolve_request(user_request, keyword_matcher) for user_request in user_requests]
+
+        assert request_processor.process_many(user_requests, keyword_matcher, processes=processes) == expected
+        assert expected[0] == ("show", "picture siamese cat", None, "siamese")
+        assert expected[2] == ("get", "cat hat", "hat", None)
+
+    @pytest.mark.parametrize("fast_path", [True, False])
+    def test_worker_fast_path(self, fast_path):
+        """Tests a process_many worker uses the fast path setting of the calling processor."""
+
+        request_processor_module._initialize_worker(16, fast_path)
+
+        assert (request_processor_module._worker_processor.fast_parser is not None) is fast_path
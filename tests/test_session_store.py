@@ -0,0 +1,80 @@
+import pytest
+
+from src.session_store import FACT, IMAGE, SessionStore, is_follow_up
+from src.ttl_cache import SQLiteCache, TTLCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def session_store(request, tmp_path):
+    """Returns a session store on either cache backend."""
+
+    if request.param == "memory":
+        backend = TTLCache(max_size=100, ttl=60)
+
+    else:
+        backend = SQLiteCache(str(tmp_path / "sessions.db"), max_size=100, ttl=60, table="sessions")
+
+    return SessionStore(backend, max_images=3)
+
+
+@pytest.mark.parametrize(
+    "message,expected",
+    [
+        ("another one", True),
+        ("Another one please!", True),
+        ("more", True),
+        ("send me more cats", True),
+        ("again", True),
+        ("can I have another?", True),
+        ("another siamese", False),
+        ("send me a cat", False),
+        ("thanks", False),
+        ("", False),
+    ],
+)
+def test_is_follow_up(message, expected):
+    """Tests is_follow_up() accepts follow-up words with filler words only."""
+
+    assert is_follow_up(message) == expected
+
+
+class TestSessionStore:
+    def test_remember(self, session_store):
+        """Tests a sender's last request is remembered along with the images sent to them."""
+
+        assert session_store.get("+15550000001") is None
+
+        session_store.remember("+15550000001", None, IMAGE, category="box", image_url="a")
+        session = session_store.get("+15550000001")
+        session_store.remember("+15550000001", session, IMAGE, breed="siamese", image_url="b")
+
+        assert session_store.get("+15550000001") == {
+            "kind": IMAGE,
+            "category": None,
+            "breed": "siamese",
+            "sent": ["a", "b"],
+        }
+        assert session_store.get("+15550000002") is None
+
+    def test_max_images(self, session_store):
+        """Tests only the most recent images are remembered."""
+
+        for image_url in ["a", "b", "c", "d"]:
+            session_store.remember("+15550000001", session_store.get("+15550000001"), IMAGE, image_url=image_url)
+
+        session_store.remember("+15550000001", session_store.get("+15550000001"), FACT)
+
+        assert session_store.get("+15550000001")["sent"] == ["b", "c", "d"]
+        assert session_store.get("+15550000001")["kind"] == FACT
+
+    def test_follow_up(self, session_store):
+        """Tests a follow-up is recognized only for a sender with a session."""
+
+        assert not session_store.follow_up(None, "another one")
+
+        session_store.remember("+15550000001", None, IMAGE, category="box", image_url="a")
+        session = session_store.get("+15550000001")
+
+        assert session_store.follow_up(session, "another one")
+        assert not session_store.follow_up(session, "send me a hat cat")
+        assert session_store.stats() == {"follow_ups": 1, "sessions": 1}
@@ -0,0 +1,285 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from src.async_cat_api_handler import AsyncCatAPIHandler
+from src.image_pool import ImagePool
+from src.lazy import LazyProxy, is_initialized
+from src.single_flight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_call(self):
+        """Tests concurrent callers for a key share one call and each get a different item."""
+
+        leftovers = []
+        single_flight = SingleFlight(on_leftovers=lambda key, items: leftovers.append((key, items)))
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return list(range(10))
+
+        def caller():
+            results.append(single_flight.take("box", fetch))
+
+        threads = [threading.Thread(target=caller) for _ in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(results) == [0, 1, 2, 3, 4]
+        assert leftovers == [("box", [5, 6, 7, 8, 9])]
+        assert single_flight.stats() == {"calls": 1, "coalesced": 4}
+
+    def test_different_keys(self):
+        """Tests callers for different keys do not share a call."""
+
+        single_flight = SingleFlight()
+
+        assert single_flight.take("box", lambda: ["box"]) == "box"
+        assert single_flight.take("hat", lambda: ["hat"]) == "hat"
+        assert single_flight.stats() == {"calls": 2, "coalesced": 0}
+
+    def test_sequential_callers_make_new_calls(self):
+        """Tests a caller arriving after a call finished starts a new call."""
+
+        single_flight = SingleFlight()
+        batches = iter([["a"], ["b"]])
+
+        assert single_flight.take("box", lambda: next(batches)) == "a"
+        assert single_flight.take("box", lambda: next(batches)) == "b"
+
+    def test_batch_runs_out(self):
+        """Tests callers beyond the size of the batch get None."""
+
+        single_flight = SingleFlight()
+        results = []
+
+        def fetch():
+            time.sleep(0.2)
+            return ["only"]
+
+        threads = [threading.Thread(target=lambda: results.append(single_flight.take("box", fetch))) for _ in range(3)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert sorted(results, key=str) == [None, None, "only"]
+
+    def test_error_is_shared(self):
+        """Tests every caller of a failed call gets its exception."""
+
+        single_flight = SingleFlight(on_leftovers=lambda key, items: pytest.fail("No leftovers expected"))
+        errors = []
+
+        def fetch():
+            time.sleep(0.2)
+            raise ValueError("upstream down")
+
+        def caller():
+            try:
+                single_flight.take("box", fetch)
+
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=caller) for _ in range(3)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 3
+        assert single_flight.take("box", lambda: ["recovered"]) == "recovered"
+
+    def test_base_exception_ends_the_call(self):
+        """Tests a call ended by an exception outside Exception, e.g. an interrupt, does not block later callers."""
+
+        single_flight = SingleFlight()
+
+        def interrupted():
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            single_flight.take("box", interrupted)
+
+        assert single_flight.take("box", lambda: ["recovered"]) == "recovered"
+
+    def test_exclude(self):
+        """Tests a caller skips the items it excludes and leaves them to the leftovers."""
+
+        leftovers = []
+        single_flight = SingleFlight(on_leftovers=lambda key, items: leftovers.append(items))
+
+        assert single_flight.take("box", lambda: ["a", "b", "c"], exclude={"a", "b"}) == "c"
+        assert leftovers == [["a", "b"]]
+        assert single_flight.take("box", lambda: ["a"], exclude={"a"}) is None
+
+
+class TestAsyncSingleFlight:
+    def test_concurrent_callers_share_one_call(self):
+        """Tests concurrent coroutines for a key share one call and each get a different item."""
+
+        leftovers = []
+        single_flight = AsyncSingleFlight(on_leftovers=lambda key, items: leftovers.append(items))
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return list(range(4))
+
+        async def main():
+            return await asyncio.gather(*(single_flight.take("box", fetch) for _ in range(3)))
+
+        results = asyncio.run(main())
+
+        assert len(calls) == 1
+        assert sorted(results) == [0, 1, 2]
+        assert leftovers == [[3]]
+
+    def test_cancelled_leader(self):
+        """Tests cancelling the coroutine making the call ends the call for its followers and later callers."""
+
+        single_flight = AsyncSingleFlight()
+
+        async def slow_fetch():
+            await asyncio.sleep(10)
+            return ["never"]
+
+        async def main():
+            leader = asyncio.create_task(single_flight.take("box", slow_fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(single_flight.take("box", slow_fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            results = await asyncio.gather(leader, follower, return_exceptions=True)
+
+            async def fetch():
+                return ["recovered"]
+
+            return results, await asyncio.wait_for(single_flight.take("box", fetch), 1)
+
+        results, recovered = asyncio.run(main())
+
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert recovered == "recovered"
+
+
+class TestCatAPIHandlerCoalescing:
+    def test_exclude_uses_the_same_batch(self, offline_cat_api):
+        """Tests excluded images are skipped within the fetched batch rather than by fetching again."""
+
+        first_batch = [f"https://cdn2.thecatapi.com/images/{i}.jpg" for i in range(3)]
+        image_url, _ = offline_cat_api.get_cat_image(category="box", exclude=set(first_batch))
+
+        assert image_url == "https://cdn2.thecatapi.com/images/3.jpg"
+        assert offline_cat_api.image_search.calls == [({"category_ids": 5}, 10)]
+
+    def test_exclude_uses_pooled_leftovers(self, offline_cat_api):
+        """Tests a requester who excluded their share of a batch gets an image pooled from it."""
+
+        offline_cat_api.image_pool = ImagePool(offline_cat_api._fetch_image_urls, size=10, low_water_mark=0)
+        offline_cat_api.image_pool.put({"category_ids": 5}, ["https://cdn2.thecatapi.com/images/pooled.jpg"])
+
+        image_url, _ = offline_cat_api.get_cat_image(
+            category="box", exclude={"https://cdn2.thecatapi.com/images/pooled.jpg"}
+        )
+
+        assert image_url == "https://cdn2.thecatapi.com/images/0.jpg"
+        assert len(offline_cat_api.image_search.calls) == 1
+
+    def test_repeat_after_max_excluded_fetches(self, offline_cat_api):
+        """Tests a requester who has seen every image returned gets a repeat after a few calls."""
+
+        offline_cat_api.image_search = lambda parameters, limit: ["https://cdn2.thecatapi.com/images/only.jpg"]
+        offline_cat_api._request_image_urls = offline_cat_api.image_search
+
+        image_url, _ = offline_cat_api.get_cat_image(exclude={"https://cdn2.thecatapi.com/images/only.jpg"})
+
+        assert image_url == "https://cdn2.thecatapi.com/images/only.jpg"
+
+    def test_attempts_are_capped(self, offline_cat_api):
+        """Tests a search whose batches keep running out gives up and replies with a fallback image."""
+
+        offline_cat_api.fallback_images.add({"category_ids": 5}, ["https://cdn2.thecatapi.com/images/fallback.jpg"])
+        offline_cat_api.single_flight.take = lambda key, fetch, exclude=(): None
+
+        image_url, _ = offline_cat_api.get_cat_image(category="box")
+
+        assert image_url == "https://cdn2.thecatapi.com/images/fallback.jpg"
+
+
+class TestAsyncCatAPIHandlerCoalescing:
+    def test_does_not_create_the_handler(self):
+        """Tests creating the asynchronous handler does not create the synchronous handler behind a proxy."""
+
+        cat_api = LazyProxy(lambda: pytest.fail("CatAPIHandler created"), name="CatAPIHandler")
+        AsyncCatAPIHandler(httpx.AsyncClient(), cat_api)
+
+        assert not is_initialized(cat_api)
+
+    def test_fetch_shared_image(self, offline_cat_api):
+        """Tests concurrent searches share one request and each get a different image, the rest being pooled."""
+
+        requests = []
+
+        async def image_search(request):
+            requests.append(request)
+            await asyncio.sleep(0.05)
+            limit = int(request.url.params["limit"])
+            return httpx.Response(
+                200, json=[{"url": f"https://cdn2.thecatapi.com/images/{i}.jpg"} for i in range(limit)]
+            )
+
+        offline_cat_api.image_pool = ImagePool(offline_cat_api._fetch_image_urls, size=10, low_water_mark=0)
+
+        async def main():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(image_search)) as client:
+                async_cat_api = AsyncCatAPIHandler(client, offline_cat_api)
+                results = await asyncio.gather(
+                    *(async_cat_api._fetch_shared_image({"category_ids": 5}) for _ in range(4))
+                )
+
+            return results, async_cat_api.single_flight.stats()
+
+        results, stats = asyncio.run(main())
+
+        assert len(requests) == 1
+        assert requests[0].url.params["category_ids"] == "5"
+        assert len(set(results)) == 4
+        assert stats == {"calls": 1, "coalesced": 3}
+        assert offline_cat_api.image_pool.stats()["pools"] == {"category_ids=5": 7}
+
+    def test_attempts_are_capped(self, offline_cat_api):
+        """Tests a search whose batches keep running out gives up instead of holding the event loop."""
+
+        offline_cat_api.fallback_images.add({"category_ids": 5}, ["https://cdn2.thecatapi.com/images/fallback.jpg"])
+
+        async def take(key, fetch, exclude=()):
+            return None
+
+        async def main():
+            async with httpx.AsyncClient() as client:
+                async_cat_api = AsyncCatAPIHandler(client, offline_cat_api)
+                async_cat_api.single_flight.take = take
+                return await asyncio.wait_for(async_cat_api.get_cat_image(category="box"), 1)
+
+        image_url, _ = asyncio.run(main())
+
+        assert image_url == "https://cdn2.thecatapi.com/images/fallback.jpg"
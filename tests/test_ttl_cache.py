@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from src.ttl_cache import SQLiteCache, TTLCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    """Returns a factory building either cache backend."""
+
+    def factory(max_size=100, ttl=60):
+        if request.param == "memory":
+            return TTLCache(max_size=max_size, ttl=ttl)
+
+        return SQLiteCache(str(tmp_path / "cache.db"), max_size=max_size, ttl=ttl)
+
+    return factory
+
+
+class TestTTLCache:
+    def test_get_and_set(self, make_cache):
+        """Tests TTLCache.get() and TTLCache.set() on both backends."""
+
+        cache = make_cache()
+
+        assert cache.get("missing") is None
+        assert cache.get("missing", "default") == "default"
+
+        cache.set("key", ["show", "cat box", "box", None])
+        assert cache.get("key") == ["show", "cat box", "box", None]
+        assert len(cache) == 1
+
+        cache.delete("key")
+        assert cache.get("key") is None
+
+    def test_add(self, make_cache):
+        """Tests TTLCache.add() only stores a value for a free or expired key on both backends."""
+
+        cache = make_cache(ttl=0.05)
+
+        assert cache.add("key", "first")
+        assert not cache.add("key", "second")
+        assert cache.get("key") == "first"
+
+        time.sleep(0.1)
+
+        assert cache.add("key", "third")
+        assert cache.get("key") == "third"
+
+    def test_replace(self, make_cache):
+        """Tests TTLCache.replace() only stores a value over the expected one on both backends."""
+
+        cache = make_cache(ttl=0.05)
+
+        assert not cache.replace("key", None, "first")
+        cache.set("key", {"state": "pending", "started_at": 1.5})
+
+        assert not cache.replace("key", {"state": "pending", "started_at": 2.5}, "second")
+        assert cache.replace("key", {"state": "pending", "started_at": 1.5}, "third")
+        assert cache.get("key") == "third"
+
+        time.sleep(0.1)
+
+        assert not cache.replace("key", "third", "fourth")
+
+    def test_expiry(self, make_cache):
+        """Tests entries expire after the TTL on both backends."""
+
+        cache = make_cache(ttl=0.05)
+        cache.set("key", "value")
+        time.sleep(0.1)
+
+        assert cache.get("key") is None
+
+    def test_lru_eviction(self):
+        """Tests TTLCache evicts the least recently used entry."""
+
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_sqlite_shared_between_instances(self, tmp_path):
+        """Tests SQLiteCache entries are visible to other instances using the same file."""
+
+        path = str(tmp_path / "shared.db")
+        SQLiteCache(path, table="intents").set("key", "value")
+
+        assert SQLiteCache(path, table="intents").get("key") == "value"
+        assert SQLiteCache(path, table="other").get("key") is None
@@ -1,6 +1,15 @@
+import threading
+import time
+
+import httpx
 import pytest
+import requests
+from twilio.base.exceptions import TwilioRestException
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
 
-from src.twilio_messaging import TwilioMessageHandler
+from src.async_twilio_messaging import AsyncTwilioMessageHandler
+from src.rate_limiter import TokenBucket
+from src.twilio_messaging import FAILED, SENT, UNKNOWN, TwilioMessageHandler
 from src.utilities import MY_NUMBER, TwilioCredentials
 
 test_img_url = (
@@ -34,3 +43,133 @@ class TestTwilioMessageHandler:
 
         else:
             assert message_sid.startswith("SM")
+
+
+def connection_error(reason):
+    """Builds the exception requests raises for a urllib3 failure."""
+
+    return requests.ConnectionError(MaxRetryError(None, "/Messages.json", reason=reason))
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    [
+        (TwilioRestException(429, "/Messages.json"), True),
+        (TwilioRestException(503, "/Messages.json"), True),
+        (TwilioRestException(400, "/Messages.json"), False),
+        (requests.ConnectTimeout(), True),
+        (connection_error(NewConnectionError(None, "Connection refused")), True),
+        (connection_error(ProtocolError("Connection aborted.", ConnectionResetError())), False),
+        (requests.ReadTimeout(), False),
+        (ValueError("unexpected"), False),
+    ],
+)
+def test_is_transient_error(error, expected):
+    """Tests only throttling, server errors and failures to connect are retried."""
+
+    assert TwilioMessageHandler.is_transient_error(error) == expected
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    [
+        (httpx.ConnectError("Connection refused"), True),
+        (httpx.ConnectTimeout("timed out"), True),
+        (httpx.ReadTimeout("timed out"), False),
+        (httpx.RemoteProtocolError("Server disconnected"), False),
+    ],
+)
+def test_async_is_transient_error(error, expected):
+    """Tests the asynchronous handler only retries transport errors raised while connecting."""
+
+    assert AsyncTwilioMessageHandler.is_transient_error(error) == expected
+
+
+class FakeTwilioMessageHandler(TwilioMessageHandler):
+    """TwilioMessageHandler whose sends take a while and fail for some numbers, without calling Twilio."""
+
+    def __init__(self, send_workers=4, send_rate=0, errors=None):
+        self.send_workers = send_workers
+        self.send_rate_limiter = TokenBucket(send_rate, capacity=1) if send_rate > 0 else None
+        self.errors = errors or {}
+        self.active = 0
+        self.max_active = 0
+        self.started_at = []
+        self._lock = threading.Lock()
+
+    def send_message(self, receiving_number, text_message, image_url=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.started_at.append(time.monotonic())
+
+        time.sleep(0.05)
+
+        with self._lock:
+            self.active -= 1
+
+        if receiving_number in self.errors:
+            raise self.errors[receiving_number]
+
+        return f"MM{receiving_number[1:]:0>32}"
+
+
+class TestSendMany:
+    def test_results(self):
+        """Tests every message gets a result in the order of the messages."""
+
+        rejected = TwilioRestException(400, "https://api.twilio.com", msg="Invalid 'To' number")
+        twilio = FakeTwilioMessageHandler(
+            errors={"+15550000002": rejected, "+15550000003": requests.ReadTimeout("read timed out")}
+        )
+        messages = [(f"+1555000000{i}", "Here is a cat!", None) for i in range(1, 5)]
+
+        results = twilio.send_many(messages)
+
+        assert [result["to"] for result in results] == [number for number, _, _ in messages]
+        assert [result["status"] for result in results] == [SENT, FAILED, UNKNOWN, SENT]
+        assert results[0]["sid"] == "MM" + "15550000001".rjust(32, "0") and results[0]["error"] is None
+        assert results[1]["sid"] is None and "Invalid 'To' number" in results[1]["error"]
+        assert results[2]["error"] == "read timed out"
+
+    def test_bounded_workers(self):
+        """Tests no more messages than the number of workers are sent at the same time."""
+
+        twilio = FakeTwilioMessageHandler(send_workers=3)
+        results = twilio.send_many((f"+1555000{i:04d}", "Hi", None) for i in range(12))
+
+        assert len(results) == 12
+        assert twilio.max_active == 3
+
+    def test_rate_cap(self):
+        """Tests sends are started no faster than the rate cap."""
+
+        twilio = FakeTwilioMessageHandler(send_rate=20)
+        twilio.send_many((f"+1555000{i:04d}", "Hi", None) for i in range(5))
+
+        assert twilio.started_at[-1] - twilio.started_at[0] >= 4 / 20 * 0.9
+
+    def test_on_result_and_lazy_messages(self):
+        """Tests results are reported as they arrive and messages are read only when a sender is free."""
+
+        twilio = FakeTwilioMessageHandler(send_workers=1)
+        log = []
+
+        def messages():
+            for i in range(3):
+                log.append(f"read {i}")
+                yield f"+1555000000{i}", "Hi", None
+
+        twilio.send_many(messages(), on_result=lambda result: log.append(f"sent {result['to'][-1]}"))
+
+        assert log == ["read 0", "sent 0", "read 1", "sent 1", "read 2", "sent 2"]
+
+    def test_not_authenticated(self):
+        """Tests messages are reported as failed when Twilio is not authenticated."""
+
+        twilio = FakeTwilioMessageHandler()
+        twilio.send_message = lambda *args: None
+
+        assert twilio.send_many([("+15550000001", "Hi", None)]) == [
+            {"to": "+15550000001", "sid": None, "status": FAILED, "error": "Twilio is not authenticated"}
+        ]
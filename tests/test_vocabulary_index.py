@@ -0,0 +1,103 @@
+import pytest
+
+from src.vocabulary_index import VocabularyIndex, edits, plurals
+
+category_ids = {"hat": 1, "space": 2, "sunglass": 4, "box": 5, "tie": 7, "sink": 14, "clothes": 15, "kitten": 16}
+breed_ids = {
+    "cornish rex": "crex",
+    "devon rex": "drex",
+    "maine coon": "mcoo",
+    "norwegian forest cat": "norw",
+    "pixie-bob": "pixi",
+    "savannah": "sava",
+    "siamese": "siam",
+    "sphynx": "sphy",
+}
+
+
+class TestVocabularyIndex:
+    vocabulary_index = VocabularyIndex({"category": category_ids, "breed": breed_ids})
+
+    @pytest.mark.parametrize(
+        "text,expected_category,expected_breed",
+        [
+            ("", None, None),
+            ("cat", None, None),
+            ("cat hat", "hat", None),
+            ("siamese cats", None, "siamese"),
+            ("hats", "hat", None),
+            ("cat in boxes", "box", None),
+            ("cat wearing sunglasses", "sunglass", None),
+            ("mainecoon", None, "maine coon"),
+            ("maine coons", None, "maine coon"),
+            ("pixiebob", None, "pixie-bob"),
+            ("siamise", None, "siamese"),
+            ("siameese", None, "siamese"),
+            ("sphinx", None, "sphynx"),
+            ("savanna in space", "space", "savannah"),
+            ("norwegian forest cats", None, "norwegian forest cat"),
+            ("wegie in a cap", "hat", "norwegian forest cat"),
+            ("devon rex", None, "devon rex"),
+            ("rex", None, None),
+            ("cat in a sinks, please!", "sink", None),
+            ("boxer in spaceship", None, None),
+        ],
+    )
+    def test_search(self, text, expected_category, expected_breed):
+        """Tests VocabularyIndex.search() accepts plurals, aliases, joined words and typos."""
+
+        assert self.vocabulary_index.search(text) == {"category": expected_category, "breed": expected_breed}
+
+    def test_short_words_need_exact_match(self):
+        """Tests words shorter than the typo length only match exactly or as plurals."""
+
+        assert self.vocabulary_index.search("hut bax") == {"category": None, "breed": None}
+
+    @pytest.mark.parametrize(
+        "text",
+        ["cat in a mitten", "bitten cat", "sitting cat", "cat on a pace", "boxy", "hate", "sin", "cat in a snake"],
+    )
+    def test_typo_false_positives(self, text):
+        """Tests other words one edit away from an indexed word are not taken for a misspelling of it."""
+
+        assert self.vocabulary_index.search(text) == {"category": None, "breed": None}
+
+    def test_short_tokens_need_exact_match(self):
+        """Tests misspelled tokens shorter than the minimum token length do not match, even for shorter words."""
+
+        vocabulary_index = VocabularyIndex({"category": {"sink": 14, "kitten": 16}}, typo_min_length=4)
+
+        assert vocabulary_index.search("sinks") == {"category": "sink"}
+        assert vocabulary_index.search("sick") == {"category": None}
+        assert vocabulary_index.search("kiten") == {"category": "kitten"}
+
+    def test_ambiguous_typo(self):
+        """Tests a typo one edit away from two indexed words matches neither."""
+
+        vocabulary_index = VocabularyIndex({"breed": {"bengal": 1, "bengel": 2}}, aliases={})
+
+        assert vocabulary_index.search("bengil") == {"breed": None}
+        assert vocabulary_index.search("bengel") == {"breed": "bengel"}
+
+    def test_aliases_of_missing_keywords(self):
+        """Tests aliases are only indexed for keywords present in the tables."""
+
+        assert VocabularyIndex({"category": {"box": 5}}).search("cap carton") == {"category": "box"}
+
+    @pytest.mark.parametrize(
+        "token,expected",
+        [("hat", {"hats"}), ("box", {"boxes"}), ("kitty", {"kitties", "kittys"}), ("toy", {"toys"})],
+    )
+    def test_plurals(self, token, expected):
+        """Tests plurals()."""
+
+        assert plurals(token) == expected
+
+    def test_edits(self):
+        """Tests edits() builds deletions, transpositions, substitutions and insertions."""
+
+        variants = edits("cat")
+
+        assert {"at", "act", "bat", "coat", "cats"} <= variants
+        assert "cat" not in variants
+        assert "dog" not in variants